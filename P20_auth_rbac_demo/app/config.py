@@ -27,6 +27,10 @@ class AppSettings(BaseSettings):
     JWT_ALGORITHM: str = Field("HS256", env="JWT_ALGORITHM")
     JWT_ACCESS_TOKEN_EXPIRE_MINUTES: int = Field(30, env="JWT_ACCESS_TOKEN_EXPIRE_MINUTES")
 
+    # Authenticated-user cache (see app/security/user_cache.py)
+    USER_CACHE_TTL_SECONDS: float = Field(30, env="USER_CACHE_TTL_SECONDS")
+    USER_CACHE_SIZE: int = Field(1024, env="USER_CACHE_SIZE")
+
     # CORS Settings
     CORS_ORIGINS: List[str] = Field(["*"], env="CORS_ORIGINS")
     CORS_METHODS: List[str] = Field(["*"], env="CORS_METHODS")
@@ -8,6 +8,7 @@ from motor.motor_asyncio import AsyncIOMotorClient
 from app.database import get_database
 from app.models.user import UserInDB, Role
 from app.security.jwt_handler import decode_access_token
+from app.security.user_cache import user_cache
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -88,8 +89,13 @@ async def get_current_user(
         logger.warning("JWT payload missing 'username' claim, cannot identify user.")
         raise credentials_exception
 
-    # Fetch user from database using username from token
-    user = await get_user_from_db(token_data.username, db)
+    # Fetch user from the user cache, falling back to the database using
+    # the username from the token
+    user = user_cache.get(token_data.username)
+    if user is None:
+        user = await get_user_from_db(token_data.username, db)
+        if user is not None:
+            user_cache.put(token_data.username, user)
     if user is None:
         logger.warning(f"User '{token_data.username}' from token not found in database (user may have been deleted).")
         raise credentials_exception
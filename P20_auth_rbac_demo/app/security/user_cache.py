@@ -0,0 +1,35 @@
+# app/security/user_cache.py
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from app.config import settings
+from app.models.user import UserInDB
+
+# get_current_user runs on every protected request. Instead of reading the
+# user from MongoDB each time, we remember the UserInDB for a username for
+# USER_CACHE_TTL_SECONDS.
+# Once more than USER_CACHE_SIZE users are remembered, the one used least
+# recently is forgotten first.
+# Users are never edited through this API, so the TTL is the only expiry.
+class UserCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._users: "OrderedDict[str, Tuple[float, UserInDB]]" = OrderedDict()
+
+    def get(self, username: str) -> Optional[UserInDB]:
+        entry = self._users.get(username)
+        if entry is None or entry[0] < time.monotonic():
+            self._users.pop(username, None)
+            return None
+        self._users.move_to_end(username)
+        return entry[1]
+
+    def put(self, username: str, user: UserInDB) -> None:
+        self._users[username] = (time.monotonic() + self.ttl, user)
+        self._users.move_to_end(username)
+        if len(self._users) > self.maxsize:
+            self._users.popitem(last=False)
+
+user_cache = UserCache(settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL_SECONDS)
@@ -73,7 +73,11 @@ class LabXGraphJanus:
         try:
             base = f"g.V().hasLabel('{label}')"
             for key, val in filters.items():
-                if val is not None and val != "":
+                if isinstance(val, (list, tuple)):
+                    # A list matches any of its values (an empty list matches nothing)
+                    safe_vals = ", ".join(json.dumps(v) for v in val)
+                    base += f".has('{key}', within({safe_vals}))"
+                elif val is not None and val != "":
                     safe_val = json.dumps(val)
                     base += f".has('{key}', {safe_val})"
 
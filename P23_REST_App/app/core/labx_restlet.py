@@ -403,7 +403,7 @@ class LabXRestlet:
             raw_params = params[0] if params else {}
             limit = int(raw_params.get("limit", 100))
             skip = int(raw_params.get("skip", 0))
-            filters = raw_params.get("filter", {})  # filters must be a dict of valid vertex props
+            filters = raw_params.get("filter", {})  # dict of valid vertex props; a list value matches any of its items
             include_children = raw_params.get("include_children", False)  # Check for 'include_children'
 
             logger.debug(f"[List] Querying entity='{entity_name}' with filters={filters}, limit={limit}, skip={skip}")
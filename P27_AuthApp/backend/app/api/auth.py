@@ -2,6 +2,7 @@
 
 import bcrypt
 import re
+import uuid
 from jose import jwt, JWTError
 from bson import ObjectId
 from datetime import datetime, timedelta
@@ -38,7 +39,8 @@ def create_access_token(data: dict, expires_minutes: int = settings.ACCESS_TOKEN
 def create_refresh_token(data: dict, expires_minutes: int = settings.REFRESH_TOKEN_EXPIRE_MINUTES):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=expires_minutes)
-    to_encode.update({"exp": expire})
+    # jti keeps two logins in the same second from producing the same token (and store key)
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     return jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
 
 @router.post("/login")
@@ -51,7 +53,7 @@ async def login(credentials: LoginRequest, response: Response):
     user_id = str(user["_id"])
     access_token = create_access_token({"sub": user_id})
     refresh_token = create_refresh_token({"sub": user_id})
-    await store_refresh_token(user_id, refresh_token)
+    await store_refresh_token(user_id, refresh_token, settings.REFRESH_TOKEN_EXPIRE_MINUTES)
 
     response.set_cookie(
         key="refresh_token",
@@ -3,11 +3,14 @@
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.responses import JSONResponse
 from typing import Optional
+import json
 import httpx
 
 from app.dependencies import get_current_user
+from app.core.config import settings
 from app.core.rbac import assert_entity_permission
-from app.utils.rbac_utils import get_allowed_items_for_user
+from app.utils.rbac_utils import filter_groups_for_user, permitted_entities, scope_list_request
+from app.utils.ttl_cache import TTLCache
 from app.core.logger import get_logger
 
 router = APIRouter(prefix="/data", tags=["Data Proxy"])
@@ -16,6 +19,53 @@ logger = get_logger("proxy")
 # JanusGraph endpoint
 JANUS_ENDPOINT = "http://localhost:8000/labx/entity/InvestigationGroup/list"
 
+# One pooled client for all proxy requests (keep-alive connections to Janus
+# instead of a new connection per request); closed on app shutdown.
+_http_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            timeout=10.0,
+            limits=httpx.Limits(
+                max_connections=settings.PROXY_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.PROXY_MAX_CONNECTIONS,
+            ),
+        )
+    return _http_client
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+# Upstream responses by request body, reused for PROXY_CACHE_TTL_SECONDS
+# (off by default). Cached data is shared across users and never modified:
+# RBAC filtering builds new group objects.
+upstream_cache = TTLCache(settings.PROXY_CACHE_SIZE, settings.PROXY_CACHE_TTL_SECONDS)
+
+async def fetch_groups(body: dict) -> list:
+    cache_key = json.dumps(body, sort_keys=True, default=str)
+    cached = upstream_cache.get(cache_key)
+    if cached is not None:
+        logger.info(f"[Proxy] Using cached Janus response ({len(cached)} groups)")
+        return cached
+
+    janus_response = await get_http_client().post(JANUS_ENDPOINT, json=body)
+    if janus_response.status_code != 200:
+        logger.error(f"[Proxy] JanusGraph error: {janus_response.status_code} - {janus_response.text}")
+        raise HTTPException(
+            status_code=janus_response.status_code,
+            detail=f"JanusGraph error: {janus_response.text}"
+        )
+
+    groups = janus_response.json()
+    upstream_cache.put(cache_key, groups)
+    logger.info(f"[Proxy] Received {len(groups)} groups from Janus")
+    return groups
+
 # Proxy endpoint to fetch data from JanusGraph (now only investigation group with children) and enforce RBAC filtering.
 # Filters down to only investigation groups and items the user has access to.
 @router.post("/", response_class=JSONResponse)
@@ -32,48 +82,22 @@ async def proxy_investigation_data(
         assert_entity_permission(current_user, "InvestigationGroup", "read")
         logger.info(f"[Proxy] '{user_id}' authorized to read 'InvestigationGroup'")
 
-        # Fetch full dataset from Janus
-        # Forward the request to the JanusGraph investigation group endpoint
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            janus_response = await client.post(JANUS_ENDPOINT, json=body or {})
-
-        if janus_response.status_code != 200:
-            logger.error(f"[Proxy] JanusGraph error: {janus_response.status_code} - {janus_response.text}")
-            raise HTTPException(
-                status_code=janus_response.status_code,
-                detail=f"JanusGraph error: {janus_response.text}"
-            )
-
-        full_data = janus_response.json()
-        logger.info(f"[Proxy] Received {len(full_data)} groups from Janus")
-
-        # RBAC Filtering – Only include allowed groups & items
-        filtered_data = []
-
-        for group in full_data:
-            group_name = group.get("name")
-            if not group_name:
-                continue
-            
-            # Utility returns list of investigations the user can read for this group
-            allowed_items = get_allowed_items_for_user(
-                current_user,
-                group_name,
-                full_data,
-                permission="read"
-            )
-
-            # Skip group with no readable items
-            if not allowed_items:
-                continue  
-            
-            # Create a shallow copy of the group with filtered investigations
-            group_copy = group.copy()
-            group_copy["investigations"] = [
-                item for item in group.get("investigations", [])
-                if item.get("name") in allowed_items
-            ]
-            filtered_data.append(group_copy)
+        # Push the user's group permissions into the LabX filter so the graph
+        # only returns groups they can read (admins are unrestricted)
+        upstream_body = body or {}
+        permitted = permitted_entities(current_user, "read")
+        if permitted is not None:
+            upstream_body = scope_list_request(upstream_body, permitted)
+            if upstream_body is None:
+                logger.info(f"[Proxy] No readable groups for user '{user_id}', skipping Janus")
+                return JSONResponse(content=[])
+
+        # Fetch permitted groups from Janus (or the short-lived cache)
+        full_data = await fetch_groups(upstream_body)
+
+        # RBAC Filtering – still applied to what comes back, one pass over
+        # the groups with a name -> items index
+        filtered_data = filter_groups_for_user(current_user, full_data, permission="read")
 
         logger.info(f"[Proxy] Filtered {len(filtered_data)} groups for user '{user_id}'")
         return JSONResponse(content=filtered_data)
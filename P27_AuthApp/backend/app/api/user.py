@@ -11,6 +11,8 @@ from app.models.user import UserModel, UserCreate, UserUpdate
 from app.db.connection import get_database
 from app.dependencies import get_current_user, verify_admin_user
 from app.utils.resolve_id import resolve_id
+from app.utils.user_cache import invalidate_user
+from app.utils.token_storage import delete_tokens_by_user
 
 # ───────────────────────────────────────────────────────────
 # Constants
@@ -116,6 +118,7 @@ async def update_user(
     result = await users_col.update_one({"_id": query_id}, {"$set": user.dict(exclude_unset=True)})
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
+    invalidate_user(user_id)
     updated = await users_col.find_one({"_id": query_id})
     updated["id"] = str(updated["_id"])
     del updated["_id"]
@@ -138,6 +141,8 @@ async def delete_user(
     result = await users_col.delete_one({"_id": query_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
+    invalidate_user(user_id)
+    await delete_tokens_by_user(str(query_id))
     logger.info(f"Admin {current_user.get('email')} deleted user: {user_id}")
     return None
 
@@ -152,6 +157,8 @@ async def deactivate_user(
     result = await users_col.update_one({"_id": query_id}, {"$set": {"status": "inactive"}})
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
+    invalidate_user(user_id)
+    await delete_tokens_by_user(str(query_id))
     logger.info(f"Admin {current_user.get('email')} deactivated user: {user_id}")
     return {"message": f"User {user_id} deactivated."}
 
@@ -166,5 +173,6 @@ async def activate_user(
     result = await users_col.update_one({"_id": query_id}, {"$set": {"status": "active"}})
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
+    invalidate_user(user_id)
     logger.info(f"Admin {current_user.get('email')} activated user: {user_id}")
     return {"message": f"User {user_id} activated."}
\ No newline at end of file
@@ -12,6 +12,13 @@ class Settings(BaseSettings):
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
     REFRESH_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
+    USER_CACHE_TTL_SECONDS: float = 30
+    USER_CACHE_SIZE: int = 1024
+    # Data proxy: pooled connections to LabX, and how long (seconds) an
+    # upstream list response may be reused; 0 turns the cache off
+    PROXY_MAX_CONNECTIONS: int = 100
+    PROXY_CACHE_TTL_SECONDS: float = 0
+    PROXY_CACHE_SIZE: int = 256
 
     model_config = SettingsConfigDict(
         env_file=".env",
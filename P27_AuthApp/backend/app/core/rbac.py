@@ -1,23 +1,73 @@
-from typing import Dict
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Optional, Tuple
 from fastapi import HTTPException, status
 
 
+# A user's entity_access compiled into a lookup table: the (entity, action)
+# pairs they are granted, plus the entity names per action. As before, the
+# first entry for an entity decides and only a value of exactly True grants.
+class PermissionMatrix:
+    def __init__(self, entity_access, is_admin: bool = False):
+        self.is_admin = is_admin
+        seen = set()
+        grants = set()
+        for access in entity_access:
+            name = access.get("name")
+            if name in seen:
+                continue
+            seen.add(name)
+            for action, allowed in access.items():
+                if action != "name" and allowed is True:
+                    grants.add((name, action))
+        self.grants: FrozenSet[Tuple[str, str]] = frozenset(grants)
+        by_action: Dict[str, set] = {}
+        for name, action in grants:
+            by_action.setdefault(action, set()).add(name)
+        self.by_action: Dict[str, FrozenSet[str]] = {a: frozenset(n) for a, n in by_action.items()}
+
+    def allows(self, entity_name: str, permission: str = "read") -> bool:
+        return self.is_admin or (entity_name, permission) in self.grants
+
+    # Entity names granted `permission`; None means unrestricted (admin).
+    def entities(self, permission: str = "read") -> Optional[FrozenSet[str]]:
+        if self.is_admin:
+            return None
+        return self.by_action.get(permission, frozenset())
+
+
+ADMIN_MATRIX = PermissionMatrix([], is_admin=True)
+MATRIX_CACHE_SIZE = 1024
+
+# Compiled matrices keyed by the identity of the user's entity_access list.
+# get_current_user hands out shallow copies of the cached user document, so
+# every request for the same user version shares one list, and a reloaded
+# user (after invalidate_user) brings a new one. The list is kept in the entry
+# so its id cannot be reused while cached.
+_matrices: "OrderedDict[int, Tuple[list, PermissionMatrix]]" = OrderedDict()
+
+def compile_permissions(user: Dict) -> PermissionMatrix:
+    if user.get("role", "") == "admin":
+        return ADMIN_MATRIX
+    entity_access = user.get("entity_access")
+    if not isinstance(entity_access, list):
+        return PermissionMatrix(entity_access or [])
+
+    key = id(entity_access)
+    entry = _matrices.get(key)
+    if entry is not None and entry[0] is entity_access:
+        _matrices.move_to_end(key)
+        return entry[1]
+    matrix = PermissionMatrix(entity_access)
+    _matrices[key] = (entity_access, matrix)
+    while len(_matrices) > MATRIX_CACHE_SIZE:
+        _matrices.popitem(last=False)
+    return matrix
+
 # Check if a user has a specific permission (read/write/delete) on an entity.
 # Admin users get full access to all entities.
 # All other users must have explicit permission via entity_access.
 def has_entity_permission(user: Dict, entity_name: str, permission: str = "read") -> bool:
-    role = user.get("role", "")
-    
-    # Admins get unrestricted access
-    if role == "admin":
-        return True
-
-    # Other users: evaluate based on their explicit entity_access
-    for access in user.get("entity_access", []):
-        if access.get("name") == entity_name:
-            return access.get(permission, False) is True
-
-    return False
+    return compile_permissions(user).allows(entity_name, permission)
 
 # Assert that a user has the given permission on a specific entity.
 def assert_entity_permission(user: Dict, entity_name: str, permission: str = "read") -> None:
@@ -5,6 +5,7 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from app.core.config import settings
 from app.db.connection import get_database
+from app.utils.user_cache import get_cached_user
 
 # This sets up FastAPI to expect a Bearer token in the header
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
@@ -26,7 +27,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
             )
 
         db = get_database()
-        user = await db["users"].find_one({"_id": user_id})
+        user = await get_cached_user(user_id, lambda: db["users"].find_one({"_id": user_id}))
 
         if not user:
             raise HTTPException(
@@ -34,7 +35,8 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
                 detail="User not found"
             )
 
-        return user
+        # Shallow copy: callers may edit the dict, the cached one stays intact
+        return dict(user)
 
     except JWTError:
         raise HTTPException(
@@ -3,11 +3,12 @@
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 
-from app.api.proxy import router as proxy
+from app.api.proxy import router as proxy, close_http_client
 from app.api import user, auth
 from app.core.logger import get_logger
 from app.core.config import settings
 from app.db.connection import get_client, close_client
+from app.utils.token_storage import ensure_token_indexes
 
 logger = get_logger("main")
 
@@ -16,11 +17,13 @@ async def lifespan(app: FastAPI):
     try:
         get_client()
         logger.info(" MongoDB connection opened")
+        await ensure_token_indexes()
         yield
     except Exception as e:
         logger.critical(f" Unexpected error during app lifespan: {e}")
         raise
     finally:
+        await close_http_client()
         close_client()
         logger.info(" MongoDB connection closed")
 
@@ -1,7 +1,7 @@
 # app/utils/rbac_utils.py
 
-from typing import List, Dict, Optional
-from app.core.rbac import has_entity_permission
+from typing import AbstractSet, Dict, List, Optional, Set
+from app.core.rbac import compile_permissions, has_entity_permission
 
 # Given an item name, return the group name it belongs to.
 def resolve_group_for_item(
@@ -36,3 +36,72 @@ def get_allowed_items_for_user(
         return []
 
     return resolve_items_for_group(group_name, investigation_groups)
+
+# Group name -> names of its investigations, built once per response so
+# lookups don't rescan every group. Like resolve_items_for_group, the first
+# group with a given name wins.
+def index_items_by_group(investigation_groups: List[Dict]) -> Dict[str, Set[str]]:
+    index: Dict[str, Set[str]] = {}
+    for group in investigation_groups:
+        name = group.get("name")
+        if name is not None and name not in index:
+            index[name] = {item.get("name") for item in group.get("investigations", [])}
+    return index
+
+# Entity names the user holds `permission` on, from the user's compiled
+# permission matrix. None means unrestricted (admin).
+def permitted_entities(user: Dict, permission: str = "read") -> Optional[AbstractSet[str]]:
+    return compile_permissions(user).entities(permission)
+
+# Same result as calling get_allowed_items_for_user for every group, in one
+# pass: permissions come from the compiled matrix and items from the group-name
+# index. Groups with no readable items are dropped; the input groups are not
+# modified.
+def filter_groups_for_user(
+    user: Dict,
+    investigation_groups: List[Dict],
+    permission: str = "read"
+) -> List[Dict]:
+    index = index_items_by_group(investigation_groups)
+    permitted = permitted_entities(user, permission)
+    filtered = []
+    for group in investigation_groups:
+        group_name = group.get("name")
+        if not group_name:
+            continue
+        if permitted is not None and group_name not in permitted:
+            continue
+        if not index[group_name]:
+            continue
+        group_copy = group.copy()
+        group_copy["investigations"] = [
+            item for item in group.get("investigations", [])
+            if item.get("name") in index[group_name]
+        ]
+        filtered.append(group_copy)
+    return filtered
+
+# Narrow a LabX list request body ({"params": [{"filter": {...}, ...}]}) to the
+# groups in `permitted`, so the graph only returns those. A name the caller
+# already filters on is intersected with the permitted set. Returns None when
+# no group can match, i.e. there is no need to ask upstream at all. `body` is
+# not modified.
+def scope_list_request(body: Dict, permitted: AbstractSet[str]) -> Optional[Dict]:
+    params = list(body.get("params") or [{}])
+    first = dict(params[0] or {})
+    filters = dict(first.get("filter") or {})
+
+    requested = filters.get("name")
+    if requested in (None, ""):
+        names = permitted
+    elif isinstance(requested, list):
+        names = permitted.intersection(requested)
+    else:
+        names = permitted & {requested}
+    if not names:
+        return None
+
+    filters["name"] = sorted(names)
+    first["filter"] = filters
+    params[0] = first
+    return {**body, "params": params}
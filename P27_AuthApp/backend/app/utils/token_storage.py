@@ -1,37 +1,73 @@
 # app/services/token_storage.py
 
+import hashlib
 from datetime import datetime, timedelta
 from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ASCENDING, IndexModel
 from app.db.connection import get_database
 from app.core.logger import get_logger
 
 logger = get_logger("token")
 
+# Refresh tokens are stored under the SHA-256 of the token as _id (unique by
+# construction, and the raw token never hits the database). expires_at has a
+# TTL index so MongoDB deletes expired rows itself, and user_id is indexed for
+# revoking every session of a user at once.
+TOKEN_INDEXES = [
+    IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    IndexModel([("user_id", ASCENDING)]),
+]
+
 async def get_token_collection() -> AsyncIOMotorCollection:
     db = get_database()
     return db["refresh_tokens"]
 
+def token_id(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+async def ensure_token_indexes():
+    collection = await get_token_collection()
+    # Rows from before hashing kept the raw token under an ObjectId; re-key them.
+    async for doc in collection.find({"token": {"$exists": True}}):
+        await collection.update_one(
+            {"_id": token_id(doc["token"])},
+            {"$setOnInsert": {
+                "user_id": doc.get("user_id"),
+                "expires_at": doc.get("expires_at", datetime.utcnow()),
+                "created_at": doc.get("created_at", datetime.utcnow()),
+            }},
+            upsert=True,
+        )
+        await collection.delete_one({"_id": doc["_id"]})
+    await collection.create_indexes(TOKEN_INDEXES)
+    logger.info("Refresh token indexes ensured")
+
 async def store_refresh_token(user_id: str, token: str, expires_minutes: int = 60 * 24 * 7):
     collection = await get_token_collection()
     expire_at = datetime.utcnow() + timedelta(minutes=expires_minutes)
     await collection.insert_one({
+        "_id": token_id(token),
         "user_id": user_id,
-        "token": token,
         "expires_at": expire_at,
         "created_at": datetime.utcnow()
     })
     logger.info(f"Refresh token stored for user: {user_id}")
 
 async def is_token_valid(token: str) -> bool:
+    # The TTL monitor only runs about once a minute, so check expiry here too.
     collection = await get_token_collection()
-    return await collection.find_one({"token": token}) is not None
+    found = await collection.find_one(
+        {"_id": token_id(token), "expires_at": {"$gt": datetime.utcnow()}},
+        {"_id": 1}
+    )
+    return found is not None
 
 async def delete_token(token: str):
     collection = await get_token_collection()
-    await collection.delete_one({"token": token})
-    logger.info(f"Refresh token deleted: {token}")
+    await collection.delete_one({"_id": token_id(token)})
+    logger.info("Refresh token deleted")
 
 async def delete_tokens_by_user(user_id: str):
     collection = await get_token_collection()
-    await collection.delete_many({"user_id": user_id})
-    logger.info(f"All refresh tokens cleared for user: {user_id}")
+    result = await collection.delete_many({"user_id": user_id})
+    logger.info(f"{result.deleted_count} refresh tokens cleared for user: {user_id}")
@@ -0,0 +1,31 @@
+# app/utils/user_cache.py
+
+from typing import Any, Awaitable, Callable, Optional
+
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.utils.ttl_cache import TTLCache
+
+logger = get_logger("user_cache")
+
+# User documents loaded by get_current_user, keyed by the token's user ID
+user_cache = TTLCache(settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL_SECONDS)
+
+# Bumped by invalidate_user(); a lookup that overlapped it is not cached
+_version = 0
+
+async def get_cached_user(user_id: str, load: Callable[[], Awaitable[Optional[Any]]]) -> Optional[Any]:
+    user = user_cache.get(user_id)
+    if user is None:
+        version = _version
+        user = await load()
+        if user is not None and version == _version:
+            user_cache.put(user_id, user)
+    return user
+
+def invalidate_user(user_id: str):
+    """Call after any write to a user document (update, activate/deactivate, delete)."""
+    global _version
+    _version += 1
+    user_cache.pop(str(user_id))
+    logger.info(f"Cached user dropped: {user_id}")
@@ -0,0 +1,100 @@
+# bench_rbac.py
+#
+# Times permission checks for a user with many entity grants:
+#   - the old has_entity_permission, a linear scan of entity_access per call;
+#   - has_entity_permission now, a lookup in the compiled PermissionMatrix
+#     (compiled once, then shared by every request for that user version);
+#   - filter_groups_for_user over as many groups as there are grants, against
+#     the old per-group get_allowed_items_for_user loop.
+# Also checks both give the same answers. No database or server needed.
+#
+#   cd P27_AuthApp/backend && python bench_rbac.py [grants] [rounds]
+
+import random
+import statistics
+import sys
+import time
+
+from app.core.rbac import PermissionMatrix, compile_permissions, has_entity_permission
+from app.utils.rbac_utils import filter_groups_for_user, resolve_items_for_group
+
+GRANTS = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+ROUNDS = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+# has_entity_permission as it was before the matrix.
+def legacy_has_entity_permission(user, entity_name, permission="read"):
+    if user.get("role", "") == "admin":
+        return True
+    for access in user.get("entity_access", []):
+        if access.get("name") == entity_name:
+            return access.get(permission, False) is True
+    return False
+
+def legacy_filter_groups(user, groups, permission="read"):
+    filtered = []
+    for group in groups:
+        name = group.get("name")
+        if not name or not legacy_has_entity_permission(user, name, permission):
+            continue
+        allowed = resolve_items_for_group(name, groups)
+        if not allowed:
+            continue
+        copy = group.copy()
+        copy["investigations"] = [i for i in group.get("investigations", []) if i.get("name") in allowed]
+        filtered.append(copy)
+    return filtered
+
+def make_user(n):
+    rng = random.Random(42)
+    return {
+        "_id": "bench-user",
+        "role": "user",
+        "entity_access": [
+            {"name": f"Group{i}", "read": rng.random() < 0.7, "write": rng.random() < 0.2}
+            for i in range(n)
+        ],
+    }
+
+def make_groups(n):
+    return [
+        {"name": f"Group{i}", "investigations": [{"name": f"Inv{i}-{j}"} for j in range(3)]}
+        for i in range(n)
+    ]
+
+def timed(fn, rounds=ROUNDS):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+def main():
+    user = make_user(GRANTS)
+    groups = make_groups(GRANTS)
+    names = [f"Group{i}" for i in range(GRANTS)] + ["Missing"]
+
+    same = all(
+        legacy_has_entity_permission(user, n, p) == has_entity_permission(user, n, p)
+        for n in names for p in ("read", "write", "delete")
+    )
+    same_filter = legacy_filter_groups(user, groups[:500]) == filter_groups_for_user(user, groups[:500])
+    print(f"grants: {GRANTS}, same checks: {same}, same filtered groups (first 500): {same_filter}")
+
+    checks = len(names)
+    legacy = timed(lambda: [legacy_has_entity_permission(user, n) for n in names], rounds=max(1, ROUNDS // 10))
+    compiled = timed(lambda: [has_entity_permission(user, n) for n in names])
+    compile_once = timed(lambda: PermissionMatrix(user["entity_access"]))
+    print(f"{'linear scan':>22}: {legacy * 1e3:9.2f} ms for {checks} checks")
+    print(f"{'compiled matrix':>22}: {compiled * 1e3:9.2f} ms for {checks} checks")
+    print(f"{'compile (cache miss)':>22}: {compile_once * 1e3:9.2f} ms")
+
+    compile_permissions(user)
+    subset = groups[:min(GRANTS, 1_000)]
+    old = timed(lambda: legacy_filter_groups(user, subset), rounds=max(1, ROUNDS // 10))
+    new = timed(lambda: filter_groups_for_user(user, subset))
+    print(f"{'filter, per-group scan':>22}: {old * 1e3:9.2f} ms for {len(subset)} groups")
+    print(f"{'filter, matrix':>22}: {new * 1e3:9.2f} ms for {len(subset)} groups")
+
+if __name__ == "__main__":
+    main()
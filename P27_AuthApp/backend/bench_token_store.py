@@ -0,0 +1,102 @@
+# bench_token_store.py
+#
+# Grows the refresh_tokens collection in steps (fake rows tagged bench=True)
+# and times a token lookup at each size:
+#   - the lookup is_token_valid() runs now (hashed _id, expiry check);
+#   - the old one, find_one({"token": ...}), on an unindexed copy (up to
+#     LEGACY_MAX rows, since it is a full scan);
+#   - POST /auth/refresh end to end, when BENCH_URL, BENCH_EMAIL and
+#     BENCH_PASSWORD point at a running app using the same database.
+# The fake rows are removed at the end.
+#
+#   cd P27_AuthApp/backend && python bench_token_store.py [max_rows]
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import httpx
+
+from app.db.connection import get_database
+from app.utils.token_storage import ensure_token_indexes, get_token_collection, is_token_valid, token_id
+
+MAX_ROWS   = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+STEPS      = [n for n in (10_000, 100_000, 1_000_000, 5_000_000) if n <= MAX_ROWS]
+LEGACY_MAX = 100_000
+ROUNDS     = 200
+BATCH      = 10_000
+
+BENCH_URL      = os.getenv("BENCH_URL")
+BENCH_EMAIL    = os.getenv("BENCH_EMAIL")
+BENCH_PASSWORD = os.getenv("BENCH_PASSWORD")
+
+def fake_rows(n, legacy=False):
+    expires = datetime.utcnow() + timedelta(days=7)
+    for _ in range(n):
+        token = uuid.uuid4().hex * 4
+        row = {"user_id": "bench", "expires_at": expires, "created_at": datetime.utcnow(), "bench": True}
+        if legacy:
+            row["token"] = token
+        else:
+            row["_id"] = token_id(token)
+        yield row
+
+async def grow(collection, target, legacy=False):
+    have = await collection.count_documents({"bench": True})
+    rows = fake_rows(target - have, legacy)
+    while True:
+        batch = [r for _, r in zip(range(BATCH), rows)]
+        if not batch:
+            break
+        await collection.insert_many(batch, ordered=False)
+
+async def median_ms(fn):
+    samples = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e3
+
+async def main():
+    await ensure_token_indexes()
+    tokens = await get_token_collection()
+    legacy = get_database()["refresh_tokens_bench_legacy"]
+
+    probe = uuid.uuid4().hex * 4  # never stored: the worst case, a miss
+    http = cookie = None
+    if BENCH_URL and BENCH_EMAIL and BENCH_PASSWORD:
+        http = httpx.AsyncClient(base_url=BENCH_URL)
+        login = await http.post("/auth/login", json={"email": BENCH_EMAIL, "password": BENCH_PASSWORD})
+        login.raise_for_status()
+        cookie = login.json()["refresh_token"]
+
+    try:
+        print(f"{'rows':>10} {'is_token_valid':>15} {'old scan':>10} {'/auth/refresh':>14}")
+        for n in STEPS:
+            await grow(tokens, n)
+            new_ms = await median_ms(lambda: is_token_valid(probe))
+
+            old_ms = "-"
+            if n <= LEGACY_MAX:
+                await grow(legacy, n, legacy=True)
+                old_ms = f"{await median_ms(lambda: legacy.find_one({'token': probe})):8.2f}ms"
+
+            http_ms = "-"
+            if http:
+                refresh = lambda: http.post("/auth/refresh", cookies={"refresh_token": cookie})
+                http_ms = f"{await median_ms(refresh):12.2f}ms"
+
+            print(f"{n:>10} {new_ms:13.3f}ms {old_ms:>10} {http_ms:>14}")
+    finally:
+        await tokens.delete_many({"bench": True})
+        await legacy.drop()
+        if http:
+            await http.aclose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -13,5 +13,9 @@ class AppConfig(BaseSettings):
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
     REFRESH_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7 
+    USER_CACHE_TTL_SECONDS: float = 30
+    USER_CACHE_SIZE: int = 1024
+    BLACKLIST_BLOOM_CAPACITY: int = 100_000
+    BLACKLIST_BLOOM_ERROR_RATE: float = 0.01
 
 config = AppConfig()
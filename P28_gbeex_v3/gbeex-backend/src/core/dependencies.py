@@ -4,6 +4,7 @@ from src.core.security import decode_token
 from src.db.crud.user import get_user_by_id
 from src.models.user_response import UserPublic
 from src.core.logger import logger
+from src.core.user_cache import get_user_cached
 
 # This tells FastAPI to extract the token from the Authorization header
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
@@ -16,7 +17,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserPublic:
         user_id = decode_token(token)
         logger.debug(f"[AUTH] Decoded user_id from token: {user_id}")
 
-        user = await get_user_by_id(user_id)
+        user = await get_user_cached(user_id, lambda: get_user_by_id(user_id))
         if not user:
             logger.warning(f"[AUTH] User not found for ID: {user_id}")
             raise HTTPException(
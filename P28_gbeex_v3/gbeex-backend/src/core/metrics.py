@@ -0,0 +1,112 @@
+# src/core/metrics.py
+# In-process metrics rendered in the Prometheus text format on /metrics.
+#   - http_request_duration_seconds: latency histogram per method/route/status
+#   - http_requests_in_flight: requests currently being handled, per method
+#   - mongodb_commands_total / mongodb_command_duration_seconds: every command
+#     the Motor client sends, via a pymongo command listener
+# Listener callbacks run on Motor's worker threads, so updates take a lock.
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{str(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str]):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple[str, ...], amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.label_names, k)} {v}" for k, v in items]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, labels: Tuple[str, ...], amount: float = 1) -> None:
+        self.inc(labels, -amount)
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str], buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        # labels -> [cumulative bucket counts..., sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        lines = []
+        for labels, series in items:
+            bounds = [str(b) for b in self.buckets] + ["+Inf"]
+            for bound, n in zip(bounds, series[:len(self.buckets)] + [series[-1]]):
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, le)} {n}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {series[-2]}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {series[-1]}")
+        return lines
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route", "status"]
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled", ["method"]
+)
+MONGO_COMMANDS = Counter(
+    "mongodb_commands_total", "MongoDB commands sent, by outcome", ["command", "outcome"]
+)
+MONGO_LATENCY = Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency", ["command"]
+)
+
+METRICS = (REQUEST_LATENCY, REQUESTS_IN_FLIGHT, MONGO_COMMANDS, MONGO_LATENCY)
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    # Pass to the Motor client as event_listeners=[MongoCommandMetrics()].
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMANDS.inc((event.command_name, "ok"))
+        MONGO_LATENCY.observe((event.command_name,), event.duration_micros / 1e6)
+
+    def failed(self, event):
+        MONGO_COMMANDS.inc((event.command_name, "error"))
+        MONGO_LATENCY.observe((event.command_name,), event.duration_micros / 1e6)
+
+def render_metrics() -> str:
+    lines = []
+    for metric in METRICS:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
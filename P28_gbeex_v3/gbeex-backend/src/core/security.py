@@ -1,16 +1,33 @@
 # src/core/security.py
 
+import hashlib
+import uuid
 from datetime import datetime, timedelta
 from jose import jwt, JWTError, ExpiredSignatureError
 from fastapi import HTTPException, status
 from passlib.context import CryptContext
 from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import DuplicateKeyError
 
+from src.core.bloom import BloomFilter
 from src.core.config import config
+from src.core.logger import logger
 from src.db.mongo import mongo
 
 BLACKLIST_COLLECTION = "blacklisted_tokens"
 
+# Revoked refresh tokens are stored by SHA-256 hash (never the raw token),
+# unique on the hash and removed by a TTL index once the token would have
+# expired anyway. An in-process Bloom filter of the hashes answers the common
+# "not revoked" case without a DB round trip.
+BLACKLIST_INDEXES = [
+    IndexModel([("token_hash", ASCENDING)], unique=True, sparse=True),
+    IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+]
+
+blacklist_filter = BloomFilter(config.BLACKLIST_BLOOM_CAPACITY, config.BLACKLIST_BLOOM_ERROR_RATE)
+
 # Create a bcrypt context for password hashing/verification
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -36,6 +53,7 @@ def create_access_token(subject: str, expires_delta: timedelta | None = None) ->
         "sub": str(subject),
         "exp": expire,
         "iat": datetime.utcnow(),
+        "jti": uuid.uuid4().hex,
     }
 
     return jwt.encode(
@@ -56,6 +74,7 @@ def create_refresh_token(subject: str, expires_delta: timedelta | None = None) -
         "sub": str(subject),
         "exp": expire,
         "iat": datetime.utcnow(),
+        "jti": uuid.uuid4().hex,
     }
 
     return jwt.encode(
@@ -91,7 +110,8 @@ async def refresh_tokens(old_refresh_token: str) -> tuple[str, str, str]:
     Handle refresh token rotation securely:
     - Verify token is not blacklisted.
     - Decode it.
-    - Blacklist old token.
+    - Blacklist old token (the unique index makes this fail for a token
+      another request already used, even one this process's filter missed).
     - Issue new access and refresh tokens.
     """
     if await is_token_blacklisted(old_refresh_token):
@@ -102,7 +122,11 @@ async def refresh_tokens(old_refresh_token: str) -> tuple[str, str, str]:
 
     user_id = decode_token(old_refresh_token)
 
-    await blacklist_token(old_refresh_token)
+    if not await blacklist_token(old_refresh_token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token is blacklisted",
+        )
 
     new_access_token = create_access_token(subject=user_id)
     new_refresh_token = create_refresh_token(subject=user_id)
@@ -110,26 +134,76 @@ async def refresh_tokens(old_refresh_token: str) -> tuple[str, str, str]:
     return user_id, new_access_token, new_refresh_token
 
 
-async def blacklist_token(token: str) -> None:
-    " Store a refresh token in the blacklist collection. "
+def token_hash(token: str) -> str:
+    " Blacklist key for a token: its SHA-256, so raw tokens are never stored. "
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
 
+
+def _token_expiry(token: str) -> datetime:
+    " When the blacklist entry can go: the token's own exp, capped at the refresh lifetime. "
+    latest = datetime.utcnow() + timedelta(minutes=config.REFRESH_TOKEN_EXPIRE_MINUTES)
+    try:
+        exp = jwt.get_unverified_claims(token).get("exp")
+        return min(datetime.utcfromtimestamp(int(exp)), latest)
+    except Exception:
+        return latest
+
+
+def _blacklist_collection() -> AsyncIOMotorCollection:
     if mongo.db_instance is None:
         raise RuntimeError("MongoDB is not connected")
+    return mongo.db_instance[BLACKLIST_COLLECTION]
+
 
-    collection: AsyncIOMotorCollection = mongo.db_instance[BLACKLIST_COLLECTION]
+async def init_token_blacklist() -> None:
+    """
+    Create the blacklist indexes, convert entries stored as raw tokens, and
+    load the hashes of everything still blacklisted into the Bloom filter.
+    """
+    global blacklist_filter
+    collection = _blacklist_collection()
+
+    async for doc in collection.find({"token": {"$exists": True}, "token_hash": {"$exists": False}}):
+        await collection.update_one(
+            {"_id": doc["_id"]},
+            {"$set": {"token_hash": token_hash(doc["token"]), "expires_at": _token_expiry(doc["token"])},
+             "$unset": {"token": ""}},
+        )
+    await collection.create_indexes(BLACKLIST_INDEXES)
 
-    await collection.insert_one({
-        "token": token,
-        "blacklisted_at": datetime.utcnow()
-    })
+    hashes = [doc["token_hash"] async for doc in collection.find({}, {"_id": 0, "token_hash": 1})]
+    capacity = max(config.BLACKLIST_BLOOM_CAPACITY, 2 * len(hashes))
+    bloom = BloomFilter(capacity, config.BLACKLIST_BLOOM_ERROR_RATE)
+    for h in hashes:
+        bloom.add(h)
+    blacklist_filter = bloom
+    logger.info(f"[BLACKLIST] {len(hashes)} revoked tokens loaded (filter capacity {capacity}).")
 
 
-async def is_token_blacklisted(token: str) -> bool:
-    "Check whether a refresh token has already been used or blacklisted."
+async def blacklist_token(token: str) -> bool:
+    " Store a refresh token's hash in the blacklist. False if it was already there. "
+    key = token_hash(token)
+    blacklist_filter.add(key)
+    try:
+        await _blacklist_collection().insert_one({
+            "token_hash": key,
+            "blacklisted_at": datetime.utcnow(),
+            "expires_at": _token_expiry(token),
+        })
+    except DuplicateKeyError:
+        return False
+
+    if blacklist_filter.count > blacklist_filter.capacity:
+        # Past capacity the false-positive rate climbs; rebuild from the
+        # entries the TTL index hasn't removed yet.
+        await init_token_blacklist()
+    return True
 
-    if mongo.db_instance is None:
-        raise RuntimeError("MongoDB is not connected")
 
-    collection: AsyncIOMotorCollection = mongo.db_instance[BLACKLIST_COLLECTION]
-    result = await collection.find_one({"token": token})
+async def is_token_blacklisted(token: str) -> bool:
+    "Check whether a refresh token has already been used or blacklisted."
+    key = token_hash(token)
+    if key not in blacklist_filter:
+        return False
+    result = await _blacklist_collection().find_one({"token_hash": key}, {"_id": 1})
     return result is not None
@@ -0,0 +1,29 @@
+# src/core/user_cache.py
+# get_current_user's user lookups, cached per user ID for
+# USER_CACHE_TTL_SECONDS, at most USER_CACHE_SIZE users (least recently used
+# dropped first). This app never writes user documents, so an entry can only
+# go stale through edits made elsewhere, and only until it expires.
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional, Tuple
+
+from src.core.config import config
+from src.models.user_model import UserInDB
+
+_users: "OrderedDict[str, Tuple[float, UserInDB]]" = OrderedDict()
+
+async def get_user_cached(user_id: str, load: Callable[[], Awaitable[Optional[UserInDB]]]) -> Optional[UserInDB]:
+    entry = _users.get(user_id)
+    if entry is not None and entry[0] > time.monotonic():
+        _users.move_to_end(user_id)
+        return entry[1]
+
+    user = await load()
+    if user is None:
+        _users.pop(user_id, None)
+        return None
+    _users[user_id] = (time.monotonic() + config.USER_CACHE_TTL_SECONDS, user)
+    _users.move_to_end(user_id)
+    while len(_users) > config.USER_CACHE_SIZE:
+        _users.popitem(last=False)
+    return user
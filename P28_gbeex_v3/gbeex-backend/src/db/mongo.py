@@ -2,6 +2,7 @@ from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from pymongo.errors import PyMongoError, ServerSelectionTimeoutError
 from src.core.config import config
 from src.core.logger import logger
+from src.core.metrics import MongoCommandMetrics
 
 class MongoDB:
     client: AsyncIOMotorClient | None = None
@@ -12,7 +13,11 @@ mongo = MongoDB() # This is the single instance of MongoDB management
 async def connect_to_mongo():
     try:
         logger.info("Connecting to MongoDB...")
-        mongo.client = AsyncIOMotorClient(config.MONGO_URI, serverSelectionTimeoutMS=5000)
+        mongo.client = AsyncIOMotorClient(
+            config.MONGO_URI,
+            serverSelectionTimeoutMS=5000,
+            event_listeners=[MongoCommandMetrics()],  # counted and timed for /metrics
+        )
 
         # Explicitly ping the admin database to confirm server reachability
         await mongo.client.admin.command("ping")
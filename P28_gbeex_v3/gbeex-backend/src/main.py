@@ -3,13 +3,15 @@
 import uvicorn
 import time
 from fastapi import FastAPI, Request, Response 
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 from src.core.config import config
 from src.core.logger import logger
+from src.core.metrics import REQUEST_LATENCY, REQUESTS_IN_FLIGHT, render_metrics
 from src.db.mongo import connect_to_mongo, close_mongo_connection, mongo
+from src.core.security import init_token_blacklist
 
 from src.routes import auth
 from src.routes import notification
@@ -24,6 +26,7 @@ async def lifespan(app: FastAPI):
             logger.critical("MongoDB connection reported successful but mongo.db_instance is still None in lifespan.")
             raise RuntimeError("MongoDB connection failed to initialize database instance.")
         logger.info("MongoDB connection confirmed in lifespan context.")
+        await init_token_blacklist()
         yield
     finally:
         logger.info(f" Shutting down {config.APP_NAME}...")
@@ -70,6 +73,25 @@ async def log_requests(request: Request, call_next):
     
     return response
 
+# --- Metrics Middleware ---
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    if request.url.path == "/metrics":
+        return await call_next(request)
+    method = request.method
+    REQUESTS_IN_FLIGHT.inc((method,))
+    start_time = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        REQUESTS_IN_FLIGHT.dec((method,))
+        # Label by route template rather than raw path so IDs don't create new series
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        REQUEST_LATENCY.observe((method, route, str(status_code)), time.perf_counter() - start_time)
+
 # --- API Routers ---
 # Placeholder for your API routers
 # from src.api.v1.routers.auth import router as auth_router
@@ -96,6 +118,11 @@ async def health_check():
         logger.error(f"Health check failed during ping command: {e}")
         return JSONResponse(status_code=503, content={"status": "fail", "db": "unavailable"})
 
+# --- Metrics Route (Prometheus text format) ---
+@app.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 # --- Spec Route ---
 @app.get("/spec")
 async def get_spec():
@@ -5,10 +5,13 @@
 # 1. pip install "fastapi[all]" motor python-jose[cryptography] "passlib[bcrypt]"
 # 2. uvicorn main:app --reload
 
+import asyncio
 import os
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta, timezone
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 import bcrypt
 from fastapi import Depends, FastAPI, HTTPException, status, Request
@@ -16,8 +19,12 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, IndexModel, ReturnDocument
+from pymongo.errors import OperationFailure
 from pydantic import BaseModel, Field, ConfigDict, ValidationError
 
+from user_cache import UserCache
+
 # --- Configuration ---
 MONGO_URI = "mongodb://localhost:27017/"
 DATABASE_NAME = "GBeeXData"
@@ -27,10 +34,21 @@ SECRET_KEY = "@password@1234567890@@password@1234567890"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 LOCKOUT_DURATION_MINUTES = 5 
+ADMIN_ROLE = "admin"
+USER_CACHE_TTL_SECONDS = 30
+USER_CACHE_SIZE = 1024
+BCRYPT_MAX_CONCURRENCY = int(os.getenv("BCRYPT_MAX_CONCURRENCY", str(min(4, os.cpu_count() or 1))))
+BCRYPT_MAX_QUEUE = int(os.getenv("BCRYPT_MAX_QUEUE", "100"))
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-app = FastAPI(title="GBeeX API", version="1.2.3") 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await ensure_indexes()
+    yield
+    bcrypt_executor.shutdown(wait=False, cancel_futures=True)
+
+app = FastAPI(title="GBeeX API", version="1.2.3", lifespan=lifespan) 
 
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
@@ -49,6 +67,56 @@ app.add_middleware(
 client = AsyncIOMotorClient(MONGO_URI)
 db = client[DATABASE_NAME]
 
+# --- Indexes ---
+# Every index the endpoints rely on, created at startup. INDEX_QUERIES names
+# the field each lookup filters on, so /api/v1/admin/indexes can list lookups
+# with no index starting on that field.
+INDEXES = {
+    USER_COLLECTION: [
+        IndexModel([("username", ASCENDING)], unique=True),
+    ],
+    COMPANY_COLLECTION: [
+        IndexModel([("companyId", ASCENDING)]),
+        IndexModel([("protocols.protocolId", ASCENDING)]),
+        IndexModel([("protocols.sites.siteId", ASCENDING)]),
+        IndexModel([("protocols.sites.subjects.subjectId", ASCENDING)]),
+    ],
+}
+
+INDEX_QUERIES = [
+    ("login_for_access_token, get_current_user", USER_COLLECTION, "username"),
+    ("get_company_details, list_protocols_for_company", COMPANY_COLLECTION, "companyId"),
+    ("get_sites_for_protocol", COMPANY_COLLECTION, "protocols.protocolId"),
+    ("site lookup by siteId", COMPANY_COLLECTION, "protocols.sites.siteId"),
+    ("subject lookup by subjectId", COMPANY_COLLECTION, "protocols.sites.subjects.subjectId"),
+]
+
+# Index name -> error for indexes that could not be built at startup
+INDEX_ERRORS: Dict[str, str] = {}
+
+async def ensure_indexes():
+    # Index by index: a unique index over existing duplicates (two users with
+    # the same username) is logged and reported, it does not stop the app.
+    for name, models in INDEXES.items():
+        for model in models:
+            try:
+                await db[name].create_indexes([model])
+            except OperationFailure as e:
+                logging.error(f"Index {name}.{model.document['name']} not created: {e}")
+                INDEX_ERRORS[f"{name}.{model.document['name']}"] = str(e)
+
+async def index_report() -> Dict[str, Any]:
+    report = {"missing": [], "failed": INDEX_ERRORS, "unindexed_queries": []}
+    first_keys = {}
+    for name, models in INDEXES.items():
+        info = await db[name].index_information()
+        first_keys[name] = {spec["key"][0][0] for spec in info.values()}
+        report["missing"] += [f"{name}.{m.document['name']}" for m in models if m.document["name"] not in info]
+    for query, name, field in INDEX_QUERIES:
+        if field not in first_keys[name]:
+            report["unindexed_queries"].append(query)
+    return report
+
 # --- Pydantic Models ---
 class Token(BaseModel):
     access_token: str
@@ -113,11 +181,40 @@ class SiteDashboardItem(BaseModel):
     location: SiteLocation
     sitePerformanceSummary: SitePerformanceSummary
 
+# --- User Cache (per username; writes to a user call USER_CACHE.invalidate) ---
+USER_CACHE = UserCache(USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS)
+
 # --- Security and Authentication ---
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+# Password checks run on bcrypt_executor so the event loop keeps serving other
+# requests during a login burst. GET /api/v1/admin/bcrypt shows BCRYPT_STATS.
+bcrypt_executor = ThreadPoolExecutor(max_workers=BCRYPT_MAX_CONCURRENCY, thread_name_prefix="bcrypt")
+bcrypt_slots = asyncio.Semaphore(BCRYPT_MAX_CONCURRENCY)
+BCRYPT_STATS = {"queue_depth": 0, "in_progress": 0, "rejected": 0}
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    if BCRYPT_STATS["queue_depth"] >= BCRYPT_MAX_QUEUE:
+        BCRYPT_STATS["rejected"] += 1
+        logging.warning(f"Rejecting login: {BCRYPT_STATS['queue_depth']} password checks already waiting")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many logins in progress, try again shortly",
+            headers={"Retry-After": "1"},
+        )
+    BCRYPT_STATS["queue_depth"] += 1
+    try:
+        await bcrypt_slots.acquire()
+    finally:
+        BCRYPT_STATS["queue_depth"] -= 1
+    BCRYPT_STATS["in_progress"] += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            bcrypt_executor, bcrypt.checkpw, plain_password.encode('utf-8'), hashed_password.encode('utf-8')
+        )
+    finally:
+        BCRYPT_STATS["in_progress"] -= 1
+        bcrypt_slots.release()
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -139,26 +236,64 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserInDB:
     except JWTError:
         raise credentials_exception
     
-    logging.info(f"[DB QUERY] get_current_user: Finding user '{username}' in '{USER_COLLECTION}'")
-    user_doc = await db[USER_COLLECTION].find_one({"username": username})
-    
-    if user_doc is None:
-        raise credentials_exception
-    
-    try:
-        return UserInDB(**user_doc)
-    except ValidationError as e:
-        logging.error("--- Pydantic Validation Error in get_current_user ---")
-        logging.error(f"User document that failed validation: {user_doc}")
-        logging.error(e)
-        logging.error("----------------------------------------------------")
-        raise credentials_exception
+    async def load_user() -> Optional[UserInDB]:
+        logging.info(f"[DB QUERY] get_current_user: Finding user '{username}' in '{USER_COLLECTION}'")
+        user_doc = await db[USER_COLLECTION].find_one({"username": username})
+        if user_doc is None:
+            return None
+        try:
+            return UserInDB(**user_doc)
+        except ValidationError as e:
+            logging.error("--- Pydantic Validation Error in get_current_user ---")
+            logging.error(f"User document that failed validation: {user_doc}")
+            logging.error(e)
+            logging.error("----------------------------------------------------")
+            return None
+
+    user = USER_CACHE.get(username)
+    if user is None:
+        version = USER_CACHE.version
+        user = await load_user()
+        if user is None:
+            raise credentials_exception
+        USER_CACHE.put(username, user, version)
+    return user
+
+async def require_admin(current_user: UserInDB = Depends(get_current_user)) -> UserInDB:
+    if current_user.role.lower() != ADMIN_ROLE:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return current_user
 
 # --- API Endpoints ---
 @app.get("/", tags=["Root"])
 async def read_root():
     return {"message": "Welcome to the GBeeX API"}
 
+async def record_failed_login(username: str) -> Optional[dict]:
+    # Used by login_for_access_token after a wrong password. The user_doc it
+    # read may already be stale, so the counting happens in the update itself
+    # (a pipeline on the users collection of the module-level db): bump
+    # failedLoginAttempts, and at maxLoginAttempts set lockoutUntil and start
+    # again from 0. Still-locked accounts don't match, so None means another
+    # login locked it in the meantime. The caller evicts the user from
+    # USER_CACHE afterwards.
+    logging.info(f"[DB QUERY] login: Recording failed attempt for '{username}' in '{USER_COLLECTION}'")
+    now = datetime.utcnow()
+    attempts = {"$add": [{"$ifNull": ["$failedLoginAttempts", 0]}, 1]}
+    reached = {"$gte": ["$failedLoginAttempts", {"$ifNull": ["$maxLoginAttempts", 5]}]}
+    return await db[USER_COLLECTION].find_one_and_update(
+        {"username": username, "$or": [{"lockoutUntil": None}, {"lockoutUntil": {"$lte": now}}]},
+        [
+            {"$set": {"failedLoginAttempts": attempts}},
+            {"$set": {
+                "lockoutUntil": {"$cond": [reached, now + timedelta(minutes=LOCKOUT_DURATION_MINUTES), None]},
+                "failedLoginAttempts": {"$cond": [reached, 0, "$failedLoginAttempts"]},
+            }},
+        ],
+        projection={"failedLoginAttempts": 1, "lockoutUntil": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+
 @app.post("/api/v1/auth/login", response_model=Token, tags=["Authentication"])
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
     logging.info(f"[DB QUERY] login: Finding user '{form_data.username}' in '{USER_COLLECTION}'")
@@ -178,21 +313,19 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
             detail=f"Account locked. Please try again later."
         )
 
-    if not verify_password(form_data.password, user_doc["passwordHash"]):
+    if not await verify_password(form_data.password, user_doc["passwordHash"]):
         logging.warning(f"Failed login attempt for user: {form_data.username}")
-        new_attempts = user_doc.get("failedLoginAttempts", 0) + 1
-        max_attempts = user_doc.get("maxLoginAttempts", 5)
-        update_data = {"$set": {"failedLoginAttempts": new_attempts}}
-
-        if new_attempts >= max_attempts:
-            lockout_time = datetime.utcnow() + timedelta(minutes=LOCKOUT_DURATION_MINUTES)
-            update_data["$set"]["lockoutUntil"] = lockout_time
-            update_data["$set"]["failedLoginAttempts"] = 0 
-            logging.warning(f"Locking account for user: {form_data.username}")
-            
-        await db[USER_COLLECTION].update_one({"username": form_data.username}, update_data)
-        
-        if "lockoutUntil" in update_data["$set"]:
+        updated = await record_failed_login(form_data.username)
+        USER_CACHE.invalidate(form_data.username)
+
+        if updated is None:
+            # Locked by a parallel attempt since we read the user.
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"Account locked. Please try again later."
+            )
+        if updated.get("lockoutUntil"):
+             logging.warning(f"Locking account for user: {form_data.username}")
              raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail=f"Account locked for {LOCKOUT_DURATION_MINUTES} minutes due to too many failed attempts."
@@ -203,11 +336,13 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
                 detail="Incorrect username or password",
             )
 
-    logging.info(f"Successful login for user: {form_data.username}. Resetting failure count.")
-    await db[USER_COLLECTION].update_one(
-        {"username": form_data.username},
-        {"$set": {"failedLoginAttempts": 0, "lockoutUntil": None}}
-    )
+    if user_doc.get("failedLoginAttempts") or user_doc.get("lockoutUntil"):
+        logging.info(f"Successful login for user: {form_data.username}. Resetting failure count.")
+        await db[USER_COLLECTION].update_one(
+            {"username": form_data.username},
+            {"$set": {"failedLoginAttempts": 0, "lockoutUntil": None}}
+        )
+        USER_CACHE.invalidate(form_data.username)
 
     access_token = create_access_token(
         data={"sub": user_doc["username"]}, expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -278,3 +413,11 @@ async def get_sites_for_protocol(protocol_id: str, current_user: UserInDB = Depe
     if not results:
          raise HTTPException(status_code=404, detail="Protocol not found or has no sites")
     return results
+
+@app.get("/api/v1/admin/indexes", tags=["Admin"])
+async def get_index_report(current_user: UserInDB = Depends(require_admin)):
+    return await index_report()
+
+@app.get("/api/v1/admin/bcrypt", tags=["Admin"])
+async def get_bcrypt_stats(current_user: UserInDB = Depends(require_admin)):
+    return {**BCRYPT_STATS, "max_concurrency": BCRYPT_MAX_CONCURRENCY, "max_queue": BCRYPT_MAX_QUEUE}
@@ -0,0 +1,37 @@
+# user_cache.py
+# The users get_current_user (main.py) has loaded, per username, so a valid
+# token doesn't cost a userData lookup on every request.
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+class UserCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version = 0  # bumped by every invalidate()
+        self._users: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, username: str) -> Optional[Any]:
+        entry = self._users.get(username)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._users[username]
+            return None
+        self._users.move_to_end(username)
+        return entry[1]
+
+    def put(self, username: str, user: Any, version: int) -> None:
+        # `version` is read before loading the user; if a write invalidated the
+        # cache meanwhile, what was loaded may be outdated and is not kept.
+        if version != self.version:
+            return
+        self._users[username] = (time.monotonic() + self.ttl, user)
+        self._users.move_to_end(username)
+        if len(self._users) > self.maxsize:
+            self._users.popitem(last=False)
+
+    def invalidate(self, username: str) -> None:
+        self._users.pop(username, None)
+        self.version += 1
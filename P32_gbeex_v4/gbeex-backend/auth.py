@@ -7,20 +7,46 @@ from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
+from pymongo import ReturnDocument
 
-from config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MIN, REFRESH_TOKEN_EXPIRE_MIN
+from config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MIN, REFRESH_TOKEN_EXPIRE_MIN, ADMIN_ROLE, \
+    USER_COL, LOCKOUT_DURATION_MINUTES
 from database import get_database
+from bcrypt_pool import run_bcrypt
 from models.auth import UserInDB
+from user_cache import USERS
 
 # OAuth2PasswordBearer for token extraction
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
-def verify_password(plain_password: str, hashed_password) -> bool:
+async def verify_password(plain_password: str, hashed_password) -> bool:
     if isinstance(hashed_password, str):
         hashed_bytes = hashed_password.encode('utf-8')
     else:
         hashed_bytes = hashed_password
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_bytes)
+    # On the bcrypt pool, off the event loop
+    return await run_bcrypt(bcrypt.checkpw, plain_password.encode('utf-8'), hashed_bytes)
+
+async def record_failed_login(db, username: str) -> Optional[dict]:
+    # One atomic update: count the failure and, on reaching maxLoginAttempts,
+    # lock the account and reset the count. Parallel bad logins each see their
+    # own increment, so exactly one of them triggers the lockout. Returns the
+    # updated user, or None if the account was already locked (or is gone).
+    now = datetime.now(timezone.utc)
+    attempts = {"$add": [{"$ifNull": ["$failedLoginAttempts", 0]}, 1]}
+    reached = {"$gte": ["$failedLoginAttempts", {"$ifNull": ["$maxLoginAttempts", 5]}]}
+    return await db[USER_COL].find_one_and_update(
+        {"username": username, "$or": [{"lockoutUntil": None}, {"lockoutUntil": {"$lte": now}}]},
+        [
+            {"$set": {"failedLoginAttempts": attempts}},
+            {"$set": {
+                "lockoutUntil": {"$cond": [reached, now + timedelta(minutes=LOCKOUT_DURATION_MINUTES), None]},
+                "failedLoginAttempts": {"$cond": [reached, 0, "$failedLoginAttempts"]},
+            }},
+        ],
+        projection={"failedLoginAttempts": 1, "lockoutUntil": 1},
+        return_document=ReturnDocument.AFTER,
+    )
 
 def create_access_token(subject: str, expires_delta: Optional[timedelta] = None) -> str:
     expire = datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MIN))
@@ -54,12 +80,24 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db=Depends(get_d
     except JWTError:
         raise creds_exc
 
-    from config import USER_COL 
-    user_doc = await db[USER_COL].find_one({"username": username})
-    if not user_doc:
+    async def load_user() -> Optional[UserInDB]:
+        user_doc = await db[USER_COL].find_one({"username": username})
+        if not user_doc:
+            return None
+        try:
+            return UserInDB(**user_doc)
+        except Exception:
+            return None
+
+    user = await USERS.get_or_load(username, load_user)
+    if user is None:
         raise creds_exc
+    return user
 
-    try:
-        return UserInDB(**user_doc)
-    except Exception:
-        raise creds_exc
\ No newline at end of file
+def is_admin(user: UserInDB) -> bool:
+    return user.role.lower() == ADMIN_ROLE.lower()
+
+async def require_admin(current_user: UserInDB = Depends(get_current_user)) -> UserInDB:
+    if not is_admin(current_user):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return current_user
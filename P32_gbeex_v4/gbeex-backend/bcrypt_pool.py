@@ -0,0 +1,52 @@
+# bcrypt_pool.py
+# bcrypt is deliberately slow (~100ms+ per check). Called inline from an async
+# handler it blocks the event loop, so a burst of logins stalls every other
+# request. run_bcrypt() runs it on a dedicated thread pool instead (bcrypt
+# releases the GIL while hashing) with at most BCRYPT_MAX_CONCURRENCY checks at
+# once. Callers beyond that wait their turn, counted in bcrypt_queue_depth;
+# past BCRYPT_MAX_QUEUE waiting, logins are turned away with a 503 rather than
+# piling up.
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from fastapi import HTTPException, status
+
+from metrics import BCRYPT_DURATION, BCRYPT_IN_PROGRESS, BCRYPT_QUEUE_DEPTH
+
+BCRYPT_MAX_CONCURRENCY = int(os.getenv("BCRYPT_MAX_CONCURRENCY", str(min(4, os.cpu_count() or 1))))
+BCRYPT_MAX_QUEUE       = int(os.getenv("BCRYPT_MAX_QUEUE", "100"))
+
+_executor = ThreadPoolExecutor(max_workers=BCRYPT_MAX_CONCURRENCY, thread_name_prefix="bcrypt")
+_slots = asyncio.Semaphore(BCRYPT_MAX_CONCURRENCY)
+_waiting = 0
+
+async def run_bcrypt(fn: Callable[..., Any], *args: Any) -> Any:
+    global _waiting
+    if _waiting >= BCRYPT_MAX_QUEUE:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many logins in progress, try again shortly",
+            headers={"Retry-After": "1"},
+        )
+    _waiting += 1
+    BCRYPT_QUEUE_DEPTH.inc()
+    try:
+        await _slots.acquire()
+    finally:
+        _waiting -= 1
+        BCRYPT_QUEUE_DEPTH.dec()
+
+    BCRYPT_IN_PROGRESS.inc()
+    start = time.perf_counter()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+    finally:
+        BCRYPT_DURATION.observe(time.perf_counter() - start)
+        BCRYPT_IN_PROGRESS.dec()
+        _slots.release()
+
+def shutdown_bcrypt_pool() -> None:
+    _executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# Compares the old field-by-field $project against subject_stages()
+# ($replaceRoot + $mergeObjects) on the subject search pipeline, against the
+# database in MONGO_URI / DATABASE_NAME. Checks both return the same rows.
+#
+#   python bench_subject_pipeline.py [limit] [rounds]
+import asyncio
+import statistics
+import sys
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from config import MONGO_URI, DATABASE_NAME, COMPANY_COL
+from models.subjects import Subject
+from subject_pipeline import SUBJECT_CONTEXT, subject_stages
+
+LIMIT  = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+ROUNDS = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+UNWIND = [
+    {"$unwind": "$protocols"},
+    {"$unwind": "$protocols.sites"},
+    {"$unwind": "$protocols.sites.subjects"},
+    {"$sort": {"protocols.sites.subjects.subjectId": 1}},
+    {"$limit": LIMIT},
+]
+
+# The projection the routes used before: one expression per field.
+OLD_PROJECT = {"$project": {
+    "_id": 0,
+    **{f: f"$protocols.sites.subjects.{f}" for f in Subject.model_fields if f not in SUBJECT_CONTEXT},
+    **SUBJECT_CONTEXT,
+}}
+
+VARIANTS = {
+    "field $project": UNWIND + [OLD_PROJECT],
+    "$replaceRoot": UNWIND + subject_stages(),
+    "$replaceRoot + 5 fields": UNWIND + subject_stages(["subjectId", "status", "age", "gender", "siteId"]),
+}
+
+async def timed(col, pipeline):
+    start = time.perf_counter()
+    rows = await col.aggregate(pipeline).to_list(length=None)
+    return time.perf_counter() - start, rows
+
+async def main():
+    col = AsyncIOMotorClient(MONGO_URI)[DATABASE_NAME][COMPANY_COL]
+
+    _, old_rows = await timed(col, VARIANTS["field $project"])
+    _, new_rows = await timed(col, VARIANTS["$replaceRoot"])
+    old = [Subject(**r).model_dump() for r in old_rows]
+    new = [Subject(**r).model_dump() for r in new_rows]
+    print(f"rows: {len(old)}, identical after validation: {old == new}")
+
+    for name, pipeline in VARIANTS.items():
+        samples = [(await timed(col, pipeline))[0] for _ in range(ROUNDS)]
+        print(f"{name:>24}: median {statistics.median(samples) * 1e3:8.2f} ms  "
+              f"min {min(samples) * 1e3:8.2f} ms  ({ROUNDS} rounds, limit {LIMIT})")
+
+if __name__ == "__main__":
+    asyncio.run(main())
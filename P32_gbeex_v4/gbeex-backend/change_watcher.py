@@ -0,0 +1,29 @@
+# change_watcher.py
+# Follows clientData through a change stream (started in main.py's lifespan)
+# and invalidates everything derived from it: cached search totals
+# (count_cache.py) and the site/subject location map (locations.py).
+import logging
+
+from pymongo.errors import OperationFailure
+
+from config import COMPANY_COL
+from count_cache import SUBJECT_TOTALS
+from locations import load_locations, refresh_company
+
+logger = logging.getLogger(__name__)
+
+async def watch_client_data(db) -> None:
+    # Change streams need a replica set; on a standalone server we log and rely
+    # on the count cache TTL instead (and on the location lookups falling back
+    # to the ID index).
+    try:
+        async with db[COMPANY_COL].watch() as stream:
+            async for change in stream:
+                SUBJECT_TOTALS.invalidate(change)
+                if "documentKey" in change:
+                    await refresh_company(db, change["documentKey"]["_id"])
+                else:
+                    # drop/rename/invalidate: no single document to re-read
+                    await load_locations(db)
+    except OperationFailure as e:
+        logger.warning("clientData change stream unavailable, cached totals expire by TTL only: %s", e)
@@ -18,4 +18,7 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MIN = 30  
 REFRESH_TOKEN_EXPIRE_MIN = 7 * 24 * 60 #7 days
 
-LOCKOUT_DURATION_MINUTES = 5
\ No newline at end of file
+LOCKOUT_DURATION_MINUTES = 5
+
+# Users with this role can reach the /api/v1/admin endpoints
+ADMIN_ROLE = os.getenv("ADMIN_ROLE", "admin")
\ No newline at end of file
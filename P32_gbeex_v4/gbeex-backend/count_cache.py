@@ -0,0 +1,62 @@
+# count_cache.py
+# Totals of the subject search routes (routers/subjects.py), kept per count
+# pipeline for COUNT_CACHE_TTL seconds (COUNT_CACHE_SIZE pipelines at most,
+# least recently used evicted). The routes build a pipeline from the query
+# parameters in a fixed order, so its JSON is the key.
+#
+# change_watcher.py hands every clientData change to invalidate(). The totals
+# only read the protocols array, so an update that leaves it alone (a company
+# name, say) keeps them.
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+from bson import json_util
+
+COUNT_CACHE_TTL  = float(os.getenv("COUNT_CACHE_TTL", "60"))
+COUNT_CACHE_SIZE = int(os.getenv("COUNT_CACHE_SIZE", "1024"))
+
+def _touches_protocols(change: Dict[str, Any]) -> bool:
+    if change.get("operationType") != "update":
+        return True  # insert/replace/delete/drop...: anything may have moved
+    desc = change.get("updateDescription") or {}
+    paths = [
+        *desc.get("updatedFields", {}),
+        *desc.get("removedFields", []),
+        *(t["field"] for t in desc.get("truncatedArrays", [])),
+    ]
+    return any(p == "protocols" or p.startswith("protocols.") for p in paths)
+
+class SubjectTotals:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, int]]" = OrderedDict()
+        # Bumped by each invalidating change; a count that was running across
+        # one is returned but not kept.
+        self._changes = 0
+
+    async def total(self, col, count_pipeline: List[dict]) -> int:
+        key = json_util.dumps(count_pipeline)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] >= time.monotonic():
+            self._entries.move_to_end(key)
+            return entry[1]
+
+        changes = self._changes
+        result = await col.aggregate(count_pipeline).to_list(length=1)
+        total = result[0]["total"] if result else 0
+        if changes == self._changes:
+            self._entries[key] = (time.monotonic() + self.ttl, total)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return total
+
+    def invalidate(self, change: Dict[str, Any]) -> None:
+        if _touches_protocols(change):
+            self._entries.clear()
+            self._changes += 1
+
+SUBJECT_TOTALS = SubjectTotals(COUNT_CACHE_SIZE, COUNT_CACHE_TTL)
@@ -1,9 +1,10 @@
 # database.py
 from motor.motor_asyncio import AsyncIOMotorClient
 from config import MONGO_URI, DATABASE_NAME
+from metrics import MongoCommandMetrics
 
-# MongoDB client instance
-client = AsyncIOMotorClient(MONGO_URI)
+# MongoDB client instance (commands are counted and timed for /metrics)
+client = AsyncIOMotorClient(MONGO_URI, event_listeners=[MongoCommandMetrics()])
 db = client[DATABASE_NAME]
 
 def get_database():
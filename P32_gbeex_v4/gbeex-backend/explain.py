@@ -0,0 +1,72 @@
+# explain.py
+# Query plans for the subject routes (explain=true, admins only). Their
+# pipelines are $match -> $unwind x3 -> $match -> $sort/$skip/$limit, so the
+# summary answers: did the $match that pipeline_optimizer.py copies in front of
+# the unwinds use an index, how many company documents did it read, and how
+# many rows did each later stage turn them into.
+#
+# explain("executionStats") of such an aggregation lists its "stages"; the
+# first one, $cursor, is the part the query layer ran (the leading $match and
+# the projection of the fields the rest needs). If the server pushed the whole
+# pipeline down there are no "stages" and the plan is at the top level.
+import json
+from typing import Any, Dict, List, Optional
+
+from bson import json_util
+
+def _leaf_scans(plan: Optional[dict]) -> List[dict]:
+    # The scan stages (IXSCAN, COLLSCAN, ...) at the bottom of a plan tree.
+    # Slot-based plans wrap the classic tree in "queryPlan".
+    leaves, todo = [], [plan] if plan else []
+    while todo:
+        node = todo.pop()
+        node = node.get("queryPlan", node)
+        children = [node["inputStage"]] if "inputStage" in node else node.get("inputStages", [])
+        if children:
+            todo.extend(children)
+        else:
+            leaves.append(node)
+    return leaves
+
+def _query_layer(layer: Dict[str, Any]) -> Dict[str, Any]:
+    planner = layer.get("queryPlanner", {})
+    stats = layer.get("executionStats", {})
+    scans = _leaf_scans(planner.get("winningPlan"))
+    return {
+        # Extended JSON: the filter can hold regexes, ObjectIds and dates.
+        "filter":            json.loads(json_util.dumps(planner.get("parsedQuery", {}))),
+        "indexes":           sorted({s["indexName"] for s in scans if s.get("indexName")}),
+        "collectionScan":    any(s.get("stage") == "COLLSCAN" for s in scans),
+        "keysExamined":      stats.get("totalKeysExamined"),
+        "companiesExamined": stats.get("totalDocsExamined"),
+        "companiesReturned": stats.get("nReturned"),
+        "executionTimeMillis": stats.get("executionTimeMillis"),
+    }
+
+def summarize_explain(explain: Dict[str, Any]) -> Dict[str, Any]:
+    stages = explain.get("stages")
+    if not stages:
+        return {"query": _query_layer(explain), "stages": []}
+
+    summary: Dict[str, Any] = {"query": {}, "stages": []}
+    for stage in stages:
+        name = next((k for k in stage if k.startswith("$")), "?")
+        if name == "$cursor":
+            summary["query"] = _query_layer(stage["$cursor"])
+            continue
+        # nReturned is rows out of the stage: the unwinds multiply them, the
+        # $match after them cuts them back down.
+        row = {
+            "stage": name,
+            "rows": stage.get("nReturned"),
+            "executionTimeMillisEstimate": stage.get("executionTimeMillisEstimate"),
+        }
+        if name == "$sort":
+            row["usedDisk"] = stage.get("usedDisk", False)
+        summary["stages"].append(row)
+    return summary
+
+async def explain_aggregate(col, pipeline: List[dict]) -> Dict[str, Any]:
+    aggregate = {"aggregate": col.name, "pipeline": pipeline, "cursor": {}}
+    raw = await col.database.command({"explain": aggregate, "verbosity": "executionStats"})
+    return summarize_explain(raw)
@@ -0,0 +1,96 @@
+# indexes.py
+# Declarative index registry. INDEXES lists every index the API relies on and
+# ensure_indexes() creates them at startup (create_indexes is a no-op for ones
+# that already exist). QUERIES lists the lookups the routes perform so
+# index_report() can show which index serves each of them.
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from config import COMPANY_COL, NOTIFICATION_COL, PORTLET_COL, USER_COL
+
+logger = logging.getLogger(__name__)
+
+# Only the subject status is indexed among the status/phase fields: it is the
+# one the routes filter on (search_subjects, list_subjects_for_site). No route
+# filters protocols by phase or sites by status, so indexing those would only
+# add write cost; add them here together with such a filter.
+INDEXES: Dict[str, List[IndexModel]] = {
+    COMPANY_COL: [
+        IndexModel([("companyId", ASCENDING)]),
+        IndexModel([("protocols.protocolId", ASCENDING)]),
+        IndexModel([("protocols.sites.siteId", ASCENDING)]),
+        IndexModel([("protocols.sites.subjects.subjectId", ASCENDING)]),
+        IndexModel([("protocols.sites.subjects.status", ASCENDING)]),
+    ],
+    USER_COL: [
+        IndexModel([("username", ASCENDING)], unique=True),
+    ],
+    NOTIFICATION_COL: [
+        IndexModel([("userId", ASCENDING)]),
+    ],
+    PORTLET_COL: [
+        IndexModel([("key", ASCENDING)], unique=True),
+    ],
+}
+
+# (routes, collection, fields the query filters on)
+QUERIES: List[Tuple[str, str, List[str]]] = [
+    ("login, refresh_token, get_current_user", USER_COL, ["username"]),
+    ("list_notifications", NOTIFICATION_COL, ["userId"]),
+    ("create_portlet", PORTLET_COL, ["key"]),
+    ("get_company, list_protocols_for_company", COMPANY_COL, ["companyId"]),
+    ("get_protocol, list_sites_for_protocol", COMPANY_COL, ["protocols.protocolId"]),
+    ("get_site, list_subjects_for_site", COMPANY_COL, ["protocols.sites.siteId"]),
+    ("get_subject", COMPANY_COL, ["protocols.sites.subjects.subjectId"]),
+    ("search_subjects?status=", COMPANY_COL, ["protocols.sites.subjects.status"]),
+]
+
+# Indexes ensure_indexes() could not build, as {collection: {index: error}}.
+# A unique index fails on existing duplicates (e.g. two users with the same
+# username); the app still starts and /api/v1/admin/indexes shows the error.
+INDEX_ERRORS: Dict[str, Dict[str, str]] = {}
+
+async def ensure_indexes(db) -> None:
+    INDEX_ERRORS.clear()
+    for name, models in INDEXES.items():
+        # One at a time, so a failing index does not take the others with it.
+        for model in models:
+            try:
+                await db[name].create_indexes([model])
+            except OperationFailure as e:
+                index_name = model.document["name"]
+                logger.error(f"Could not create index {name}.{index_name}: {e}")
+                INDEX_ERRORS.setdefault(name, {})[index_name] = str(e)
+
+def _serving_index(indexes: Dict[str, Any], fields: List[str]) -> Optional[str]:
+    # The first index whose first key is one of the query's filter fields.
+    for index_name, info in indexes.items():
+        if info["key"][0][0] in fields:
+            return index_name
+    return None
+
+async def index_report(db) -> Dict[str, Any]:
+    existing = {name: await db[name].index_information() for name in INDEXES}
+
+    queries = []
+    for routes, name, fields in QUERIES:
+        queries.append({
+            "routes": routes,
+            "collection": name,
+            "fields": fields,
+            "index": _serving_index(existing[name], fields),
+        })
+
+    missing = {
+        name: [m.document["name"] for m in models if m.document["name"] not in existing[name]]
+        for name, models in INDEXES.items()
+    }
+    return {
+        "missing": {name: names for name, names in missing.items() if names},
+        "failed": INDEX_ERRORS,
+        "queries": queries,
+        "unindexed": [q["routes"] for q in queries if q["index"] is None],
+    }
@@ -0,0 +1,113 @@
+# locations.py
+# In-process ID -> location map for sites and subjects. get_site/get_subject use
+# it to fetch the owning company by _id with a positional projection (only the
+# protocol that holds the entity comes back) instead of unwinding every company.
+#
+# load_locations() builds the map at startup from an ID-only projection and
+# change_watcher.py re-reads a company's IDs whenever it changes. The ID is
+# always part of the query, so a missing or stale entry can't return the wrong
+# entity; it just falls back to the multikey index on the ID path.
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import COMPANY_COL
+
+logger = logging.getLogger(__name__)
+
+SITE_PATH    = "protocols.sites.siteId"
+SUBJECT_PATH = "protocols.sites.subjects.subjectId"
+
+LOCATION_FIELDS = {"protocols.protocolId": 1, SITE_PATH: 1, SUBJECT_PATH: 1}
+
+class LocationIndex:
+    def __init__(self):
+        # siteId -> company _id, subjectId -> company _id
+        self.sites: Dict[str, Any] = {}
+        self.subjects: Dict[str, Any] = {}
+        # company _id -> (siteIds, subjectIds), to drop them when it changes
+        self._by_company: Dict[Any, Tuple[List[str], List[str]]] = {}
+
+    def add_company(self, doc: Dict[str, Any]) -> None:
+        self.remove_company(doc["_id"])
+        site_ids, subject_ids = [], []
+        for protocol in doc.get("protocols") or []:
+            for site in protocol.get("sites") or []:
+                if "siteId" in site:
+                    site_ids.append(site["siteId"])
+                for subject in site.get("subjects") or []:
+                    if "subjectId" in subject:
+                        subject_ids.append(subject["subjectId"])
+        for site_id in site_ids:
+            self.sites[site_id] = doc["_id"]
+        for subject_id in subject_ids:
+            self.subjects[subject_id] = doc["_id"]
+        self._by_company[doc["_id"]] = (site_ids, subject_ids)
+
+    def remove_company(self, company_id: Any) -> None:
+        site_ids, subject_ids = self._by_company.pop(company_id, ([], []))
+        # An ID that has since moved to another company keeps its new entry.
+        for site_id in site_ids:
+            if self.sites.get(site_id) == company_id:
+                del self.sites[site_id]
+        for subject_id in subject_ids:
+            if self.subjects.get(subject_id) == company_id:
+                del self.subjects[subject_id]
+
+    def clear(self) -> None:
+        self.sites.clear()
+        self.subjects.clear()
+        self._by_company.clear()
+
+LOCATIONS = LocationIndex()
+
+async def load_locations(db) -> None:
+    LOCATIONS.clear()
+    async for doc in db[COMPANY_COL].find({}, LOCATION_FIELDS):
+        LOCATIONS.add_company(doc)
+    logger.info("Location map loaded: %d sites, %d subjects", len(LOCATIONS.sites), len(LOCATIONS.subjects))
+
+async def refresh_company(db, company_id: Any) -> None:
+    doc = await db[COMPANY_COL].find_one({"_id": company_id}, LOCATION_FIELDS)
+    if doc is None:
+        LOCATIONS.remove_company(company_id)
+    else:
+        LOCATIONS.add_company(doc)
+
+async def _owning_protocol(db, path: str, entity_id: str, company_id: Any) -> Optional[Dict[str, Any]]:
+    # The company's context fields plus only the protocol containing entity_id
+    # ("protocols.$" is the protocols element the query matched).
+    projection = {"_id": 0, "companyId": 1, "companyName": 1, "protocols.$": 1}
+    if company_id is not None:
+        doc = await db[COMPANY_COL].find_one({"_id": company_id, path: entity_id}, projection)
+        if doc is not None:
+            return doc
+    return await db[COMPANY_COL].find_one({path: entity_id}, projection)
+
+async def find_site(db, site_id: str) -> Optional[Dict[str, Any]]:
+    company = await _owning_protocol(db, SITE_PATH, site_id, LOCATIONS.sites.get(site_id))
+    if company is None:
+        return None
+    for site in company["protocols"][0].get("sites") or []:
+        if site.get("siteId") == site_id:
+            return site
+    return None
+
+async def find_subject(db, subject_id: str) -> Optional[Dict[str, Any]]:
+    # The subject with the same site/protocol/company context subject_stages() adds.
+    company = await _owning_protocol(db, SUBJECT_PATH, subject_id, LOCATIONS.subjects.get(subject_id))
+    if company is None:
+        return None
+    protocol = company["protocols"][0]
+    for site in protocol.get("sites") or []:
+        for subject in site.get("subjects") or []:
+            if subject.get("subjectId") == subject_id:
+                return {
+                    **subject,
+                    "siteId": site.get("siteId"),
+                    "siteName": site.get("siteName"),
+                    "protocolId": protocol.get("protocolId"),
+                    "protocolName": protocol.get("protocolName"),
+                    "companyId": company.get("companyId"),
+                    "companyName": company.get("companyName"),
+                }
+    return None
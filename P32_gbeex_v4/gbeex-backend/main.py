@@ -1,5 +1,7 @@
 # main.py
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -8,12 +10,29 @@ import config
 
 # Import database client (for global access if needed, though typically via Depends)
 from database import db
+from indexes import ensure_indexes
+from change_watcher import watch_client_data
+from locations import load_locations
+from bcrypt_pool import shutdown_bcrypt_pool
+from metrics import track_requests
 
 # Import routers
-from routers import auth, companies, notifications, portlets, subjects # Import new subjects router
+from routers import admin, auth, companies, metrics, notifications, portlets, subjects # Import new subjects router
+
+# --- Lifespan: make sure the indexes the routes rely on exist, keep cached totals fresh,
+# and build the site/subject location map (lookups fall back to the ID index until it's loaded) ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await ensure_indexes(db)
+    watcher = asyncio.create_task(watch_client_data(db))
+    loader = asyncio.create_task(load_locations(db))
+    yield
+    loader.cancel()
+    watcher.cancel()
+    shutdown_bcrypt_pool()
 
 # --- FastAPI App Initialization ---
-app = FastAPI(title="GBeeX API", version="1.0.0")
+app = FastAPI(title="GBeeX API", version="1.0.0", lifespan=lifespan)
 
 # --- CORS Middleware ---
 app.add_middleware(
@@ -30,6 +49,9 @@ async def log_requests(request: Request, call_next):
     logging.info(f"{request.method} {request.url}")
     return await call_next(request)
 
+# --- Metrics Middleware (latency per route, in-flight requests; see metrics.py) ---
+app.middleware("http")(track_requests)
+
 # --- Root & Health Endpoints ---
 @app.get("/", tags=["Root"])
 async def read_root():
@@ -41,8 +63,10 @@ async def health():
     return {"status": "ok", "time": datetime.now(timezone.utc)}
 
 # --- Include Routers ---
+app.include_router(admin.router)
 app.include_router(auth.router)
 app.include_router(companies.router)
+app.include_router(metrics.router)
 app.include_router(notifications.router)
 app.include_router(portlets.router)
 app.include_router(subjects.router) # Include the new subjects router
\ No newline at end of file
@@ -0,0 +1,131 @@
+# metrics.py
+# Prometheus-style metrics for this app, served on /metrics by routers/metrics.py:
+#   http_request_duration_seconds{method,route,status}  histogram (track_requests)
+#   http_requests_in_flight{method}                     gauge (track_requests)
+#   mongodb_commands_total{command,outcome}             counter (MongoCommandMetrics)
+#   mongodb_command_duration_seconds{command}           histogram (MongoCommandMetrics)
+#   bcrypt_queue_depth, bcrypt_in_progress              gauges (bcrypt_pool.py)
+#   bcrypt_duration_seconds                             histogram (bcrypt_pool.py)
+# Motor calls the command listener from its worker threads, so all updates
+# go through one lock.
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List, Tuple
+
+from fastapi import Request
+from pymongo import monitoring
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+
+def _key(labels: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _fmt(key: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in key] + ([extra] if extra else [])
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str):
+        self.name, self.help = name, help
+        self.series: Dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _key(labels)
+        with _lock:
+            self.series[key] = self.series.get(key, 0) + amount
+
+    def lines(self) -> List[str]:
+        with _lock:
+            series = sorted(self.series.items())
+        return [f"{self.name}{_fmt(key)} {value}" for key, value in series]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str):
+        self.name, self.help = name, help
+        # label key -> [count per bucket..., count above the last bucket, sum]
+        self.series: Dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = _key(labels)
+        with _lock:
+            row = self.series.setdefault(key, [0] * (len(BUCKETS) + 1) + [0.0])
+            row[bisect_left(BUCKETS, value)] += 1
+            row[-1] += value
+
+    def lines(self) -> List[str]:
+        with _lock:
+            series = sorted((key, list(row)) for key, row in self.series.items())
+        out = []
+        for key, row in series:
+            cumulative = 0
+            for bound, n in zip([*BUCKETS, "+Inf"], row[:-1]):
+                cumulative += n
+                le = f'le="{bound}"'
+                out.append(f"{self.name}_bucket{_fmt(key, le)} {cumulative}")
+            out.append(f"{self.name}_sum{_fmt(key)} {row[-1]}")
+            out.append(f"{self.name}_count{_fmt(key)} {cumulative}")
+        return out
+
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency by route and status")
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being handled")
+MONGO_COMMANDS = Counter("mongodb_commands_total", "MongoDB commands sent, by outcome")
+MONGO_LATENCY = Histogram("mongodb_command_duration_seconds", "MongoDB command latency")
+BCRYPT_QUEUE_DEPTH = Gauge("bcrypt_queue_depth", "Password checks waiting for a bcrypt worker")
+BCRYPT_IN_PROGRESS = Gauge("bcrypt_in_progress", "Password checks running on the bcrypt pool")
+BCRYPT_DURATION = Histogram("bcrypt_duration_seconds", "Time spent in bcrypt per password check")
+
+ALL_METRICS = (
+    REQUEST_LATENCY, REQUESTS_IN_FLIGHT, MONGO_COMMANDS, MONGO_LATENCY,
+    BCRYPT_QUEUE_DEPTH, BCRYPT_IN_PROGRESS, BCRYPT_DURATION,
+)
+
+def render_metrics() -> str:
+    out = []
+    for metric in ALL_METRICS:
+        out += [f"# HELP {metric.name} {metric.help}", f"# TYPE {metric.name} {metric.kind}"]
+        out += metric.lines()
+    return "\n".join(out) + "\n"
+
+async def track_requests(request: Request, call_next):
+    # HTTP middleware (registered in main.py). /metrics itself is not timed.
+    if request.url.path == "/metrics":
+        return await call_next(request)
+    method = request.method
+    REQUESTS_IN_FLIGHT.inc(method=method)
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        REQUESTS_IN_FLIGHT.dec(method=method)
+        # The route template ("/api/v1/subjects/{subject_id}") keeps IDs out of the labels
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        REQUEST_LATENCY.observe(time.perf_counter() - start, method=method, route=route, status=status_code)
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    # Registered on the Motor client in database.py.
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMANDS.inc(command=event.command_name, outcome="ok")
+        MONGO_LATENCY.observe(event.duration_micros / 1e6, command=event.command_name)
+
+    def failed(self, event):
+        MONGO_COMMANDS.inc(command=event.command_name, outcome="error")
+        MONGO_LATENCY.observe(event.duration_micros / 1e6, command=event.command_name)
@@ -1,5 +1,5 @@
 # gbeex-backend/models/common.py
-from typing import Generic, List, TypeVar
+from typing import Generic, List, Optional, TypeVar
 from pydantic import BaseModel, Field
 
 # Define a generic type variable that can be any BaseModel
@@ -9,7 +9,8 @@ class PaginatedResponse(BaseModel, Generic[T]):
     """
     A generic Pydantic model for paginated API responses.
     """
-    total_count: int = Field(..., description="Total number of items matching the query across all pages.")
+    total_count: Optional[int] = Field(..., description="Total number of items matching the query across all pages. Null on cursor pages.")
     page: int = Field(..., description="The current page number (1-indexed).")
     limit: int = Field(..., description="The maximum number of items per page.")
-    items: List[T] = Field(..., description="A list of items for the current page.")
\ No newline at end of file
+    items: List[T] = Field(..., description="A list of items for the current page.")
+    next_cursor: Optional[str] = Field(None, description="Pass as `cursor` to fetch the next page. Null on the last page.")
\ No newline at end of file
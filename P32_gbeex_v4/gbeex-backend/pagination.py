@@ -0,0 +1,51 @@
+# pagination.py
+# Keyset paging for the list routes. Rows are sorted by a key that ends in the
+# company _id (plus parent IDs for nested rows), since protocol, site and
+# subject IDs are not unique across companies; the cursor holds the last row's
+# key. Routes add the key to each row as CURSOR_FIELD and next_cursor() takes
+# it off again.
+import base64
+from typing import Any, Dict, List, Optional
+
+from bson import json_util
+from fastapi import HTTPException, status
+
+CURSOR_FIELD = "_cursor"
+
+def encode_cursor(key: List[Any]) -> str:
+    # Extended JSON, so the ObjectId in the key survives the round trip.
+    return base64.urlsafe_b64encode(json_util.dumps(key).encode()).decode()
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    try:
+        key = json_util.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        key = None
+    if not isinstance(key, list) or len(key) != size:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Malformed cursor")
+    return key
+
+def sort_stage(paths: List[str]) -> Dict[str, Any]:
+    return {"$sort": {p: 1 for p in paths}}
+
+def key_expression(paths: List[str]) -> List[str]:
+    # The key as an aggregation expression, for a $project / $mergeObjects.
+    return ["$" + p for p in paths]
+
+def after_key(paths: List[str], key: List[Any]) -> Dict[str, Any]:
+    # Rows after `key` in ascending `paths` order:
+    #   (a > ka) OR (a == ka AND b > kb) OR ...
+    # null sorts first, so every non-null value is after a null one.
+    clauses = []
+    for i, path in enumerate(paths):
+        clause = {p: key[j] for j, p in enumerate(paths[:i])}
+        clause[path] = {"$ne": None} if key[i] is None else {"$gt": key[i]}
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+def next_cursor(items: List[Dict[str, Any]], limit: int) -> Optional[str]:
+    # Strips CURSOR_FIELD from every item; only a full page can have items after it.
+    keys = [item.pop(CURSOR_FIELD, None) for item in items]
+    if not items or len(items) < limit or keys[-1] is None:
+        return None
+    return encode_cursor(keys[-1])
@@ -0,0 +1,125 @@
+# pipeline_optimizer.py
+# Rewrites the $match/$unwind prefix of a nested-array pipeline so filters run
+# before the unwinds instead of after them:
+#   - a copy of each later $match goes in front of the first $unwind, so whole
+#     company documents that cannot match are never unwound (and can be found
+#     through the multikey indexes);
+#   - just before each $unwind, elements of that array which fail the
+#     conditions on their own fields are dropped with $filter.
+# Results are unchanged: the later $match stages stay where they are, the copy
+# only uses operators for which "some element matches" is implied by the
+# unwound row matching, and $filter never drops an element the original $match
+# would have kept.
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+
+# Operators whose document-level match is implied by an unwound row matching.
+# Negations ($ne, $nin, $not, $exists: false ...) are not: before unwinding
+# they apply to every element at once.
+PUSHABLE_OPS = {"$eq", "$gt", "$gte", "$lt", "$lte", "$in", "$regex", "$options"}
+# Operators with an aggregation-expression twin, usable inside $filter.
+FILTER_OPS = {"$eq", "$gt", "$gte", "$lt", "$lte", "$in"}
+
+def _is_scalar(value: Any) -> bool:
+    return isinstance(value, (str, int, float, datetime, ObjectId))
+
+def _conjuncts(match: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # Split a $match document into single-condition documents, flattening $and.
+    out = []
+    for key, value in match.items():
+        if key == "$and":
+            for sub in value:
+                out.extend(_conjuncts(sub))
+        else:
+            out.append({key: value})
+    return out
+
+def _pushable(cond: Dict[str, Any]) -> bool:
+    ((key, value),) = cond.items()
+    if key == "$or":
+        return all(all(_pushable(c) for c in _conjuncts(branch)) for branch in value)
+    if key.startswith("$"):
+        return False
+    if isinstance(value, dict):
+        for op, arg in value.items():
+            if op not in PUSHABLE_OPS:
+                return False
+            if op == "$in" and not (isinstance(arg, list) and all(_is_scalar(a) for a in arg)):
+                return False
+            if op not in ("$in", "$regex") and not _is_scalar(arg):
+                return False
+        return True
+    return _is_scalar(value)
+
+def _filter_expr(cond: Dict[str, Any], unwind_paths: List[str]) -> Tuple[Optional[str], Optional[dict]]:
+    # (unwind path, $filter condition) for a condition on one array level's
+    # fields, or (None, None) when it cannot be expressed.
+    ((key, value),) = cond.items()
+    if key.startswith("$"):
+        return None, None
+    levels = [p for p in unwind_paths if key.startswith(p + ".")]
+    if not levels:
+        return None, None
+    level = max(levels, key=len)
+    ref = "$$this." + key[len(level) + 1:]
+
+    if isinstance(value, dict):
+        if not value or any(op not in FILTER_OPS for op in value):
+            return None, None
+        exprs = [{op: [ref, arg]} for op, arg in value.items()]
+    elif _is_scalar(value):
+        exprs = [{"$eq": [ref, value]}]
+    else:
+        return None, None
+    # An array-valued field matches queries element-wise, which the expression
+    # does not, so such elements are always kept.
+    test = exprs[0] if len(exprs) == 1 else {"$and": exprs}
+    return level, {"$or": [{"$isArray": ref}, test]}
+
+def _and(conds: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return conds[0] if len(conds) == 1 else {"$and": conds}
+
+def optimize_unwind_pipeline(pipeline: List[dict]) -> List[dict]:
+    # Only the leading run of $match and string-form $unwind stages is touched.
+    n = 0
+    while n < len(pipeline) and (
+        "$match" in pipeline[n] or isinstance(pipeline[n].get("$unwind"), str)
+    ):
+        n += 1
+    head, rest = pipeline[:n], pipeline[n:]
+    unwind_paths = [s["$unwind"].lstrip("$") for s in head if "$unwind" in s]
+    if not unwind_paths:
+        return pipeline
+
+    pushed: List[Dict[str, Any]] = []
+    filters: Dict[str, List[dict]] = {p: [] for p in unwind_paths}
+    unwound = set()
+    for stage in head:
+        if "$unwind" in stage:
+            unwound.add(stage["$unwind"].lstrip("$"))
+            continue
+        if not unwound:
+            continue  # already ahead of every unwind
+        for cond in _conjuncts(stage["$match"]):
+            if _pushable(cond) and cond not in pushed:
+                pushed.append(cond)
+            # A condition can only trim a level that was already unwound when
+            # the original $match ran.
+            level, expr = _filter_expr(cond, unwind_paths)
+            if level in unwound and expr not in filters[level]:
+                filters[level].append(expr)
+
+    optimized = []
+    for stage in head:
+        if "$unwind" in stage:
+            if pushed:
+                optimized.append({"$match": _and(pushed)})
+                pushed = []
+            path = stage["$unwind"].lstrip("$")
+            if filters[path]:
+                cond = filters[path][0] if len(filters[path]) == 1 else {"$and": filters[path]}
+                optimized.append({"$addFields": {path: {"$filter": {"input": "$" + path, "cond": cond}}}})
+        optimized.append(stage)
+    return optimized + rest
@@ -0,0 +1,14 @@
+# routers/admin.py
+from typing import Any, Dict
+from fastapi import APIRouter, Depends
+from database import get_database
+from auth import require_admin
+from indexes import index_report
+from models.auth import UserInDB
+
+router = APIRouter(tags=["Admin"])
+
+@router.get("/api/v1/admin/indexes")
+async def get_index_report(current_user: UserInDB = Depends(require_admin), db=Depends(get_database)) -> Dict[str, Any]:
+    # Registered indexes that are missing or failed to build, and the index serving each route query.
+    return await index_report(db)
@@ -5,11 +5,10 @@ from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.encoders import jsonable_encoder
 from config import USER_COL
-from auth import verify_password, create_access_token, create_refresh_token, get_current_user
+from auth import verify_password, record_failed_login, create_access_token, create_refresh_token, get_current_user
 from database import get_database
+from user_cache import USERS
 from models.auth import Token, UserInDB, UserResponse
-from config import USER_COL, LOCKOUT_DURATION_MINUTES
-from datetime import timezone
 from jose import jwt 
 from config import SECRET_KEY, ALGORITHM
 
@@ -25,20 +24,21 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db=Depends(get
     if user_doc.get("lockoutUntil") and user_doc["lockoutUntil"] > datetime.utcnow():
         raise HTTPException(status_code=403, detail="Account locked. Try later.")
 
-    if not verify_password(form_data.password, user_doc["passwordHash"]):
-        attempts = user_doc.get("failedLoginAttempts", 0) + 1
-        update = {"$set": {"failedLoginAttempts": attempts}}
-        if attempts >= user_doc.get("maxLoginAttempts", 5):
-            
-            update["$set"]["lockoutUntil"] = datetime.now(timezone.utc) + timedelta(minutes=LOCKOUT_DURATION_MINUTES)
-            update["$set"]["failedLoginAttempts"] = 0
-        await db[USER_COL].update_one({"username": form_data.username}, update)
+    if not await verify_password(form_data.password, user_doc["passwordHash"]):
+        updated = await record_failed_login(db, form_data.username)
+        USERS.invalidate(form_data.username)
+        if updated is None:
+            # Locked by a parallel attempt since we read the user
+            raise HTTPException(status_code=403, detail="Account locked. Try later.")
         raise HTTPException(status_code=401, detail="Incorrect username or password")
 
-    await db[USER_COL].update_one(
-        {"username": form_data.username},
-        {"$set": {"failedLoginAttempts": 0, "lockoutUntil": None}}
-    )
+    # Only write when there is something to reset
+    if user_doc.get("failedLoginAttempts") or user_doc.get("lockoutUntil"):
+        await db[USER_COL].update_one(
+            {"username": form_data.username},
+            {"$set": {"failedLoginAttempts": 0, "lockoutUntil": None}}
+        )
+        USERS.invalidate(form_data.username)
 
     access_token = create_access_token(form_data.username)
     refresh_token = create_refresh_token(form_data.username)
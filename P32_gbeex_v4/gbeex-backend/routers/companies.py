@@ -10,8 +10,17 @@ from models.auth import UserInDB
 from models.companies import CompanyListItem, ProtocolListItem, SiteDashboardItem, \
     Company, Protocol, Site # Ensure all full models are imported
 from models.common import PaginatedResponse # For pagination
+from pagination import CURSOR_FIELD, after_key, decode_cursor, key_expression, next_cursor, sort_stage
+from pipeline_optimizer import optimize_unwind_pipeline
+from locations import find_site
 from config import COMPANY_COL
 
+# Sort/cursor keys: protocol and site ids are only unique within a company
+# (and a site only within its protocol), so the owning _id breaks ties.
+COMPANY_KEY = ["companyId", "_id"]
+PROTOCOL_KEY = ["protocols.protocolId", "_id"]
+SITE_KEY = ["protocols.sites.siteId", "_id", "protocols.protocolId"]
+
 router = APIRouter(tags=["Companies", "Protocols", "Sites"])
 logger = logging.getLogger(__name__)
 
@@ -21,28 +30,38 @@ async def list_companies(
     page: int = 1,
     limit: int = 10,
     search_term: Optional[str] = None,
+    cursor: Optional[str] = None,
     current_user: UserInDB = Depends(get_current_user),
     db=Depends(get_database)
 ):
     """
     Lists all available companies with pagination and optional search by company name.
+    Pass `cursor` (the previous page's `next_cursor`) to page by key instead of offset.
     """
     query = {}
     if search_term:
         query["companyName"] = {"$regex": search_term, "$options": "i"}
 
-    total_count = await db[COMPANY_COL].count_documents(query)
-    
-    skip = (page - 1) * limit
+    if cursor:
+        # Keyset page: seek past the last company, no skip and no recount
+        query = {"$and": [query, after_key(COMPANY_KEY, decode_cursor(cursor, len(COMPANY_KEY)))]}
+        total_count, skip = None, 0
+    else:
+        total_count = await db[COMPANY_COL].count_documents(query)
+        skip = (page - 1) * limit
     
-    cursor = db[COMPANY_COL].find(query, {"companyId":1, "companyName":1, "_id":0}).skip(skip).limit(limit)
-    items = await cursor.to_list(length=None)
+    db_cursor = db[COMPANY_COL].find(query, {"companyId":1, "companyName":1}) \
+        .sort([("companyId", 1), ("_id", 1)]).skip(skip).limit(limit)
+    items = await db_cursor.to_list(length=None)
+    for item in items:
+        item[CURSOR_FIELD] = [item["companyId"], item.pop("_id")]
     
     return {
         "total_count": total_count,
         "page": page,
         "limit": limit,
-        "items": items
+        "items": items,
+        "next_cursor": next_cursor(items, limit)
     }
 
 # Get a single company by ID
@@ -115,11 +134,13 @@ async def list_all_protocols(
     page: int = 1,
     limit: int = 10,
     search_term: Optional[str] = None,
+    cursor: Optional[str] = None,
     current_user: UserInDB = Depends(get_current_user),
     db=Depends(get_database)
 ):
     """
     Lists all protocols across all companies with pagination and optional search by protocol name/drug/therapeutic area.
+    Pass `cursor` (the previous page's `next_cursor`) to page by key instead of offset.
     """
     pipeline = [
         {"$unwind": "$protocols"},
@@ -135,19 +156,28 @@ async def list_all_protocols(
         ]
     if protocol_match_criteria:
         pipeline.append({"$match": protocol_match_criteria})
+    if cursor:
+        pipeline.append({"$match": after_key(PROTOCOL_KEY, decode_cursor(cursor, len(PROTOCOL_KEY)))})
+    # Skip companies, and trim protocols, that cannot match before unwinding
+    pipeline = optimize_unwind_pipeline(pipeline)
 
-    total_count_pipeline = pipeline + [{"$count": "total"}]
-    total_result = await db[COMPANY_COL].aggregate(total_count_pipeline).to_list(length=1)
-    total_count = total_result[0]["total"] if total_result else 0
+    if cursor:
+        total_count, skip = None, 0
+    else:
+        total_count_pipeline = pipeline + [{"$count": "total"}]
+        total_result = await db[COMPANY_COL].aggregate(total_count_pipeline).to_list(length=1)
+        total_count = total_result[0]["total"] if total_result else 0
+        skip = (page - 1) * limit
 
-    skip = (page - 1) * limit
     pipeline.extend([
+        sort_stage(PROTOCOL_KEY),
         {"$skip": skip},
         {"$limit": limit},
         # Project full protocol fields to match Protocol model
         # NOTE: This projection currently yields ProtocolListItem. If you want full Protocol model,
         # you need a different projection and response_model=PaginatedResponse[Protocol]
-        {"$project": {"_id":0, "protocolId":"$protocols.protocolId", "protocolName":"$protocols.protocolName"}}
+        {"$project": {"_id":0, "protocolId":"$protocols.protocolId", "protocolName":"$protocols.protocolName",
+                      CURSOR_FIELD: key_expression(PROTOCOL_KEY)}}
     ])
     
     items = await db[COMPANY_COL].aggregate(pipeline).to_list(length=None)
@@ -156,7 +186,8 @@ async def list_all_protocols(
         "total_count": total_count,
         "page": page,
         "limit": limit,
-        "items": items
+        "items": items,
+        "next_cursor": next_cursor(items, limit)
     }
 
 
@@ -214,6 +245,7 @@ async def list_sites_for_protocol(
         ]
     if site_match_criteria:
         pipeline.append({"$match": site_match_criteria})
+    pipeline = optimize_unwind_pipeline(pipeline)
 
     total_count_pipeline = pipeline + [{"$count": "total"}]
     total_result = await db[COMPANY_COL].aggregate(total_count_pipeline).to_list(length=1)
@@ -255,11 +287,13 @@ async def list_all_sites(
     page: int = 1,
     limit: int = 10,
     search_term: Optional[str] = None,
+    cursor: Optional[str] = None,
     current_user: UserInDB = Depends(get_current_user),
     db=Depends(get_database)
 ):
     """
     Lists all sites across all protocols and companies with pagination and optional search by site name/city/country.
+    Pass `cursor` (the previous page's `next_cursor`) to page by key instead of offset.
     """
     pipeline = [
         {"$unwind": "$protocols"},
@@ -276,13 +310,21 @@ async def list_all_sites(
         ]
     if site_match_criteria:
         pipeline.append({"$match": site_match_criteria})
+    if cursor:
+        pipeline.append({"$match": after_key(SITE_KEY, decode_cursor(cursor, len(SITE_KEY)))})
+    # Skip companies, and trim protocols/sites, that cannot match before unwinding
+    pipeline = optimize_unwind_pipeline(pipeline)
 
-    total_count_pipeline = pipeline + [{"$count": "total"}]
-    total_result = await db[COMPANY_COL].aggregate(total_count_pipeline).to_list(length=1)
-    total_count = total_result[0]["total"] if total_result else 0
+    if cursor:
+        total_count, skip = None, 0
+    else:
+        total_count_pipeline = pipeline + [{"$count": "total"}]
+        total_result = await db[COMPANY_COL].aggregate(total_count_pipeline).to_list(length=1)
+        total_count = total_result[0]["total"] if total_result else 0
+        skip = (page - 1) * limit
 
-    skip = (page - 1) * limit
     pipeline.extend([
+        sort_stage(SITE_KEY),
         {"$skip": skip},
         {"$limit": limit},
         {"$project": { # Project to SiteDashboardItem
@@ -298,7 +340,8 @@ async def list_all_sites(
                 "subjectSuccessRate":        "$protocols.sites.sitePerformance.subjectSuccessRate",
                 "enrollmentRatePerTrial":    "$protocols.sites.sitePerformance.enrollmentRatePerTrial",
                 "dropoutRatePerTrial":       "$protocols.sites.sitePerformance.dropoutRatePerTrial"
-            }
+            },
+            CURSOR_FIELD: key_expression(SITE_KEY)
         }}
     ])
     
@@ -308,31 +351,22 @@ async def list_all_sites(
         "total_count": total_count,
         "page": page,
         "limit": limit,
-        "items": items
+        "items": items,
+        "next_cursor": next_cursor(items, limit)
     }
 
 # Get a single site by ID
 @router.get("/api/v1/sites/{site_id}", response_model=Site)
 async def get_site(site_id: str, current_user: UserInDB = Depends(get_current_user), db=Depends(get_database)):
     """Retrieves full details for a specific site by its ID."""
-    # Similar to get_protocol, find the parent protocol/company and then extract.
-    # Aggregation to extract deeply nested full document can be complex,
-    # often involves $unwind until the desired level and then $match and $limit 1
-    # For a full Site model, we need to ensure all its nested fields (like subjects) are included.
-    pipeline = [
-        {"$match": {"protocols.sites.siteId": site_id}}, # Find document containing the site
-        {"$unwind": "$protocols"}, # Unwind protocols
-        {"$unwind": "$protocols.sites"}, # Unwind sites
-        {"$match": {"protocols.sites.siteId": site_id}}, # Match the specific site after unwinding
-        {"$replaceRoot": {"newRoot": "$protocols.sites"}} # Promote the matched site to root
-        # If Site model contains Protocol/Company context, you would project them here before replaceRoot
-    ]
-    site_doc = await db[COMPANY_COL].aggregate(pipeline).to_list(length=1)
+    # Similar to get_protocol: fetch the owning company by _id (via the location map)
+    # with only the matching protocol projected, then pick the site out of it.
+    site_doc = await find_site(db, site_id)
     if not site_doc:
         raise HTTPException(status_code=404, detail="Site not found")
     
     try:
-        return Site(**site_doc[0])
+        return Site(**site_doc)
     except Exception as e:
         logger.error(f"Error validating site {site_id}: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Error processing site data (validation error). Check data consistency.")
\ No newline at end of file
@@ -0,0 +1,11 @@
+# routers/metrics.py
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from metrics import render_metrics
+
+router = APIRouter(tags=["Metrics"])
+
+@router.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
@@ -3,16 +3,30 @@ import logging
 from typing import List, Optional
 from math import ceil
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from database import get_database
-from auth import get_current_user
+from auth import get_current_user, is_admin
+from explain import explain_aggregate
 from models.auth import UserInDB
 from models.subjects import Subject
 from models.common import PaginatedResponse
+from pagination import after_key, decode_cursor, next_cursor, sort_stage
+from subject_pipeline import SUBJECT_KEY, parse_fields, subject_stages
+from pipeline_optimizer import optimize_unwind_pipeline
 from config import COMPANY_COL
+from count_cache import SUBJECT_TOTALS
+from locations import find_subject
 
 router = APIRouter(tags=["Subjects"])
 logger = logging.getLogger(__name__)
 
+async def explain_pipelines(col, page_pipeline, count_pipeline):
+    plans = {"page": await explain_aggregate(col, page_pipeline)}
+    if count_pipeline is not None:
+        plans["count"] = await explain_aggregate(col, count_pipeline)
+    return plans
+
 # Global search for subjects with pagination
 @router.get(
     "/api/v1/subjects/search",
@@ -27,12 +41,22 @@ async def search_subjects(
     max_age: Optional[int] = None,
     gender: Optional[str] = None,
     status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    explain: bool = False,
     current_user: UserInDB = Depends(get_current_user),
     db=Depends(get_database)
 ):
     # Searches for subjects across all companies, protocols, and sites with pagination.
     # Results can be filtered by a general search term (screening number, MRN, subject ID)
     # or specific criteria like age, gender, and status.
+    # fields=subjectId,status,age returns only those fields of each subject.
+    # With explain=true (admins only) the response is the query plans of the
+    # count and page pipelines instead of the results.
+    if explain and not is_admin(current_user):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="explain is admin only")
+    field_list = parse_fields(fields)
+
     pipeline = [
         {"$unwind": "$protocols"},
         {"$unwind": "$protocols.sites"},
@@ -59,158 +83,58 @@ async def search_subjects(
 
     if match_criteria:
         pipeline.append({"$match": match_criteria})
+    if cursor:
+        # Keyset page: seek past the last row's key instead of skipping
+        pipeline.append({"$match": after_key(SUBJECT_KEY, decode_cursor(cursor, len(SUBJECT_KEY)))})
+    # Skip companies, and trim protocols/sites/subjects, that cannot match before unwinding
+    pipeline = optimize_unwind_pipeline(pipeline)
 
-    # Get total count (before pagination)
-    total_count_pipeline = pipeline + [{"$count": "total"}]
-    total_result = await db[COMPANY_COL].aggregate(total_count_pipeline).to_list(length=1)
-    total_count = total_result[0]["total"] if total_result else 0
+    if cursor:
+        total_count, skip, total_count_pipeline = None, 0, None
+    else:
+        # Get total count (before pagination)
+        total_count_pipeline = pipeline + [{"$count": "total"}]
+        total_count = None
+        if not explain:
+            total_count = await SUBJECT_TOTALS.total(db[COMPANY_COL], total_count_pipeline)
+        skip = (page - 1) * limit
 
     # Apply pagination to the main pipeline
-    skip = (page - 1) * limit
     pipeline.extend([
+        sort_stage(SUBJECT_KEY),
         {"$skip": skip},
         {"$limit": limit},
-        {"$project": { # Project all subject fields and relevant context
-            "_id": 0,
-            "subjectId": "$protocols.sites.subjects.subjectId",
-            "screeningNumber": "$protocols.sites.subjects.screeningNumber",
-            "medicalRecordNumber": "$protocols.sites.subjects.medicalRecordNumber",
-            "dateOfConsent": "$protocols.sites.subjects.dateOfConsent",
-            "dateOfEnrollment": "$protocols.sites.subjects.dateOfEnrollment",
-            "randomizationDate": "$protocols.sites.subjects.randomizationDate",
-            "treatmentArm": "$protocols.sites.subjects.treatmentArm",
-            "age": "$protocols.sites.subjects.age",
-            "dateOfBirth": "$protocols.sites.subjects.dateOfBirth",
-            "gender": "$protocols.sites.subjects.gender",
-            "ethnicity": "$protocols.sites.subjects.ethnicity",
-            "heightCm": "$protocols.sites.subjects.heightCm",
-            "weightKg": "$protocols.sites.subjects.weightKg",
-            "BMI": "$protocols.sites.subjects.BMI",
-            "bloodType": "$protocols.sites.subjects.bloodType",
-            "smokingStatus": "$protocols.sites.subjects.smokingStatus",
-            "alcoholConsumption": "$protocols.sites.subjects.alcoholConsumption",
-            "drugUse": "$protocols.sites.subjects.drugUse",
-            "comorbidities": "$protocols.sites.subjects.comorbidities",
-            "priorMedications": "$protocols.sites.subjects.priorMedications",
-            "familyHistory": "$protocols.sites.subjects.familyHistory",
-            "allergies": "$protocols.sites.subjects.allergies",
-            "dietaryRestrictions": "$protocols.sites.subjects.dietaryRestrictions",
-            "geneticMarkers": "$protocols.sites.subjects.geneticMarkers",
-            "visitCount": "$protocols.sites.subjects.visitCount",
-            "lastVisitDate": "$protocols.sites.subjects.lastVisitDate",
-            "nextScheduledVisit": "$protocols.sites.subjects.nextScheduledVisit",
-            "status": "$protocols.sites.subjects.status",
-            "finalStatus": "$protocols.sites.subjects.finalStatus",
-            "dateOfLastContact": "$protocols.sites.subjects.dateOfLastContact",
-            "previousTrial": "$protocols.sites.subjects.previousTrial",
-            "progressStatus": "$protocols.sites.subjects.progressStatus",
-            "protocolDeviation": "$protocols.sites.subjects.protocolDeviation",
-            "discontinuationReason": "$protocols.sites.subjects.discontinuationReason",
-            "dropoutReason": "$protocols.sites.subjects.dropoutReason",
-            "vaccinationStatus": "$protocols.sites.subjects.vaccinationStatus",
-            "socioeconomicStatus": "$protocols.sites.subjects.socioeconomicStatus",
-            "incomeBracket": "$protocols.sites.subjects.incomeBracket",
-            "educationLevel": "$protocols.sites.subjects.educationLevel",
-            "adherenceScore": "$protocols.sites.subjects.adherenceScore",
-            "medicationAdherence": "$protocols.sites.subjects.medicationAdherence",
-            "complications": "$protocols.sites.subjects.complications",
-            "vitalSigns": "$protocols.sites.subjects.vitalSigns",
-            "qualityOfLifeScores": "$protocols.sites.subjects.qualityOfLifeScores",
-            "studyDrugDosage": "$protocols.sites.subjects.studyDrugDosage",
-            "insuranceProvider": "$protocols.sites.subjects.insuranceProvider",
-            "emergencyContact": "$protocols.sites.subjects.emergencyContact",
-            
-            "siteId": "$protocols.sites.siteId",
-            "siteName": "$protocols.sites.siteName",
-            "protocolId": "$protocols.protocolId",
-            "protocolName": "$protocols.protocolName",
-            "companyId": "$companyId",
-            "companyName": "$companyName"
-        }}
+        *subject_stages(field_list)
     ])
 
+    if explain:
+        return JSONResponse(await explain_pipelines(db[COMPANY_COL], pipeline, total_count_pipeline))
+
     items = await db[COMPANY_COL].aggregate(pipeline).to_list(length=None)
     
-    return {
+    result = {
         "total_count": total_count,
         "page": page,
         "limit": limit,
-        "items": items
+        "items": items,
+        "next_cursor": next_cursor(items, limit)
     }
+    if field_list:
+        # Partial subjects would fail Subject validation; send them as projected
+        return JSONResponse(jsonable_encoder(result))
+    return result
 
 # Get a single subject by ID
 @router.get("/api/v1/subjects/{subject_id}", response_model=Subject)
 async def get_subject(subject_id: str, current_user: UserInDB = Depends(get_current_user), db=Depends(get_database)):
     """Retrieves full details for a specific subject by their ID."""
-    pipeline = [
-        {"$unwind": "$protocols"},
-        {"$unwind": "$protocols.sites"},
-        {"$unwind": "$protocols.sites.subjects"},
-        {"$match": {"protocols.sites.subjects.subjectId": subject_id}},
-        {"$project": {
-            "_id": 0,
-            "subjectId": "$protocols.sites.subjects.subjectId",
-            "screeningNumber": "$protocols.sites.subjects.screeningNumber",
-            "medicalRecordNumber": "$protocols.sites.subjects.medicalRecordNumber",
-            "dateOfConsent": "$protocols.sites.subjects.dateOfConsent",
-            "dateOfEnrollment": "$protocols.sites.subjects.dateOfEnrollment",
-            "randomizationDate": "$protocols.sites.subjects.randomizationDate",
-            "treatmentArm": "$protocols.sites.subjects.treatmentArm",
-            "age": "$protocols.sites.subjects.age",
-            "dateOfBirth": "$protocols.sites.subjects.dateOfBirth",
-            "gender": "$protocols.sites.subjects.gender",
-            "ethnicity": "$protocols.sites.subjects.ethnicity",
-            "heightCm": "$protocols.sites.subjects.heightCm",
-            "weightKg": "$protocols.sites.subjects.weightKg",
-            "BMI": "$protocols.sites.subjects.BMI",
-            "bloodType": "$protocols.sites.subjects.bloodType",
-            "smokingStatus": "$protocols.sites.subjects.smokingStatus",
-            "alcoholConsumption": "$protocols.sites.subjects.alcoholConsumption",
-            "drugUse": "$protocols.sites.subjects.drugUse",
-            "comorbidities": "$protocols.sites.subjects.comorbidities",
-            "priorMedications": "$protocols.sites.subjects.priorMedications",
-            "familyHistory": "$protocols.sites.subjects.familyHistory",
-            "allergies": "$protocols.sites.subjects.allergies",
-            "dietaryRestrictions": "$protocols.sites.subjects.dietaryRestrictions",
-            "geneticMarkers": "$protocols.sites.subjects.geneticMarkers",
-            "visitCount": "$protocols.sites.subjects.visitCount",
-            "lastVisitDate": "$protocols.sites.subjects.lastVisitDate",
-            "nextScheduledVisit": "$protocols.sites.subjects.nextScheduledVisit",
-            "status": "$protocols.sites.subjects.status",
-            "finalStatus": "$protocols.sites.subjects.finalStatus",
-            "dateOfLastContact": "$protocols.sites.subjects.dateOfLastContact",
-            "previousTrial": "$protocols.sites.subjects.previousTrial",
-            "progressStatus": "$protocols.sites.subjects.progressStatus",
-            "protocolDeviation": "$protocols.sites.subjects.protocolDeviation",
-            "discontinuationReason": "$protocols.sites.subjects.discontinuationReason",
-            "dropoutReason": "$protocols.sites.subjects.dropoutReason",
-            "vaccinationStatus": "$protocols.sites.subjects.vaccinationStatus",
-            "socioeconomicStatus": "$protocols.sites.subjects.socioeconomicStatus",
-            "incomeBracket": "$protocols.sites.subjects.incomeBracket",
-            "educationLevel": "$protocols.sites.subjects.educationLevel",
-            "adherenceScore": "$protocols.sites.subjects.adherenceScore",
-            "medicationAdherence": "$protocols.sites.subjects.medicationAdherence",
-            "complications": "$protocols.sites.subjects.complications",
-            "vitalSigns": "$protocols.sites.subjects.vitalSigns",
-            "qualityOfLifeScores": "$protocols.sites.subjects.qualityOfLifeScores",
-            "studyDrugDosage": "$protocols.sites.subjects.studyDrugDosage",
-            "insuranceProvider": "$protocols.sites.subjects.insuranceProvider",
-            "emergencyContact": "$protocols.sites.subjects.emergencyContact",
-            
-            "siteId": "$protocols.sites.siteId",
-            "siteName": "$protocols.sites.siteName",
-            "protocolId": "$protocols.protocolId",
-            "protocolName": "$protocols.protocolName",
-            "companyId": "$companyId",
-            "companyName": "$companyName"
-        }}
-    ]
-    subject_doc = await db[COMPANY_COL].aggregate(pipeline).to_list(length=1)
+    # Owning company by _id (via the location map) and only the matching protocol
+    subject_doc = await find_subject(db, subject_id)
     if not subject_doc:
         raise HTTPException(status_code=404, detail="Subject not found")
     
     try:
-        return Subject(**subject_doc[0])
+        return Subject(**subject_doc)
     except Exception as e:
         logger.error(f"Error validating subject {subject_id}: {e}")
         raise HTTPException(status_code=500, detail="Error processing subject data")
@@ -227,12 +151,20 @@ async def list_subjects_for_site(
     max_age: Optional[int] = None,
     gender: Optional[str] = None,
     status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    explain: bool = False,
     current_user: UserInDB = Depends(get_current_user),
     db=Depends(get_database)
 ):
     """
     Retrieves all subjects associated with a specific site with pagination and search/filters.
+    `fields` (comma-separated) limits each subject to the listed fields.
     """
+    if explain and not is_admin(current_user):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="explain is admin only")
+    field_list = parse_fields(fields)
+
     # First, verify the site exists within any protocol
     site_exists_count = await db[COMPANY_COL].count_documents({"protocols.sites.siteId": site_id})
     if site_exists_count == 0:
@@ -266,81 +198,42 @@ async def list_subjects_for_site(
 
     if subject_match_criteria:
         pipeline.append({"$match": subject_match_criteria})
+    if cursor:
+        # Keyset page: seek past the last row's key instead of skipping
+        pipeline.append({"$match": after_key(SUBJECT_KEY, decode_cursor(cursor, len(SUBJECT_KEY)))})
+    pipeline = optimize_unwind_pipeline(pipeline)
 
-    # Get total count (before pagination)
-    total_count_pipeline = pipeline + [{"$count": "total"}]
-    total_result = await db[COMPANY_COL].aggregate(total_count_pipeline).to_list(length=1)
-    total_count = total_result[0]["total"] if total_result else 0
+    if cursor:
+        total_count, skip, total_count_pipeline = None, 0, None
+    else:
+        # Get total count (before pagination)
+        total_count_pipeline = pipeline + [{"$count": "total"}]
+        total_count = None
+        if not explain:
+            total_count = await SUBJECT_TOTALS.total(db[COMPANY_COL], total_count_pipeline)
+        skip = (page - 1) * limit
 
     # Apply pagination to the main pipeline
-    skip = (page - 1) * limit
     pipeline.extend([
+        sort_stage(SUBJECT_KEY),
         {"$skip": skip},
         {"$limit": limit},
-        {"$project": { # Project all subject fields and relevant context
-            "_id": 0,
-            "subjectId": "$protocols.sites.subjects.subjectId",
-            "screeningNumber": "$protocols.sites.subjects.screeningNumber",
-            "medicalRecordNumber": "$protocols.sites.subjects.medicalRecordNumber",
-            "dateOfConsent": "$protocols.sites.subjects.dateOfConsent",
-            "dateOfEnrollment": "$protocols.sites.subjects.dateOfEnrollment",
-            "randomizationDate": "$protocols.sites.subjects.randomizationDate",
-            "treatmentArm": "$protocols.sites.subjects.treatmentArm",
-            "age": "$protocols.sites.subjects.age",
-            "dateOfBirth": "$protocols.sites.subjects.dateOfBirth",
-            "gender": "$protocols.sites.subjects.gender",
-            "ethnicity": "$protocols.sites.subjects.ethnicity",
-            "heightCm": "$protocols.sites.subjects.heightCm",
-            "weightKg": "$protocols.sites.subjects.weightKg",
-            "BMI": "$protocols.sites.subjects.BMI",
-            "bloodType": "$protocols.sites.subjects.bloodType",
-            "smokingStatus": "$protocols.sites.subjects.smokingStatus",
-            "alcoholConsumption": "$protocols.sites.subjects.alcoholConsumption",
-            "drugUse": "$protocols.sites.subjects.drugUse",
-            "comorbidities": "$protocols.sites.subjects.comorbidities",
-            "priorMedications": "$protocols.sites.subjects.priorMedications",
-            "familyHistory": "$protocols.sites.subjects.familyHistory",
-            "allergies": "$protocols.sites.subjects.allergies",
-            "dietaryRestrictions": "$protocols.sites.subjects.dietaryRestrictions",
-            "geneticMarkers": "$protocols.sites.subjects.geneticMarkers",
-            "visitCount": "$protocols.sites.subjects.visitCount",
-            "lastVisitDate": "$protocols.sites.subjects.lastVisitDate",
-            "nextScheduledVisit": "$protocols.sites.subjects.nextScheduledVisit",
-            "status": "$protocols.sites.subjects.status",
-            "finalStatus": "$protocols.sites.subjects.finalStatus",
-            "dateOfLastContact": "$protocols.sites.subjects.dateOfLastContact",
-            "previousTrial": "$protocols.sites.subjects.previousTrial",
-            "progressStatus": "$protocols.sites.subjects.progressStatus",
-            "protocolDeviation": "$protocols.sites.subjects.protocolDeviation",
-            "discontinuationReason": "$protocols.sites.subjects.discontinuationReason",
-            "dropoutReason": "$protocols.sites.subjects.dropoutReason",
-            "vaccinationStatus": "$protocols.sites.subjects.vaccinationStatus",
-            "socioeconomicStatus": "$protocols.sites.subjects.socioeconomicStatus",
-            "incomeBracket": "$protocols.sites.subjects.incomeBracket",
-            "educationLevel": "$protocols.sites.subjects.educationLevel",
-            "adherenceScore": "$protocols.sites.subjects.adherenceScore",
-            "medicationAdherence": "$protocols.sites.subjects.medicationAdherence",
-            "complications": "$protocols.sites.subjects.complications",
-            "vitalSigns": "$protocols.sites.subjects.vitalSigns",
-            "qualityOfLifeScores": "$protocols.sites.subjects.qualityOfLifeScores",
-            "studyDrugDosage": "$protocols.sites.subjects.studyDrugDosage",
-            "insuranceProvider": "$protocols.sites.subjects.insuranceProvider",
-            "emergencyContact": "$protocols.sites.subjects.emergencyContact",
-            
-            "siteId": "$protocols.sites.siteId",
-            "siteName": "$protocols.sites.siteName",
-            "protocolId": "$protocols.protocolId",
-            "protocolName": "$protocols.protocolName",
-            "companyId": "$companyId",
-            "companyName": "$companyName"
-        }}
+        *subject_stages(field_list)
     ])
     
+    if explain:
+        return JSONResponse(await explain_pipelines(db[COMPANY_COL], pipeline, total_count_pipeline))
+
     items = await db[COMPANY_COL].aggregate(pipeline).to_list(length=None)
     
-    return {
+    result = {
         "total_count": total_count,
         "page": page,
         "limit": limit,
-        "items": items
-    }
\ No newline at end of file
+        "items": items,
+        "next_cursor": next_cursor(items, limit)
+    }
+    if field_list:
+        # Partial subjects would fail Subject validation; send them as projected
+        return JSONResponse(jsonable_encoder(result))
+    return result
\ No newline at end of file
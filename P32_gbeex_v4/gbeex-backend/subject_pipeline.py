@@ -0,0 +1,53 @@
+# subject_pipeline.py
+# Stages that turn an unwound company -> protocol -> site -> subject row into a
+# flat subject document with its site/protocol/company context.
+#
+# $replaceRoot + $mergeObjects promotes the embedded subject as a whole and adds
+# the six context fields on top, instead of a $project that evaluates one path
+# expression per subject field per document.
+from typing import List, Optional
+
+from fastapi import HTTPException, status
+
+from models.subjects import Subject
+from pagination import CURSOR_FIELD, key_expression
+
+SUBJECT_PATH = "$protocols.sites.subjects"
+
+# Context copied onto each subject; merged last so it wins on name clashes.
+SUBJECT_CONTEXT = {
+    "siteId": "$protocols.sites.siteId",
+    "siteName": "$protocols.sites.siteName",
+    "protocolId": "$protocols.protocolId",
+    "protocolName": "$protocols.protocolName",
+    "companyId": "$companyId",
+    "companyName": "$companyName",
+}
+
+# Sort/cursor key of an unwound subject row: subjectId alone can repeat across
+# companies, protocols and sites.
+SUBJECT_KEY = [
+    "protocols.sites.subjects.subjectId", "_id", "protocols.protocolId", "protocols.sites.siteId",
+]
+
+def subject_stages(fields: Optional[List[str]] = None) -> List[dict]:
+    # `fields` limits the output to those subject/context fields. Each row also
+    # carries its SUBJECT_KEY as CURSOR_FIELD, for next_cursor().
+    merged = [SUBJECT_PATH, SUBJECT_CONTEXT, {CURSOR_FIELD: key_expression(SUBJECT_KEY)}]
+    stages = [{"$replaceRoot": {"newRoot": {"$mergeObjects": merged}}}]
+    if fields:
+        stages.append({"$project": {"_id": 0, CURSOR_FIELD: 1, **{f: 1 for f in fields}}})
+    return stages
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    # The `fields` query parameter: comma-separated Subject field names.
+    if not fields:
+        return None
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in Subject.model_fields]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown subject field(s): {', '.join(unknown)}",
+        )
+    return requested or None
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# Load test for the login lockout: fires CONCURRENCY bad logins at once for one
+# user and checks the failure counter behaved atomically:
+#   - exactly one lockout happened (lockoutUntil set, counter back to 0);
+#   - only the attempts before the lockout got 401, the rest 403;
+#   - nothing succeeded or errored.
+# Resets the user's counters before and after, so run it against a test user.
+#
+#   python test_lockout_load.py [base_url] [db_name] [user_collection]
+#   (v3.2: python test_lockout_load.py http://127.0.0.1:8000 GBeeXData userData)
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from pymongo import MongoClient
+
+from config import MONGO_URI, DATABASE_NAME, USER_COL
+
+BASE_URL    = sys.argv[1] if len(sys.argv) > 1 else "http://127.0.0.1:8100"
+DB_NAME     = sys.argv[2] if len(sys.argv) > 2 else DATABASE_NAME
+COLLECTION  = sys.argv[3] if len(sys.argv) > 3 else USER_COL
+USERNAME    = os.getenv("LOCKOUT_TEST_USER", "KiranRaj008351")
+CONCURRENCY = int(os.getenv("LOCKOUT_TEST_CONCURRENCY", "50"))
+
+def reset(users):
+    users.update_one({"username": USERNAME}, {"$set": {"failedLoginAttempts": 0, "lockoutUntil": None}})
+
+def bad_login(_):
+    resp = requests.post(
+        BASE_URL + "/api/v1/auth/login",
+        data={"username": USERNAME, "password": "definitely-not-the-password"},
+        timeout=30,
+    )
+    return resp.status_code
+
+def main():
+    users = MongoClient(MONGO_URI)[DB_NAME][COLLECTION]
+    user = users.find_one({"username": USERNAME})
+    if user is None:
+        sys.exit(f"user {USERNAME!r} not found in {DB_NAME}.{COLLECTION}")
+    max_attempts = user.get("maxLoginAttempts", 5)
+
+    reset(users)
+    try:
+        with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+            statuses = Counter(pool.map(bad_login, range(CONCURRENCY)))
+        after = users.find_one({"username": USERNAME})
+    finally:
+        reset(users)
+
+    print(f"{CONCURRENCY} concurrent bad logins (maxLoginAttempts={max_attempts}): {dict(statuses)}")
+    print(f"after: failedLoginAttempts={after.get('failedLoginAttempts')} lockoutUntil={after.get('lockoutUntil')}")
+
+    failures = []
+    if set(statuses) - {401, 403}:
+        failures.append("unexpected status codes")
+    # The attempt that triggers the lockout answers 401 (v4) or 403 (v3.2).
+    if not max_attempts - 1 <= statuses[401] <= max_attempts:
+        failures.append(f"expected {max_attempts - 1}-{max_attempts} x 401, got {statuses[401]}")
+    if after.get("lockoutUntil") is None:
+        failures.append("account was not locked")
+    if after.get("failedLoginAttempts", 0) != 0:
+        failures.append("counter not reset by the lockout (lost or extra increments)")
+
+    for f in failures:
+        print("FAIL", f)
+    if failures:
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# Checks optimize_unwind_pipeline():
+#   1. the rewrite itself (no database needed);
+#   2. that every route-shaped pipeline returns exactly the same rows with and
+#      without the rewrite, against the database in MONGO_URI / DATABASE_NAME.
+#
+#   python test_pipeline_optimizer.py [--offline]
+import asyncio
+import sys
+import time
+
+from config import MONGO_URI, DATABASE_NAME, COMPANY_COL
+from pipeline_optimizer import optimize_unwind_pipeline
+
+SUBJECT_UNWIND = [
+    {"$unwind": "$protocols"},
+    {"$unwind": "$protocols.sites"},
+    {"$unwind": "$protocols.sites.subjects"},
+]
+SITE_UNWIND = SUBJECT_UNWIND[:2]
+PROTOCOL_UNWIND = SUBJECT_UNWIND[:1]
+
+def check_rewrite():
+    match = {"$match": {
+        "protocols.sites.subjects.gender": "F",
+        "protocols.sites.subjects.age": {"$gte": 18, "$lte": 65},
+        "protocols.sites.subjects.status": {"$ne": "Dropped"},
+        "$or": [{"protocols.sites.subjects.screeningNumber": {"$regex": "^S", "$options": "i"}}],
+    }}
+    out = optimize_unwind_pipeline(SUBJECT_UNWIND + [match, {"$count": "total"}])
+
+    # Pre-unwind $match: positive conditions only, the $ne stays behind.
+    pre = out[0]["$match"]["$and"]
+    assert {"protocols.sites.subjects.gender": "F"} in pre
+    assert {"protocols.sites.subjects.age": {"$gte": 18, "$lte": 65}} in pre
+    assert not any("protocols.sites.subjects.status" in c for c in pre)
+    assert any("$or" in c for c in pre)
+
+    # $filter on subjects only, without the regex or the $ne.
+    trim = [s for s in out if "$addFields" in s]
+    assert len(trim) == 1 and "protocols.sites.subjects" in trim[0]["$addFields"]
+    cond = str(trim[0]["$addFields"])
+    assert "$$this.gender" in cond and "$$this.age" in cond
+    assert "$$this.status" not in cond and "$$this.screeningNumber" not in cond
+
+    # The original stages are all still there, in order.
+    assert [s for s in out if s in SUBJECT_UNWIND + [match]] == SUBJECT_UNWIND + [match]
+    assert out[-1] == {"$count": "total"}
+
+    # A $match that runs before a level is unwound cannot trim that level.
+    site_first = [
+        {"$match": {"protocols.sites.siteId": "X"}},
+        {"$unwind": "$protocols"},
+        {"$unwind": "$protocols.sites"},
+        {"$match": {"protocols.sites.siteId": "X"}},
+    ]
+    out = optimize_unwind_pipeline(site_first)
+    assert [list(s["$addFields"]) for s in out if "$addFields" in s] == [["protocols.sites"]]
+    assert out.index({"$unwind": "$protocols"}) < out.index(next(s for s in out if "$addFields" in s))
+
+    # Pipelines without unwinds are returned as they are.
+    plain = [{"$match": {"companyId": "X"}}, {"$limit": 1}]
+    assert optimize_unwind_pipeline(plain) == plain
+    print("rewrite checks passed")
+
+async def sample_values(col):
+    # Real values to filter on, taken from the first subject in the database.
+    docs = await col.aggregate(SUBJECT_UNWIND + [{"$limit": 1}]).to_list(length=1)
+    protocol = docs[0]["protocols"]
+    site = protocol["sites"]
+    subject = site["subjects"]
+    return protocol, site, subject
+
+def route_pipelines(protocol, site, subject):
+    s = "protocols.sites.subjects."
+    regex = lambda v: {"$regex": v, "$options": "i"}
+    return {
+        "protocols, search": PROTOCOL_UNWIND + [{"$match": {"$or": [
+            {"protocols.protocolName": regex(protocol["protocolName"][:3])},
+            {"protocols.drugName": regex(protocol["protocolName"][:3])},
+        ]}}],
+        "protocols, cursor": PROTOCOL_UNWIND + [{"$match": {"protocols.protocolId": {"$gt": protocol["protocolId"]}}}],
+        "sites, search + cursor": SITE_UNWIND + [{"$match": {
+            "$or": [{"protocols.sites.city": regex(site["city"])}, {"protocols.sites.country": regex(site["country"])}],
+            "protocols.sites.siteId": {"$gt": site["siteId"]},
+        }}],
+        "subjects, age + gender": SUBJECT_UNWIND + [{"$match": {
+            s + "age": {"$gte": 30, "$lte": 50}, s + "gender": subject["gender"],
+        }}],
+        "subjects, status + cursor": SUBJECT_UNWIND + [{"$match": {
+            s + "status": subject["status"], s + "subjectId": {"$gt": subject["subjectId"]},
+        }}],
+        "subjects, search term": SUBJECT_UNWIND + [{"$match": {"$or": [
+            {s + "screeningNumber": regex(subject["screeningNumber"][:4])},
+            {s + "medicalRecordNumber": regex(subject["screeningNumber"][:4])},
+        ]}}],
+        "subjects for site": [
+            {"$match": {"protocols.sites.siteId": site["siteId"]}},
+            *SITE_UNWIND,
+            {"$match": {"protocols.sites.siteId": site["siteId"]}},
+            SUBJECT_UNWIND[2],
+            {"$match": {s + "age": {"$gte": 18}}},
+        ],
+    }
+
+async def timed(col, pipeline):
+    start = time.perf_counter()
+    rows = await col.aggregate(pipeline).to_list(length=None)
+    return time.perf_counter() - start, rows
+
+async def check_results():
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    col = AsyncIOMotorClient(MONGO_URI)[DATABASE_NAME][COMPANY_COL]
+    failed = 0
+    for name, pipeline in route_pipelines(*await sample_values(col)).items():
+        # Sort on the unwound ids so row order is comparable.
+        order = [{"$sort": {"protocols.protocolId": 1, "protocols.sites.siteId": 1,
+                            "protocols.sites.subjects.subjectId": 1}}]
+        t_old, old = await timed(col, pipeline + order)
+        t_new, new = await timed(col, optimize_unwind_pipeline(pipeline) + order)
+        ok = old == new
+        failed += not ok
+        print(f"{'OK  ' if ok else 'FAIL'} {name:>26}: {len(old):6d} rows  "
+              f"{t_old * 1e3:8.2f} ms -> {t_new * 1e3:8.2f} ms")
+    return failed
+
+if __name__ == "__main__":
+    check_rewrite()
+    if "--offline" not in sys.argv and asyncio.run(check_results()):
+        sys.exit(1)
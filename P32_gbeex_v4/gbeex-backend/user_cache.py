@@ -0,0 +1,67 @@
+# user_cache.py
+# Users loaded by auth.get_current_user, per username, for USER_CACHE_TTL
+# seconds (USER_CACHE_SIZE users at most, least recently used evicted).
+# routers/auth.py invalidates a user when a login touches the lockout fields.
+# A burst of requests with a fresh token shares one users lookup.
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+USER_CACHE_TTL  = float(os.getenv("USER_CACHE_TTL", "30"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1024"))
+
+class UserCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.generation = 0
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._loading: Dict[str, "asyncio.Future"] = {}
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def get_or_load(self, key: str, load: Callable[[], Awaitable[Optional[Any]]]) -> Optional[Any]:
+        # None (no such user) is not cached.
+        value = self.get(key)
+        if value is not None:
+            return value
+        task = self._loading.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, load, self.generation))
+            self._loading[key] = task
+            task.add_done_callback(lambda t: self._loading.pop(key, None) if self._loading.get(key) is t else None)
+        # shield: a cancelled request leaves the shared load running
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str, load: Callable[[], Awaitable[Optional[Any]]], generation: int) -> Optional[Any]:
+        # A user invalidated while the load ran is returned but not cached.
+        value = await load()
+        if value is not None and generation == self.generation:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, key: str) -> None:
+        self._entries.pop(key, None)
+        self._loading.pop(key, None)
+        self.generation += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._loading.clear()
+        self.generation += 1
+
+USERS = UserCache(USER_CACHE_SIZE, USER_CACHE_TTL)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# Per-row CPU cost of turning a page of search rows into a JSON response,
+# before (Model(**d).model_dump() per row, then FastAPI validating and encoding
+# the envelope) and after (services.serialization). No database needed.
+#
+#   python bench_serialization.py [per_page] [rounds]
+
+import json
+import sys
+import timeit
+from datetime import datetime
+
+from pydantic import TypeAdapter
+
+from models.subject import Subject
+from routes.search import PageEnvelope
+from services.serialization import json_response, validate_rows
+
+PER_PAGE = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+ROUNDS   = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+NOW = datetime(2024, 1, 1)
+SUBJECT = {
+    "subjectId": "SUBJ-0001", "screeningNumber": "SCR-0001", "medicalRecordNumber": "MRN-0001",
+    "dateOfConsent": NOW, "dateOfEnrollment": NOW, "randomizationDate": NOW,
+    "treatmentArm": "A", "age": 42, "dateOfBirth": NOW, "gender": "F", "ethnicity": "Asian",
+    "heightCm": 170, "weightKg": 65, "BMI": 22.5, "bloodType": "O+",
+    "smokingStatus": "Never", "alcoholConsumption": "Low", "drugUse": "None",
+    "comorbidities": ["Asthma"], "priorMedications": ["Ibuprofen"],
+    "familyHistory": ["Diabetes"], "allergies": ["Peanuts"],
+    "dietaryRestrictions": "None", "geneticMarkers": "BRCA1-",
+    "visitCount": 7, "lastVisitDate": NOW, "nextScheduledVisit": NOW,
+    "status": "Active", "finalStatus": None, "dateOfLastContact": NOW,
+    "previousTrial": False, "progressStatus": "On Track", "protocolDeviation": False,
+    "discontinuationReason": None, "dropoutReason": None, "vaccinationStatus": True,
+    "socioeconomicStatus": "Middle", "incomeBracket": "50-75k", "educationLevel": "Graduate",
+    "adherenceScore": 0.93, "medicationAdherence": 0.97, "complications": "None",
+    "vitalSigns": {"bloodPressure": "120/80", "heartRate": 70},
+    "qualityOfLifeScores": 78.5, "studyDrugDosage": "10mg", "insuranceProvider": "Acme",
+    "emergencyContact": {"name": "J. Doe", "relation": "Spouse", "phone": "555-0100"},
+    "siteId": "SITE-0001", "protocolId": "PROT-0001", "companyId": "COMP-0001",
+}
+
+ENVELOPE = TypeAdapter(PageEnvelope)
+
+
+def rows():
+    return [dict(SUBJECT, subjectId=f"SUBJ-{i:04d}") for i in range(PER_PAGE)]
+
+
+def before(docs):
+    items = [Subject(**d).model_dump() for d in docs]
+    envelope = PageEnvelope(items=items, page=1, per_page=PER_PAGE, total=PER_PAGE)
+    # What FastAPI does with a returned model and a response_model.
+    content = ENVELOPE.dump_python(ENVELOPE.validate_python(envelope), mode="json")
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def after(docs):
+    items = validate_rows(Subject, docs)
+    return json_response(PageEnvelope.model_construct(
+        items=items, page=1, per_page=PER_PAGE, total=PER_PAGE,
+    )).body
+
+
+def main():
+    assert json.loads(before(rows())) == json.loads(after(rows())), "outputs differ"
+    print(f"per_page={PER_PAGE}, rounds={ROUNDS}")
+    for name, fn in (("before", before), ("after", after)):
+        pages = [rows() for _ in range(ROUNDS)]
+        it = iter(pages)
+        seconds = timeit.timeit(lambda: fn(next(it)), number=ROUNDS)
+        print(f"{name:>6}: {seconds / ROUNDS * 1e3:8.3f} ms/page  {seconds / ROUNDS / PER_PAGE * 1e6:8.2f} us/row")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+# db/mongo.py
+
+from motor.motor_asyncio import AsyncIOMotorClient
+import os
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+DB_NAME   = "GBeeXDataV4"
+
+CLIENT = AsyncIOMotorClient(MONGO_URI)
+DB     = CLIENT[DB_NAME]
+COL    = DB["clientData"]
+
+# Flat read models, one document per protocol / site / subject.
+# Maintained by services/projections.py from clientData.
+PROTOCOL_COL = DB["protocolsFlat"]
+SITE_COL     = DB["sitesFlat"]
+SUBJECT_COL  = DB["subjectsFlat"]
@@ -1,23 +1,47 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware 
+from fastapi.middleware.cors import CORSMiddleware
 from routes.search import router as search_data_router
 from routes.search_meta import router as search_meta_router
+from routes.admin import router as admin_router
+from db.mongo import SUBJECT_COL
+from services.projections import rebuild_projections, watch_client_data
+from services.indexes import ensure_indexes
+
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await ensure_indexes()
+    tasks = [asyncio.create_task(watch_client_data())]
+    if await SUBJECT_COL.estimated_document_count() == 0:
+        logger.info("Flat search collections are empty, rebuilding from clientData")
+        tasks.append(asyncio.create_task(rebuild_projections()))
+    yield
+    for task in tasks:
+        task.cancel()
+    # Let a cancelled rebuild or resync unwind before the client goes away
+    await asyncio.gather(*tasks, return_exceptions=True)
 
-app = FastAPI(title="GBeeX API", version="1.0.0")
+app = FastAPI(title="GBeeX API", version="1.0.0", lifespan=lifespan)
 
 origins = [
     "http://localhost",
     "http://localhost:3000",
-    "http://127.0.0.1:3000",  
+    "http://127.0.0.1:3000",
 ]
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=origins,  
-    allow_credentials=True,  
-    allow_methods=["*"], 
+    allow_origins=origins,
+    allow_credentials=True,
+    allow_methods=["*"],
     allow_headers=["*"],
 )
 
 app.include_router(search_data_router)
 app.include_router(search_meta_router)
+app.include_router(admin_router)
@@ -0,0 +1,20 @@
+# models/partial.py
+
+from functools import lru_cache
+from typing import Optional, Type
+
+from pydantic import BaseModel, create_model
+
+
+@lru_cache(maxsize=None)
+def partial_model(model: Type[BaseModel]) -> Type[BaseModel]:
+    # Same model with every field optional (nested models too), for validating
+    # documents that were projected down to a few fields. Subclassing keeps the
+    # original validators and config.
+    fields = {}
+    for name, info in model.model_fields.items():
+        annotation = info.annotation
+        if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            annotation = partial_model(annotation)
+        fields[name] = (Optional[annotation], None)
+    return create_model(f"Partial{model.__name__}", __base__=model, **fields)
@@ -20,7 +20,8 @@ class EthicsApproval(BaseModel):
     approvalDate:  datetime
     approvalId:    str
 
-class Protocol(BaseModel):
+class ProtocolBase(BaseModel):
+    # A protocol without its nested sites, as stored in the flat search collection.
     protocolId:                  str
     protocolName:                str
     nctId:                       str
@@ -47,4 +48,6 @@ class Protocol(BaseModel):
     ethicsCommitteeApproval:     EthicsApproval
     regulatorySubmissions:       List[str]
     patientReportedOutcomes:     str
+
+class Protocol(ProtocolBase):
     sites:                       List[Site]
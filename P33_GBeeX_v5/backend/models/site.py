@@ -34,7 +34,8 @@ class ContactInfo(BaseModel):
     email: str
     phone: str
 
-class Site(BaseModel):
+class SiteBase(BaseModel):
+    # A site without its nested subjects, as stored in the flat search collection.
     siteId:                str
     siteName:              str
     siteType:              str
@@ -60,4 +61,6 @@ class Site(BaseModel):
     staffCount:            Dict[str, int]
     monitoringVisits:      int
     financials:            Dict[str, int]
+
+class Site(SiteBase):
     subjects:              List[Subject]
@@ -0,0 +1,24 @@
+# routes/admin.py
+
+from typing import Any, Dict, List
+
+from fastapi import APIRouter, Depends
+
+from services.admin_auth import require_admin
+from services.indexes import index_report
+from services.instrumentation import stage_snapshot
+
+router = APIRouter(prefix="/v1/admin", tags=["Admin"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/indexes")
+async def get_index_report() -> Dict[str, Any]:
+    # Which registered indexes exist or failed to build, and which search queries
+    # would run unindexed.
+    return await index_report()
+
+
+@router.get("/query-stats")
+async def get_query_stats() -> List[Dict[str, Any]]:
+    # Per-route timings of each search stage (count, find, facet, validate, encode).
+    return stage_snapshot()
@@ -1,28 +1,45 @@
-from fastapi import APIRouter, Query
-from typing import Any, Dict, List, Optional
-from pydantic import BaseModel
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import JSONResponse
+from typing import Any, Dict, List, Literal, Optional
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, create_model
+import asyncio
+import inspect
 import json
 
+from db.mongo import COL, PROTOCOL_COL, SITE_COL, SUBJECT_COL
+from services.admin_auth import admin_header
+from services.explain import explain_aggregate, explain_find
+from services.export import ExportFormat, stream_export
+from services.fields import compile_projection, parse_fields
+from services.instrumentation import log_query, search_route, stage
+from services.pagination import (
+    COUNT_CAP, CountMode, after_query, facet_pipeline, fetch_after, fetch_page, next_cursor,
+    use_facet,
+)
+from services.serialization import json_response, rows_adapter, validate_rows
+from services.text_search import prefix_filter, text_filter
+from routes.search_meta import COMPANY_META, PROTOCOL_META, SITE_META, SUBJECT_META
+from models.search_meta import SearchMeta
+from models.partial import partial_model
 from models.company import Company
-from models.protocol import Protocol
-from models.site import Site
+from models.protocol import ProtocolBase
+from models.site import SiteBase
 from models.subject import Subject
 
 router = APIRouter(prefix="/v1/search", tags=["Search Data"])
 
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
-DB_NAME = "GBeeXDataV4"
-CLIENT = AsyncIOMotorClient(MONGO_URI)
-DB = CLIENT[DB_NAME]
-COL = DB["clientData"]
-
+# Still the routes' response_model for the OpenAPI schema, but routes return it
+# pre-encoded through json_response.
 class PageEnvelope(BaseModel):
     items:    List[Any]
     page:     int
     per_page: int
-    total:    int
+    # None on cursor pages, which skip counting
+    total:    Optional[int]
+    # False when total is a capped or estimated figure (see count_mode)
+    total_exact: bool = True
+    # Pass back as `cursor` to fetch the next page; None on the last page
+    next_cursor: Optional[str] = None
 
 def strip_object_ids(obj: Any):
     if isinstance(obj, dict):
@@ -47,6 +64,103 @@ def pick_fields_from_item(item: dict, fields: List[str]) -> dict:
             out[path] = cur
     return out
 
+def sort_spec(sort_by: Optional[str], sort_order: Optional[str], id_field: str) -> List[tuple]:
+    # Requested sort first, then the entity ID, then _id: entity IDs are only
+    # unique per clientData document, and _id makes the order total so offset
+    # and cursor pages never skip or repeat rows. The tie-breakers follow the
+    # requested direction, so a descending sort is the ascending index read
+    # backwards rather than an in-memory sort.
+    direction = 1 if sort_order == "asc" else -1
+    if not sort_by or sort_by in (id_field, "_id"):
+        direction = direction if sort_by == id_field else 1
+        return [(id_field, direction), ("_id", direction)]
+    return [(sort_by, direction), (id_field, direction), ("_id", direction)]
+
+def field_projection(fields: Optional[str], meta: SearchMeta, sort: List[tuple]):
+    # Returns (requested, projection), both None when every field is wanted.
+    # Only fields the portlet advertises in response.fields may be requested;
+    # the sort keys (including _id) are always read so the next cursor can be
+    # built. _id is stripped again before the response.
+    requested = parse_fields(fields)
+    if not requested:
+        return None, None
+    allowed = [f.name for f in meta.response["fields"]]
+    try:
+        projection = compile_projection(requested, allowed, keep=[f for f, _ in sort])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return requested, projection
+
+def validate_items(model, raw_docs: List[dict], requested: Optional[List[str]]) -> List[Any]:
+    for d in raw_docs:
+        strip_object_ids(d)
+    if not requested:
+        # Model instances; they are serialized as-is by json_response.
+        return validate_rows(model, raw_docs)
+    # Projected docs only hold the requested paths, so validate against the
+    # all-optional variant of the model and keep just what came back.
+    return [
+        pick_fields_from_item(row.model_dump(exclude_unset=True), requested)
+        for row in validate_rows(partial_model(model), raw_docs)
+    ]
+
+def export_search(col, filt, sort, fields, meta: SearchMeta, model, fmt: ExportFormat, name: str, **kwargs):
+    # Stream every match instead of one page, with the same filter, sort and
+    # fields projection the page would use.
+    if fmt == "csv" and not fields:
+        # CSV needs fixed columns; default to the portlet's table columns.
+        fields = ",".join(f.name for f in meta.response["fields"])
+    requested, projection = field_projection(fields, meta, sort)
+    row_model = partial_model(model) if requested else model
+    adapter = rows_adapter(row_model)
+
+    def to_rows(docs):
+        for d in docs:
+            strip_object_ids(d)
+        rows = adapter.dump_python(adapter.validate_python(docs), mode="json", exclude_unset=bool(requested))
+        return [pick_fields_from_item(r, requested) for r in rows] if requested else rows
+
+    return stream_export(col, filt, sort, projection, to_rows, fmt, requested, name, **kwargs)
+
+async def explain_search(col, filt, sort, skip, limit, count_mode, cursor, projection, admin, facet=True):
+    # Query plans, from explain("executionStats"), for the queries this page
+    # would run instead of its results. Admin only.
+    if not admin:
+        raise HTTPException(status_code=403, detail="explain requires an admin token")
+    if cursor:
+        try:
+            query = after_query(filt, sort, cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        plans = {"find": await explain_find(col, query, sort, 0, limit, projection)}
+    elif count_mode == "estimate" and not filt:
+        plans = {"find": await explain_find(col, {}, sort, skip, limit, projection)}
+    elif use_facet(col, filt, sort, facet):
+        pipeline = facet_pipeline(filt, sort, skip, limit, count_mode, COUNT_CAP, projection)
+        plans = {"facet": await explain_aggregate(col, pipeline, allow_disk_use=True)}
+    else:
+        plans = {
+            "count": await explain_aggregate(col, [{"$match": filt}, {"$count": "n"}]),
+            "find":  await explain_find(col, filt, sort, skip, limit, projection),
+        }
+    return JSONResponse(plans)
+
+async def load_page(col, filt, sort, skip, limit, count_mode, cursor, projection=None, facet=True):
+    # Returns (raw_docs, total, total_exact, next_cursor).
+    # With a cursor the page is a keyset range scan and no total is computed;
+    # otherwise it is the usual skip/limit page with its total.
+    if cursor:
+        try:
+            raw_docs = await fetch_after(col, filt, sort, cursor, limit, projection)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        total, total_exact = None, False
+    else:
+        raw_docs, total, total_exact = await fetch_page(
+            col, filt, sort, skip, limit, count_mode, facet=facet, projection=projection
+        )
+    return raw_docs, total, total_exact, next_cursor(raw_docs, sort, limit)
+
 
 @router.get("/company", response_model=PageEnvelope)
 async def search_companies(
@@ -55,19 +169,23 @@ async def search_companies(
     sponsorType: Optional[str] = None,
     riskLevel: Optional[str]   = None,
     fields: Optional[str]= Query(None, description="list of fields to include"),
+    export: Optional[ExportFormat] = Query(None, description="ndjson | csv: stream every match instead of one page"),
+    explain: bool = Query(False, description="admin only: return the query plans instead of results"),
+    admin: bool = Depends(admin_header),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page; overrides page"),
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=100),
     sort_by: Optional[str] = Query(None),
-    sort_order: Optional[str]  = Query("asc")
+    sort_order: Optional[str]  = Query("asc"),
+    count_mode: CountMode      = Query("exact", description="exact | capped | estimate")
 ):
+    search_route("/company")
     skip, limit = (page - 1) * per_page, per_page
 
     filt: Dict[str, Any] = {}
     if q:
-        filt["$or"] = [
-            {"companyName": {"$regex": q, "$options": "i"}},
-            {"website": {"$regex": q, "$options": "i"}}
-        ]
+        # companyName / website, via the clientData text index
+        filt.update(text_filter(q))
     if companyName:
         filt["companyName"] = {"$regex": companyName, "$options": "i"}
     if sponsorType:
@@ -75,27 +193,33 @@ async def search_companies(
     if riskLevel:
         filt["riskLevel"] = riskLevel
 
-    total = await COL.count_documents(filt)
-    cursor = COL.find(filt)
-    if sort_by:
-        direction = 1 if sort_order == "asc" else -1
-        cursor = cursor.sort(sort_by, direction)
-
-    raw_docs = await cursor.skip(skip).limit(limit).to_list(length=limit)
+    sort = sort_spec(sort_by, sort_order, "companyId")
+    if export:
+        return export_search(
+            COL, filt, sort, fields, COMPANY_META, Company, export, "companies",
+            # whole company documents: keep batches small
+            batch_size=10,
+        )
+    requested, projection = field_projection(fields, COMPANY_META, sort)
+    if explain:
+        return await explain_search(COL, filt, sort, skip, limit, count_mode, cursor, projection, admin, facet=False)
 
-    print(f"DEBUG /company: Page {page}, Skip {skip}, Limit {limit}, Raw Docs Count: {len(raw_docs)}, Total: {total}")
-    # print(f"DEBUG /company: Raw Docs: {json.dumps(raw_docs, default=str, indent=2)}")
+    # Company documents embed every protocol/site/subject, so a page of them
+    # can outgrow a single $facet result; use the count + find path instead.
+    raw_docs, total, total_exact, next_page = await load_page(
+        COL, filt, sort, skip, limit, count_mode, cursor, projection, facet=False
+    )
 
-    for d in raw_docs:
-        strip_object_ids(d)
+    log_query(filt, page=page, per_page=per_page, total=total, returned=len(raw_docs))
 
-    requested = [f.strip() for f in fields.split(",")] if fields else None
-    items = []
-    for d in raw_docs:
-        company = Company(**d).model_dump()
-        items.append(pick_fields_from_item(company, requested) if requested else company)
+    with stage("validate"):
+        items = validate_items(Company, raw_docs, requested)
 
-    return PageEnvelope(items=items, page=page, per_page=per_page, total=total)
+    with stage("encode"):
+        return json_response(PageEnvelope.model_construct(
+            items=items, page=page, per_page=per_page, total=total,
+            total_exact=total_exact, next_cursor=next_page,
+        ))
 
 
 @router.get("/protocol", response_model=PageEnvelope)
@@ -106,69 +230,59 @@ async def search_protocols(
     status: Optional[str] = None,
     companyId: Optional[str] = None,
     fields: Optional[str] = Query(None, description="list of fields to include"),
+    export: Optional[ExportFormat] = Query(None, description="ndjson | csv: stream every match instead of one page"),
+    explain: bool = Query(False, description="admin only: return the query plans instead of results"),
+    admin: bool = Depends(admin_header),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page; overrides page"),
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=100),
     sort_by: Optional[str] = Query(None),
-    sort_order: Optional[str] = Query("asc")
+    sort_order: Optional[str] = Query("asc"),
+    count_mode: CountMode = Query("exact", description="exact | capped | estimate")
 ):
+    search_route("/protocol")
     skip, limit = (page - 1) * per_page, per_page
 
-    pipeline = [{"$unwind": "$protocols"}]
-    match: Dict[str, Any] = {}
+    filt: Dict[str, Any] = {}
     if companyId:
-        match["companyId"] = companyId
+        filt["companyId"] = companyId
     
     q_filters = []
     if q:
-        q_filters.append({"protocols.protocolName": {"$regex": q, "$options": "i"}})
-        q_filters.append({"protocols.nctId": {"$regex": q, "$options": "i"}})
+        # Every $or branch is indexed, so $text is allowed inside it.
+        q_filters.append({"$or": [text_filter(q), prefix_filter("nctId", q)]})
     if protocolName:
-        q_filters.append({"protocols.protocolName": {"$regex": protocolName, "$options": "i"}})
+        q_filters.append({"protocolName": {"$regex": protocolName, "$options": "i"}})
 
     if q_filters:
-        match["$and"] = q_filters
+        filt["$and"] = q_filters
 
     if phase:
-        match["protocols.phase"] = phase
+        filt["phase"] = phase
     if status:
-        match["protocols.status"] = status
-    
-    if match:
-        pipeline.append({"$match": match})
+        filt["status"] = status
 
-    count_pipeline = list(pipeline)
-    count_pipeline.append({"$count": "total_count"})
-    total_result = await COL.aggregate(count_pipeline).to_list(length=1)
-    total = total_result[0]["total_count"] if total_result else 0
-
-    print(f"DEBUG /protocol: Page {page}, Per Page {per_page}, Skip {skip}, Limit {limit}")
-    print(f"DEBUG /protocol: Total count reported: {total}")
-    print(f"DEBUG /protocol: Aggregation match stage: {json.dumps(match, default=str, indent=2)}")
-    
-    data_pipeline = list(pipeline) 
-    if sort_by:
-        direction = 1 if sort_order == "asc" else -1
-        data_pipeline.append({"$sort": {f"protocols.{sort_by}": direction}})
-    data_pipeline.append({"$sort": {"protocols.protocolId": 1}}) 
+    sort = sort_spec(sort_by, sort_order, "protocolId")
+    if export:
+        return export_search(PROTOCOL_COL, filt, sort, fields, PROTOCOL_META, ProtocolBase, export, "protocols")
+    requested, projection = field_projection(fields, PROTOCOL_META, sort)
+    if explain:
+        return await explain_search(PROTOCOL_COL, filt, sort, skip, limit, count_mode, cursor, projection, admin)
 
-    data_pipeline.extend([{"$skip": skip}, {"$limit": limit}])
+    raw_docs, total, total_exact, next_page = await load_page(
+        PROTOCOL_COL, filt, sort, skip, limit, count_mode, cursor, projection
+    )
 
-    print(f"DEBUG /protocol: Full aggregation pipeline for data: {json.dumps(data_pipeline, default=str, indent=2)}")
-
-
-    raw_docs = await COL.aggregate(data_pipeline).to_list(length=limit)
-    print(f"DEBUG /protocol: Raw docs received for page {page}: {len(raw_docs)}")
-
-    for d in raw_docs:
-        strip_object_ids(d)
+    log_query(filt, page=page, per_page=per_page, total=total, returned=len(raw_docs))
 
-    requested = [f.strip() for f in fields.split(",")] if fields else None
-    items = []
-    for d in raw_docs:
-        proto = Protocol(**d["protocols"]).model_dump()
-        items.append(pick_fields_from_item(proto, requested) if requested else proto)
+    with stage("validate"):
+        items = validate_items(ProtocolBase, raw_docs, requested)
 
-    return PageEnvelope(items=items, page=page, per_page=per_page, total=total)
+    with stage("encode"):
+        return json_response(PageEnvelope.model_construct(
+            items=items, page=page, per_page=per_page, total=total,
+            total_exact=total_exact, next_cursor=next_page,
+        ))
 
 @router.get("/site", response_model=PageEnvelope)
 async def search_sites(
@@ -179,74 +293,61 @@ async def search_sites(
     status: Optional[str]   = None,
     protocolId: Optional[str]= None,
     fields: Optional[str]    = Query(None, description="list of fields to include"),
+    export: Optional[ExportFormat] = Query(None, description="ndjson | csv: stream every match instead of one page"),
+    explain: bool = Query(False, description="admin only: return the query plans instead of results"),
+    admin: bool = Depends(admin_header),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page; overrides page"),
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=100),
     sort_by: Optional[str]   = Query(None),
-    sort_order: Optional[str]= Query("asc")
+    sort_order: Optional[str]= Query("asc"),
+    count_mode: CountMode    = Query("exact", description="exact | capped | estimate")
 ):
+    search_route("/site")
     skip, limit = (page - 1) * per_page, per_page
 
-    pipeline = [
-        {"$unwind": "$protocols"},
-        {"$unwind": "$protocols.sites"}
-    ]
-    match: Dict[str, Any] = {}
+    filt: Dict[str, Any] = {}
     if protocolId:
-        match["protocols.sites.protocolId"] = protocolId
+        filt["protocolId"] = protocolId
     
     q_filters = []
     if q:
-        q_filters.append({"protocols.sites.siteName": {"$regex": q, "$options": "i"}})
-        q_filters.append({"protocols.sites.city": {"$regex": q, "$options": "i"}})
+        # siteName / city, via the site text index
+        q_filters.append(text_filter(q))
     if siteName:
-        q_filters.append({"protocols.sites.siteName": {"$regex": siteName, "$options": "i"}})
+        q_filters.append({"siteName": {"$regex": siteName, "$options": "i"}})
 
     if q_filters:
-        match["$and"] = q_filters
+        filt["$and"] = q_filters
 
     if city:
-        match["protocols.sites.city"] = city
+        filt["city"] = city
     if country:
-        match["protocols.sites.country"] = country
+        filt["country"] = country
     if status:
-        match["protocols.sites.status"] = status
-    if match:
-        pipeline.append({"$match": match})
-
-    # Calculate total count
-    count_pipeline = list(pipeline)
-    count_pipeline.append({"$count": "total_count"})
-    total_result = await COL.aggregate(count_pipeline).to_list(length=1)
-    total = total_result[0]["total_count"] if total_result else 0
-
-    print(f"DEBUG /site: Page {page}, Per Page {per_page}, Skip {skip}, Limit {limit}")
-    print(f"DEBUG /site: Total count reported: {total}")
-    print(f"DEBUG /site: Aggregation match stage: {json.dumps(match, default=str, indent=2)}")
-    
-    data_pipeline = list(pipeline)
-    if sort_by:
-        direction = 1 if sort_order == "asc" else -1
-        data_pipeline.append({"$sort": {f"protocols.sites.{sort_by}": direction}})
-    data_pipeline.append({"$sort": {"protocols.sites.siteId": 1}})
+        filt["status"] = status
 
-    data_pipeline.extend([{"$skip": skip}, {"$limit": limit}])
+    sort = sort_spec(sort_by, sort_order, "siteId")
+    if export:
+        return export_search(SITE_COL, filt, sort, fields, SITE_META, SiteBase, export, "sites")
+    requested, projection = field_projection(fields, SITE_META, sort)
+    if explain:
+        return await explain_search(SITE_COL, filt, sort, skip, limit, count_mode, cursor, projection, admin)
 
-    print(f"DEBUG /site: Full aggregation pipeline for data: {json.dumps(data_pipeline, default=str, indent=2)}")
+    raw_docs, total, total_exact, next_page = await load_page(
+        SITE_COL, filt, sort, skip, limit, count_mode, cursor, projection
+    )
 
-    raw_docs = await COL.aggregate(data_pipeline).to_list(length=limit)
-
-    print(f"DEBUG /site: Raw docs received for page {page}: {len(raw_docs)}")
-
-    for d in raw_docs:
-        strip_object_ids(d)
+    log_query(filt, page=page, per_page=per_page, total=total, returned=len(raw_docs))
 
-    requested = [f.strip() for f in fields.split(",")] if fields else None
-    items = []
-    for d in raw_docs:
-        site = Site(**d["protocols"]["sites"]).model_dump()
-        items.append(pick_fields_from_item(site, requested) if requested else site)
+    with stage("validate"):
+        items = validate_items(SiteBase, raw_docs, requested)
 
-    return PageEnvelope(items=items, page=page, per_page=per_page, total=total)
+    with stage("encode"):
+        return json_response(PageEnvelope.model_construct(
+            items=items, page=page, per_page=per_page, total=total,
+            total_exact=total_exact, next_cursor=next_page,
+        ))
 
 @router.get("/subject", response_model=PageEnvelope)
 async def search_subjects(
@@ -256,69 +357,111 @@ async def search_subjects(
     status: Optional[str] = None,
     siteId: Optional[str]= None,
     fields: Optional[str] = Query(None, description="list of fields to include"),
+    export: Optional[ExportFormat] = Query(None, description="ndjson | csv: stream every match instead of one page"),
+    explain: bool = Query(False, description="admin only: return the query plans instead of results"),
+    admin: bool = Depends(admin_header),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page; overrides page"),
     page: int = Query(1, ge=1),
     per_page: int  = Query(20, ge=1, le=100),
     sort_by: Optional[str]  = Query(None),
-    sort_order: Optional[str] = Query("asc")
+    sort_order: Optional[str] = Query("asc"),
+    count_mode: CountMode = Query("exact", description="exact | capped | estimate")
 ):
+    search_route("/subject")
     skip, limit = (page - 1) * per_page, per_page
 
-    pipeline = [
-        {"$unwind": "$protocols"},
-        {"$unwind": "$protocols.sites"},
-        {"$unwind": "$protocols.sites.subjects"}
-    ]
-    match: Dict[str, Any] = {}
+    filt: Dict[str, Any] = {}
     if siteId:
-        match["protocols.sites.siteId"] = siteId
+        filt["siteId"] = siteId
     
     q_filters = []
     if q:
-        q_filters.append({"protocols.sites.subjects.screeningNumber": {"$regex": q, "$options": "i"}})
-        q_filters.append({"protocols.sites.subjects.medicalRecordNumber": {"$regex": q, "$options": "i"}})
+        q_filters.append({"$or": [prefix_filter("screeningNumber", q),
+                                  prefix_filter("medicalRecordNumber", q)]})
     if screeningNumber:
-        q_filters.append({"protocols.sites.subjects.screeningNumber": {"$regex": screeningNumber, "$options": "i"}})
+        q_filters.append(prefix_filter("screeningNumber", screeningNumber))
 
     if q_filters:
-        match["$and"] = q_filters
+        filt["$and"] = q_filters
 
     if medicalRecordNumber:
-        match["protocols.sites.subjects.medicalRecordNumber"] = medicalRecordNumber
+        filt["medicalRecordNumber"] = medicalRecordNumber
     if status:
-        match["protocols.sites.subjects.status"] = status
-    if match:
-        pipeline.append({"$match": match})
-
-    count_pipeline = list(pipeline)
-    count_pipeline.append({"$count": "total_count"})
-    total_result = await COL.aggregate(count_pipeline).to_list(length=1)
-    total = total_result[0]["total_count"] if total_result else 0
-
-    print(f"DEBUG /subject: Page {page}, Per Page {per_page}, Skip {skip}, Limit {limit}")
-    print(f"DEBUG /subject: Total count reported: {total}")
-    print(f"DEBUG /subject: Aggregation match stage: {json.dumps(match, default=str, indent=2)}")
-    
-    data_pipeline = list(pipeline)
-    if sort_by:
-        direction = 1 if sort_order == "asc" else -1
-        data_pipeline.append({"$sort": {f"protocols.sites.subjects.{sort_by}": direction}})
-    data_pipeline.append({"$sort": {"protocols.sites.subjects.subjectId": 1}})
-
-    data_pipeline.extend([{"$skip": skip}, {"$limit": limit}])
-    print(f"DEBUG /subject: Full aggregation pipeline for data: {json.dumps(data_pipeline, default=str, indent=2)}")
-
-    raw_docs = await COL.aggregate(data_pipeline).to_list(length=limit)
-    print(f"DEBUG /subject: Raw docs received for page {page}: {len(raw_docs)}")
-
-    requested = [f.strip() for f in fields.split(",")] if fields else None
-    items = []
-    for d in raw_docs:
-        strip_object_ids(d)
-        subj = d["protocols"]["sites"]["subjects"]
-        for key in ("previousTrial","protocolDeviation","vaccinationStatus"):
-            if isinstance(subj.get(key), bool):
-                subj[key] = str(subj[key])
-        validated = Subject(**subj).model_dump()
-        items.append(pick_fields_from_item(validated, requested) if requested else validated)
-
-    return PageEnvelope(items=items, page=page, per_page=per_page, total=total)
\ No newline at end of file
+        filt["status"] = status
+
+    sort = sort_spec(sort_by, sort_order, "subjectId")
+    if export:
+        return export_search(SUBJECT_COL, filt, sort, fields, SUBJECT_META, Subject, export, "subjects")
+    requested, projection = field_projection(fields, SUBJECT_META, sort)
+    if explain:
+        return await explain_search(SUBJECT_COL, filt, sort, skip, limit, count_mode, cursor, projection, admin)
+
+    raw_docs, total, total_exact, next_page = await load_page(
+        SUBJECT_COL, filt, sort, skip, limit, count_mode, cursor, projection
+    )
+
+    log_query(filt, page=page, per_page=per_page, total=total, returned=len(raw_docs))
+
+    # Subject.bools_to_str turns legacy boolean flags into strings.
+    with stage("validate"):
+        items = validate_items(Subject, raw_docs, requested)
+
+    with stage("encode"):
+        return json_response(PageEnvelope.model_construct(
+            items=items, page=page, per_page=per_page, total=total,
+            total_exact=total_exact, next_cursor=next_page,
+        ))
+
+
+# --- Batch: several searches in one round trip ---
+
+MAX_BATCH = 10
+
+class BatchSpec(BaseModel):
+    entity: Literal["company", "protocol", "site", "subject"]
+    # Same query parameters the entity's GET route takes, e.g. {"q": "onc", "per_page": 5}
+    params: Dict[str, Any] = {}
+
+class BatchRequest(BaseModel):
+    searches: List[BatchSpec] = Field(..., min_length=1, max_length=MAX_BATCH)
+
+# Exports stream and explain is admin only, so neither runs in a batch.
+BATCH_FIXED_PARAMS = {"export": None, "explain": False, "admin": False}
+
+def params_model(handler):
+    # A route's query parameters as a model, keeping their Query defaults and bounds.
+    fields = {
+        name: (p.annotation, p.default)
+        for name, p in inspect.signature(handler).parameters.items()
+        if name not in BATCH_FIXED_PARAMS
+    }
+    return create_model(f"{handler.__name__}_params", __config__=ConfigDict(extra="forbid"), **fields)
+
+BATCH_HANDLERS = {
+    "company":  (search_companies, params_model(search_companies)),
+    "protocol": (search_protocols, params_model(search_protocols)),
+    "site":     (search_sites,     params_model(search_sites)),
+    "subject":  (search_subjects,  params_model(search_subjects)),
+}
+
+async def run_batch_spec(spec: BatchSpec) -> bytes:
+    # One {"entity", "status", "body"} result; body is the route's own JSON.
+    handler, params = BATCH_HANDLERS[spec.entity]
+    try:
+        response = await handler(**params(**spec.params).model_dump(), **BATCH_FIXED_PARAMS)
+        status_code, body = 200, response.body
+    except ValidationError as e:
+        status_code = 422
+        body = json.dumps({"detail": e.errors(include_url=False)}, default=str).encode()
+    except HTTPException as e:
+        status_code, body = e.status_code, json.dumps({"detail": e.detail}).encode()
+    head = json.dumps({"entity": spec.entity, "status": status_code})[:-1]
+    return f'{head}, "body": '.encode() + body + b"}"
+
+@router.post("/batch")
+async def search_batch(batch: BatchRequest):
+    # The searches run concurrently over the shared Motor client. Results come
+    # back in request order, and a failing search reports its own status
+    # instead of failing the whole batch.
+    parts = await asyncio.gather(*(run_batch_spec(spec) for spec in batch.searches))
+    return Response(content=b'{"results": [' + b", ".join(parts) + b"]}", media_type="application/json")
@@ -1,6 +1,9 @@
 # routes/search_meta.py
 
-from fastapi import APIRouter
+import hashlib
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, Request, Response
 from models.search_meta import SearchMeta, ParamMeta, FieldMeta, UiMeta
 
 router = APIRouter(prefix="/v1/search", tags=["Search Meta"])
@@ -9,7 +12,7 @@ router = APIRouter(prefix="/v1/search", tags=["Search Meta"])
 # Company Meta 
 COMPANY_META = SearchMeta(
     parameters=[
-        ParamMeta(name="q",            type="string", description="Full‑text search across all company fields"),
+        ParamMeta(name="q",            type="string", description="Full‑text search on company name and website"),
         ParamMeta(name="page",         type="number", default=1,      description="Page number for pagination"),
         ParamMeta(name="per_page",     type="number", default=20,     description="Results per page"),
         ParamMeta(name="sort_by",      type="string", description="Field to sort on"),
@@ -42,14 +45,17 @@ COMPANY_META = SearchMeta(
         "pageParam":      "page",
         "perPageParam":   "per_page",
         "defaultPerPage": 20,
-        "maxPerPage":     100
+        "maxPerPage":     100,
+        "cursorParam":    "cursor",
+        "nextCursorField":"next_cursor",
+        "exportParam":    "export"
     }
 )
 
 # Protocol Meta 
 PROTOCOL_META = SearchMeta(
     parameters=[
-        ParamMeta(name="q",            type="string", description="Full‑text search across protocol fields"),
+        ParamMeta(name="q",            type="string", description="Full‑text search on protocol name, or NCT ID prefix"),
         ParamMeta(name="page",         type="number", default=1,      description="Page number"),
         ParamMeta(name="per_page",     type="number", default=20,     description="Results per page"),
         ParamMeta(name="sort_by",      type="string", description="Field to sort on"),
@@ -84,14 +90,17 @@ PROTOCOL_META = SearchMeta(
         "pageParam":      "page",
         "perPageParam":   "per_page",
         "defaultPerPage": 20,
-        "maxPerPage":     100
+        "maxPerPage":     100,
+        "cursorParam":    "cursor",
+        "nextCursorField":"next_cursor",
+        "exportParam":    "export"
     }
 )
 
 # Site Meta 
 SITE_META = SearchMeta(
     parameters=[
-        ParamMeta(name="q",          type="string", description="Full‑text search across site fields"),
+        ParamMeta(name="q",          type="string", description="Full‑text search on site name and city"),
         ParamMeta(name="page",       type="number", default=1,      description="Page number"),
         ParamMeta(name="per_page",   type="number", default=20,     description="Results per page"),
         ParamMeta(name="sort_by",    type="string", description="Field to sort on"),
@@ -124,7 +133,10 @@ SITE_META = SearchMeta(
         "pageParam":      "page",
         "perPageParam":   "per_page",
         "defaultPerPage": 20,
-        "maxPerPage":     100
+        "maxPerPage":     100,
+        "cursorParam":    "cursor",
+        "nextCursorField":"next_cursor",
+        "exportParam":    "export"
     }
 )
 
@@ -132,14 +144,14 @@ SITE_META = SearchMeta(
 
 SUBJECT_META = SearchMeta(
     parameters=[
-        ParamMeta(name="q",                    type="string", description="Full‑text search across subject fields"),
+        ParamMeta(name="q",                    type="string", description="Screening number or MRN prefix"),
         ParamMeta(name="page",                 type="number", default=1,      description="Page number"),
         ParamMeta(name="per_page",             type="number", default=20,     description="Results per page"),
         ParamMeta(name="sort_by",              type="string", description="Field to sort on"),
         ParamMeta(name="sort_order",           type="enum",   options=["asc","desc"], default="asc", description="Sort direction"),
         ParamMeta(name="fields",               type="string", description="Comma‑separated list of fields to include"),
         ParamMeta(name="subjectId",            type="string", description="Filter by subject UUID"),
-        ParamMeta(name="screeningNumber",      type="string", description="Screening number"),
+        ParamMeta(name="screeningNumber",      type="string", description="Screening number prefix"),
         ParamMeta(name="medicalRecordNumber",  type="string", description="Medical record number"),
         ParamMeta(name="status",               type="enum",   options=["Enrolled","Completed","Dropped","Screen Failure"], description="Subject status"),
     ],
@@ -165,22 +177,54 @@ SUBJECT_META = SearchMeta(
         "pageParam":      "page",
         "perPageParam":   "per_page",
         "defaultPerPage": 20,
-        "maxPerPage":     100
+        "maxPerPage":     100,
+        "cursorParam":    "cursor",
+        "nextCursorField":"next_cursor",
+        "exportParam":    "export"
     }
 )
 
+# Meta is static for the life of the process, and every portlet fetches it
+# before rendering. Encode each one once, give it a strong ETag (a hash of the
+# bytes), and let clients revalidate with If-None-Match.
+META_CACHE_CONTROL = "public, max-age=300"
+
+def encode_meta(meta: SearchMeta) -> Tuple[bytes, str]:
+    body = meta.model_dump_json().encode()
+    return body, '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+COMPANY_META_JSON  = encode_meta(COMPANY_META)
+PROTOCOL_META_JSON = encode_meta(PROTOCOL_META)
+SITE_META_JSON     = encode_meta(SITE_META)
+SUBJECT_META_JSON  = encode_meta(SUBJECT_META)
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so W/"x" matches "x".
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+def meta_response(request: Request, encoded: Tuple[bytes, str]) -> Response:
+    body, etag = encoded
+    headers = {"ETag": etag, "Cache-Control": META_CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @router.get("/company/meta", response_model=SearchMeta)
-async def get_company_meta():
-    return COMPANY_META
+async def get_company_meta(request: Request):
+    return meta_response(request, COMPANY_META_JSON)
 
 @router.get("/site/meta", response_model=SearchMeta)
-async def get_site_meta():
-    return SITE_META
+async def get_site_meta(request: Request):
+    return meta_response(request, SITE_META_JSON)
 
 @router.get("/protocol/meta", response_model=SearchMeta)
-async def get_protocol_meta():
-    return PROTOCOL_META
+async def get_protocol_meta(request: Request):
+    return meta_response(request, PROTOCOL_META_JSON)
 
 @router.get("/subject/meta", response_model=SearchMeta)
-async def get_subject_meta():
-    return SUBJECT_META
+async def get_subject_meta(request: Request):
+    return meta_response(request, SUBJECT_META_JSON)
@@ -0,0 +1,26 @@
+# services/admin_auth.py
+#
+# The v5 API has no user accounts, so admin-only features (the /v1/admin
+# routes and search explain mode) are unlocked by a shared token sent as
+# X-Admin-Token. With GBEEX_ADMIN_TOKEN unset they are unavailable.
+
+import hmac
+import os
+from typing import Optional
+
+from fastapi import Depends, Header, HTTPException
+
+ADMIN_TOKEN = os.getenv("GBEEX_ADMIN_TOKEN")
+
+
+def is_admin_token(token: Optional[str]) -> bool:
+    return bool(ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+async def admin_header(x_admin_token: Optional[str] = Header(None)) -> bool:
+    return is_admin_token(x_admin_token)
+
+
+async def require_admin(is_admin: bool = Depends(admin_header)) -> None:
+    if not is_admin:
+        raise HTTPException(status_code=403, detail="Admin token required")
@@ -0,0 +1,79 @@
+# services/count_cache.py
+#
+# Search totals per collection, keyed by (filter, count mode, cap) within it,
+# so paging through a fixed filter counts once. Entries expire after
+# COUNT_CACHE_TTL seconds and each collection keeps at most COUNT_CACHE_SIZE,
+# least recently used first out.
+#
+# Invalidation is per collection, driven by services/projections.py: a
+# clientData change drops clientData's totals and those of the flat
+# collections its resync wrote to; a full rebuild drops everything. Without
+# change streams the periodic rebuild and the TTL bound staleness.
+
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from bson import json_util
+
+COUNT_CACHE_TTL  = float(os.getenv("COUNT_CACHE_TTL", "60"))
+COUNT_CACHE_SIZE = int(os.getenv("COUNT_CACHE_SIZE", "1024"))
+
+Total = Tuple[int, bool]  # (total, exact)
+
+
+def _canonical(value: Any) -> Any:
+    # Filters built from the same query params in a different key order match
+    # the same rows; list order ($and, $or, $in) is kept as given.
+    if isinstance(value, dict):
+        return {k: _canonical(value[k]) for k in sorted(value)}
+    if isinstance(value, list):
+        return [_canonical(v) for v in value]
+    return value
+
+
+def filter_key(filt: Dict[str, Any], count_mode: str, count_cap: int) -> str:
+    return json_util.dumps([_canonical(filt), count_mode, count_cap])
+
+
+class CountCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._totals: Dict[str, "OrderedDict[str, Tuple[float, Total]]"] = {}
+        # Per-collection version, bumped on invalidation. put() takes the
+        # version read before counting and drops totals that are now stale.
+        self._versions: Dict[str, int] = {}
+
+    def version(self, collection: str) -> int:
+        return self._versions.setdefault(collection, 0)
+
+    def get(self, collection: str, key: str) -> Optional[Total]:
+        totals = self._totals.get(collection)
+        entry = totals.get(key) if totals else None
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del totals[key]
+            return None
+        totals.move_to_end(key)
+        return entry[1]
+
+    def put(self, collection: str, key: str, total: Total, version: int) -> None:
+        if version != self.version(collection):
+            return
+        totals = self._totals.setdefault(collection, OrderedDict())
+        totals[key] = (time.monotonic() + self.ttl, total)
+        totals.move_to_end(key)
+        while len(totals) > self.maxsize:
+            totals.popitem(last=False)
+
+    def invalidate(self, *collections: str) -> None:
+        # No argument: every collection.
+        for name in collections or list(self._versions):
+            self._totals.pop(name, None)
+            self._versions[name] = self.version(name) + 1
+
+
+COUNTS = CountCache(COUNT_CACHE_SIZE, COUNT_CACHE_TTL)
@@ -0,0 +1,79 @@
+# services/explain.py
+#
+# Runs a query through MongoDB's explain("executionStats") and boils the
+# output down to what matters when hunting slow filters: documents and keys
+# examined vs. returned, which indexes the winning plan used, whether it fell
+# back to a collection scan, and the per-stage counts and time estimates.
+
+from typing import Any, Dict, List, Optional, Set
+
+
+def _plan_nodes(node: Optional[dict]):
+    # Depth-first walk over a plan tree (inputStage / inputStages).
+    # Slot-based plans wrap the classic tree in "queryPlan".
+    if not node:
+        return
+    node = node.get("queryPlan", node)
+    yield node
+    yield from _plan_nodes(node.get("inputStage"))
+    for child in node.get("inputStages", []):
+        yield from _plan_nodes(child)
+
+
+def summarize_explain(explain: Dict[str, Any]) -> Dict[str, Any]:
+    # find explains carry queryPlanner/executionStats at the top level; an
+    # aggregation that was not pushed down entirely lists its stages, with the
+    # query layer under the leading $cursor stage.
+    query_layer = explain
+    pipeline_stages: List[Dict[str, Any]] = []
+    for stage in explain.get("stages", []):
+        name = next((k for k in stage if k.startswith("$")), "?")
+        if name == "$cursor":
+            query_layer = stage["$cursor"]
+        pipeline_stages.append({
+            "stage": name,
+            "nReturned": stage.get("nReturned"),
+            "executionTimeMillisEstimate": stage.get("executionTimeMillisEstimate"),
+        })
+
+    stats = query_layer.get("executionStats", {})
+    winning = query_layer.get("queryPlanner", {}).get("winningPlan")
+    plan_stages = [n.get("stage") for n in _plan_nodes(winning)]
+    indexes: Set[str] = {n["indexName"] for n in _plan_nodes(winning) if n.get("indexName")}
+
+    return {
+        "nReturned":           stats.get("nReturned"),
+        "totalDocsExamined":   stats.get("totalDocsExamined"),
+        "totalKeysExamined":   stats.get("totalKeysExamined"),
+        "executionTimeMillis": stats.get("executionTimeMillis"),
+        "indexesUsed":         sorted(indexes),
+        "collectionScan":      "COLLSCAN" in plan_stages,
+        "planStages": [
+            {
+                "stage":                       n.get("stage"),
+                "indexName":                   n.get("indexName"),
+                "nReturned":                   n.get("nReturned"),
+                "docsExamined":                n.get("docsExamined"),
+                "keysExamined":                n.get("keysExamined"),
+                "executionTimeMillisEstimate": n.get("executionTimeMillisEstimate"),
+            }
+            for n in _plan_nodes(stats.get("executionStages"))
+        ],
+        "pipelineStages": pipeline_stages,
+    }
+
+
+async def explain_find(col, filt, sort, skip, limit, projection=None) -> Dict[str, Any]:
+    find = {"find": col.name, "filter": filt, "sort": dict(sort), "skip": skip, "limit": limit}
+    if projection:
+        find["projection"] = projection
+    raw = await col.database.command({"explain": find, "verbosity": "executionStats"})
+    return summarize_explain(raw)
+
+
+async def explain_aggregate(col, pipeline: List[dict], allow_disk_use: bool = False) -> Dict[str, Any]:
+    aggregate = {"aggregate": col.name, "pipeline": pipeline, "cursor": {}}
+    if allow_disk_use:
+        aggregate["allowDiskUse"] = True
+    raw = await col.database.command({"explain": aggregate, "verbosity": "executionStats"})
+    return summarize_explain(raw)
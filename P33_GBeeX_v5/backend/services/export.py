@@ -0,0 +1,82 @@
+# services/export.py
+#
+# Streams every row matching a search as NDJSON or CSV.
+# The Motor cursor pulls `batch_size` documents per round trip and each batch
+# is encoded and yielded before the next one is fetched, so memory stays at
+# one batch however large the export. Starlette awaits each send, so a slow
+# client holds the cursor back rather than buffering the whole result.
+
+import csv
+import io
+import json
+from typing import Any, Callable, Dict, List, Literal, Optional
+
+from fastapi.responses import StreamingResponse
+
+ExportFormat = Literal["ndjson", "csv"]
+
+EXPORT_BATCH_SIZE = 200
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+async def _batches(cursor, batch_size: int):
+    batch = []
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _csv_cell(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def _encode_ndjson(rows: List[Dict[str, Any]]) -> bytes:
+    return "".join(json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n" for r in rows).encode()
+
+
+def _encode_csv(rows: List[Dict[str, Any]], columns: List[str], header: bool) -> bytes:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if header:
+        writer.writerow(columns)
+    writer.writerows([_csv_cell(r.get(c)) for c in columns] for r in rows)
+    return buf.getvalue().encode()
+
+
+def stream_export(
+    col,
+    filt: Dict[str, Any],
+    sort: List[tuple],
+    projection: Optional[Dict[str, Any]],
+    to_rows: Callable[[List[dict]], List[Dict[str, Any]]],
+    fmt: ExportFormat,
+    columns: Optional[List[str]],
+    name: str,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> StreamingResponse:
+    # `to_rows` turns a batch of raw documents into JSON-ready rows.
+    # CSV needs `columns`; NDJSON writes whatever keys the rows have.
+    async def body():
+        cursor = col.find(filt, projection).sort(sort).batch_size(batch_size)
+        first = True
+        async for docs in _batches(cursor, batch_size):
+            rows = to_rows(docs)
+            yield _encode_csv(rows, columns, first) if fmt == "csv" else _encode_ndjson(rows)
+            first = False
+        if fmt == "csv" and first:
+            yield _encode_csv([], columns, True)
+
+    return StreamingResponse(
+        body(),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'},
+    )
@@ -0,0 +1,40 @@
+# services/fields.py
+#
+# Turns the `fields` query parameter into a MongoDB projection, so a search
+# that asks for a handful of columns only reads those columns off the wire
+# instead of whole documents (a company document embeds every subject).
+
+from typing import Dict, Iterable, List, Optional
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    if not fields:
+        return None
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    return requested or None
+
+
+def compile_projection(
+    requested: List[str],
+    allowed: Iterable[str],
+    keep: Iterable[str] = (),
+) -> Dict[str, int]:
+    # `requested` must come from the portlet's response.fields; `keep` are extra
+    # paths the server needs itself (sort keys for the next cursor).
+    allowed = set(allowed)
+    unknown = [f for f in requested if f not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+
+    keep = list(keep)
+    # _id is left out unless the server needs it (it is a sort key)
+    projection: Dict[str, int] = {} if "_id" in keep else {"_id": 0}
+    for path in [*requested, *keep]:
+        # MongoDB rejects a projection holding both "a" and "a.b"; the shorter
+        # path already covers the longer one.
+        if any(path == p or path.startswith(p + ".") for p in projection):
+            continue
+        for p in [p for p in projection if p.startswith(path + ".")]:
+            del projection[p]
+        projection[path] = 1
+    return projection
@@ -0,0 +1,147 @@
+# services/indexes.py
+#
+# Declarative index registry for everything the search API reads.
+# INDEXES maps each collection to the indexes the routes rely on, and
+# ensure_indexes() creates them in the app lifespan (create_indexes is a no-op
+# for indexes that already exist); one that cannot be built is logged and
+# reported instead of stopping startup. QUERIES lists the lookups the routes
+# perform, so index_report() can flag any that no existing index can serve.
+
+import logging
+from typing import Any, Dict, List, Tuple
+
+from pymongo import ASCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+
+from db.mongo import COL, DB, PROTOCOL_COL, SITE_COL, SUBJECT_COL
+from services.projections import LEGACY_INDEXES, PROJECTION_INDEXES
+
+logger = logging.getLogger(__name__)
+
+# Company pages sort by companyId then _id (see PROJECTION_INDEXES).
+CLIENT_DATA_INDEXES: List[IndexModel] = [
+    IndexModel([("companyId", ASCENDING), ("_id", ASCENDING)]),
+    IndexModel([("sponsorType", ASCENDING), ("companyId", ASCENDING), ("_id", ASCENDING)]),
+    IndexModel([("riskLevel", ASCENDING), ("companyId", ASCENDING), ("_id", ASCENDING)]),
+    IndexModel([("companyName", TEXT), ("website", TEXT)], name="company_text"),
+]
+
+# The flat collections' indexes live in PROJECTION_INDEXES so that rebuilds
+# recreate them on the staging collections.
+INDEXES: Dict[str, List[IndexModel]] = {
+    COL.name: CLIENT_DATA_INDEXES,
+    **PROJECTION_INDEXES,
+}
+
+# Superseded indexes, dropped by ensure_indexes() (see LEGACY_INDEXES).
+SUPERSEDED_INDEXES: Dict[str, List[str]] = {
+    COL.name: ["companyId_1", "sponsorType_1_companyId_1", "riskLevel_1_companyId_1"],
+    **LEGACY_INDEXES,
+}
+
+# (route, collection, fields the query filters on)
+QUERIES: List[Tuple[str, str, List[str]]] = [
+    ("/company?q=", COL.name, ["$text"]),
+    ("/company?sponsorType=", COL.name, ["sponsorType"]),
+    ("/company?riskLevel=", COL.name, ["riskLevel"]),
+    ("projection sync", COL.name, ["_id"]),
+    ("/protocol?q=", PROTOCOL_COL.name, ["$text"]),
+    ("/protocol?q= (NCT ID)", PROTOCOL_COL.name, ["nctId"]),
+    ("/protocol?companyId=", PROTOCOL_COL.name, ["companyId"]),
+    ("/protocol?phase=", PROTOCOL_COL.name, ["phase"]),
+    ("/protocol?status=", PROTOCOL_COL.name, ["status"]),
+    ("/site?q=", SITE_COL.name, ["$text"]),
+    ("/site?protocolId=", SITE_COL.name, ["protocolId"]),
+    ("/site?country=&city=", SITE_COL.name, ["country"]),
+    ("/site?status=", SITE_COL.name, ["status"]),
+    ("/subject?q=", SUBJECT_COL.name, ["screeningNumber", "medicalRecordNumber"]),
+    ("/subject?siteId=", SUBJECT_COL.name, ["siteId"]),
+    ("/subject?status=", SUBJECT_COL.name, ["status"]),
+]
+
+
+# Indexes ensure_indexes() could not drop or build, as {collection: {index: error}},
+# e.g. the unique (sourceId, entity ID) index over existing duplicates.
+INDEX_ERRORS: Dict[str, Dict[str, str]] = {}
+
+
+def _record_failure(name: str, index_name: str, action: str, e: OperationFailure) -> None:
+    logger.error("Could not %s index %s.%s: %s", action, name, index_name, e)
+    INDEX_ERRORS.setdefault(name, {})[index_name] = str(e)
+
+
+async def ensure_indexes() -> None:
+    INDEX_ERRORS.clear()
+    for name, models in INDEXES.items():
+        existing = await DB[name].index_information()
+        wanted = {m.document["name"]: m.document for m in models}
+        for legacy in SUPERSEDED_INDEXES.get(name, []):
+            if legacy in existing and (
+                legacy not in wanted
+                or existing[legacy].get("unique", False) != wanted[legacy].get("unique", False)
+            ):
+                try:
+                    await DB[name].drop_index(legacy)
+                except OperationFailure as e:
+                    _record_failure(name, legacy, "drop", e)
+        # One at a time, so a failing index does not take the others with it.
+        for model in models:
+            try:
+                await DB[name].create_indexes([model])
+            except OperationFailure as e:
+                _record_failure(name, model.document["name"], "create", e)
+
+
+def sort_has_index(collection: str, filt: Dict[str, Any], sort: List[tuple]) -> bool:
+    # Whether a registered index returns `filt`'s rows already in `sort` order.
+    # Keys that `filt` pins to one value don't affect the order; the remaining
+    # index keys must start with the sort fields, in the sort's directions or
+    # all reversed (a backwards scan).
+    pinned = {
+        field for field, value in filt.items()
+        if not field.startswith("$") and (not isinstance(value, dict) or set(value) == {"$eq"})
+    }
+    wanted = [(field, direction) for field, direction in sort if field not in pinned]
+    if not wanted:
+        return True
+    for model in INDEXES.get(collection, []):
+        keys = list(model.document["key"].items())
+        while keys and keys[0][0] in pinned:
+            keys.pop(0)
+        head = keys[:len(wanted)]
+        if [f for f, _ in head] != [f for f, _ in wanted]:
+            continue
+        directions = [d for _, d in head]
+        if not all(isinstance(d, int) for d in directions):
+            continue  # text index
+        # Every key in the same relation to the sort: all 1 (forwards) or all -1 (backwards).
+        if len({d * w for d, (_, w) in zip(directions, wanted)}) == 1:
+            return True
+    return False
+
+
+def _leading_key(info: Dict[str, Any]) -> str:
+    # Text indexes are keyed ("_fts", "text"); report them as "$text".
+    field = info["key"][0][0]
+    return "$text" if field == "_fts" else field
+
+
+async def index_report() -> Dict[str, Any]:
+    existing = {name: await DB[name].index_information() for name in INDEXES}
+
+    collections = {}
+    for name, models in INDEXES.items():
+        collections[name] = {
+            "existing": sorted(existing[name]),
+            "missing": [m.document["name"] for m in models if m.document["name"] not in existing[name]],
+            "failed": INDEX_ERRORS.get(name, {}),
+        }
+
+    # A query can use an index whose leading key is one of its filter fields.
+    unindexed = []
+    for query, name, fields in QUERIES:
+        leading = {_leading_key(info) for info in existing[name].values()}
+        if not leading.intersection(fields):
+            unindexed.append({"query": query, "collection": name, "fields": fields})
+
+    return {"collections": collections, "unindexed_queries": unindexed}
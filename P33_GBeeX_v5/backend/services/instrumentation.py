@@ -0,0 +1,94 @@
+# services/instrumentation.py
+#
+# Cheap visibility into search queries.
+#   - log_query() writes a DEBUG line for a sample of requests; the filter is
+#     only JSON-encoded if that line is actually emitted.
+#   - stage() times one step of a request (count, find, facet, validate,
+#     encode) and folds it into per-route totals served by /v1/admin/query-stats.
+# The route being timed is kept in a context variable, so the pagination
+# helpers can time their own stages without being told which route called them.
+
+import json
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Fraction of requests that get a debug log line (when DEBUG is enabled).
+LOG_SAMPLE_RATE = float(os.getenv("SEARCH_LOG_SAMPLE_RATE", "0.01"))
+
+_route: ContextVar[str] = ContextVar("search_route", default="-")
+
+
+class _LazyJSON:
+    # Defers json.dumps until the logging call formats its message.
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __str__(self) -> str:
+        return json.dumps(self.value, default=str, separators=(",", ":"))
+
+
+class StageStats:
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+
+STAGE_STATS: Dict[Tuple[str, str], StageStats] = {}
+
+
+def search_route(route: str) -> None:
+    # Call at the top of a route handler; stages timed afterwards in the same
+    # request are attributed to it.
+    _route.set(route)
+
+
+@contextmanager
+def stage(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        key = (_route.get(), name)
+        stats = STAGE_STATS.get(key)
+        if stats is None:
+            stats = STAGE_STATS[key] = StageStats()
+        stats.add(time.perf_counter() - start)
+
+
+def log_query(filt: Dict[str, Any], **info: Any) -> None:
+    if not logger.isEnabledFor(logging.DEBUG) or random.random() >= LOG_SAMPLE_RATE:
+        return
+    logger.debug("%s filter=%s %s", _route.get(), _LazyJSON(filt),
+                 " ".join(f"{k}={v}" for k, v in info.items()))
+
+
+def stage_snapshot() -> List[Dict[str, Any]]:
+    return [
+        {
+            "route":    route,
+            "stage":    name,
+            "count":    s.count,
+            "total_ms": round(s.total * 1e3, 3),
+            "avg_ms":   round(s.total / s.count * 1e3, 3) if s.count else 0.0,
+            "max_ms":   round(s.max * 1e3, 3),
+        }
+        for (route, name), s in sorted(STAGE_STATS.items())
+    ]
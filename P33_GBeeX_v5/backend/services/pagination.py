@@ -0,0 +1,199 @@
+# services/pagination.py
+#
+# One-round-trip paging: the page of items and the total come back from a
+# single aggregation ($match -> $sort -> $facet) instead of a count query
+# followed by a find that repeats the same match.
+#
+# That only pays off when an index gives the sort order. The $sort sits before
+# $facet, where no $limit follows it, so MongoDB cannot turn it into a top-k
+# sort: without an index it sorts every matching row (spilling to disk past
+# 100MB, hence allowDiskUse). find().sort().skip().limit() keeps just the
+# skip + limit best rows in memory, so for a sort no index serves (see
+# sort_has_index) the page is a find plus a separate count instead: one more
+# round trip, but bounded memory and no disk spill.
+#
+# Keyset paging: a page can also start after an opaque cursor holding the sort
+# key of the previous page's last row, so deep pages cost the same as page 1.
+
+import base64
+from typing import Any, Dict, List, Literal, Optional, Tuple
+
+from bson import json_util
+
+from services.count_cache import COUNTS, filter_key
+from services.indexes import sort_has_index
+from services.instrumentation import stage
+
+CountMode = Literal["exact", "capped", "estimate"]
+
+# Largest total "capped" mode will count before giving up.
+COUNT_CAP = 10_000
+
+
+def facet_pipeline(
+    filt: Dict[str, Any],
+    sort: List[tuple],
+    skip: int,
+    limit: int,
+    count_mode: CountMode = "exact",
+    count_cap: int = COUNT_CAP,
+    projection: Optional[Dict[str, Any]] = None,
+) -> List[dict]:
+    if count_mode == "exact":
+        total_stage = [{"$count": "n"}]
+    else:
+        # Count one past the cap so we can tell "exactly cap" from "more than cap".
+        total_stage = [{"$limit": count_cap + 1}, {"$count": "n"}]
+
+    # Project after $limit so only the page's rows are trimmed.
+    items_stage = [{"$skip": skip}, {"$limit": limit}]
+    if projection:
+        items_stage.append({"$project": projection})
+
+    return [
+        {"$match": filt},
+        {"$sort": dict(sort)},  # not top-k: only worth it when an index gives the order
+        {"$facet": {
+            "items": items_stage,
+            "total": total_stage,
+        }},
+    ]
+
+
+def use_facet(col, filt: Dict[str, Any], sort: List[tuple], facet: bool = True) -> bool:
+    return facet and sort_has_index(col.name, filt, sort)
+
+
+async def fetch_page(
+    col,
+    filt: Dict[str, Any],
+    sort: List[tuple],
+    skip: int,
+    limit: int,
+    count_mode: CountMode = "exact",
+    count_cap: int = COUNT_CAP,
+    facet: bool = True,
+    projection: Optional[Dict[str, Any]] = None,
+) -> Tuple[List[dict], int, bool]:
+    # Returns (items, total, total_is_exact).
+    # "estimate" on an unfiltered collection reads the total from collection
+    # metadata; with a filter it behaves like "capped".
+    # Pass facet=False for collections of very large documents: the $facet
+    # result is a single document and must fit in MongoDB's 16MB limit.
+    # Sorts without an index skip the facet too (see the top of this file).
+    if count_mode == "estimate" and not filt:
+        with stage("find"):
+            items = await col.find({}, projection).sort(sort).skip(skip).limit(limit).to_list(length=limit)
+        with stage("count"):
+            total = await col.estimated_document_count()
+        return items, total, False
+
+    # A cached total (same filter, earlier page) leaves just the page to fetch.
+    key = filter_key(filt, count_mode, count_cap)
+    cached = COUNTS.get(col.name, key)
+    if cached is not None:
+        with stage("find"):
+            items = await col.find(filt, projection).sort(sort).skip(skip).limit(limit).to_list(length=limit)
+        total, exact = cached
+        return items, total, exact
+    version = COUNTS.version(col.name)
+
+    if use_facet(col, filt, sort, facet):
+        # Count and page come back together, so they are timed as one stage.
+        pipeline = facet_pipeline(filt, sort, skip, limit, count_mode, count_cap, projection)
+        with stage("facet"):
+            result = await col.aggregate(pipeline, allowDiskUse=True).to_list(length=1)
+        page = result[0] if result else {"items": [], "total": []}
+        items = page["items"]
+        total = page["total"][0]["n"] if page["total"] else 0
+    else:
+        count_opts = {} if count_mode == "exact" else {"limit": count_cap + 1}
+        with stage("count"):
+            total = await col.count_documents(filt, **count_opts)
+        with stage("find"):
+            items = await col.find(filt, projection).sort(sort).skip(skip).limit(limit).to_list(length=limit)
+
+    exact = True
+    if count_mode != "exact" and total > count_cap:
+        total, exact = count_cap, False
+    COUNTS.put(col.name, key, (total, exact), version)
+    return items, total, exact
+
+
+def _get_path(doc: dict, path: str) -> Any:
+    cur = doc
+    for part in path.split("."):
+        cur = cur.get(part) if isinstance(cur, dict) else None
+    return cur
+
+
+def encode_cursor(doc: dict, sort: List[tuple]) -> str:
+    # Extended JSON keeps datetimes and ObjectIds intact across the round trip.
+    values = [_get_path(doc, field) for field, _ in sort]
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor: str, sort: List[tuple]) -> List[Any]:
+    try:
+        values = json_util.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError("Malformed cursor")
+    if not isinstance(values, list) or len(values) != len(sort):
+        raise ValueError("Cursor does not match the requested sort")
+    return values
+
+
+def _after_value(field: str, direction: int, value: Any) -> Optional[Dict[str, Any]]:
+    # Rows whose `field` sorts strictly after `value`. MongoDB sorts null and
+    # missing before every other value, so they need their own cases; None
+    # means nothing sorts after (null in a descending sort).
+    if value is None:
+        return {field: {"$ne": None}} if direction == 1 else None
+    if direction == 1:
+        return {field: {"$gt": value}}
+    return {"$or": [{field: {"$lt": value}}, {field: None}]}
+
+
+def keyset_filter(sort: List[tuple], values: List[Any]) -> Dict[str, Any]:
+    # Rows strictly after `values` in `sort` order:
+    #   (a > va) OR (a == va AND b > vb) OR ...
+    # {f: None} matches null and missing alike, as the sort treats them.
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        after = _after_value(field, direction, values[i])
+        if after is None:
+            continue
+        clause = {f: values[j] for j, (f, _) in enumerate(sort[:i])}
+        clause.update(after)
+        clauses.append(clause)
+    if not clauses:
+        return {"_id": {"$exists": False}}  # nothing can follow
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+def after_query(filt: Dict[str, Any], sort: List[tuple], cursor: str) -> Dict[str, Any]:
+    # `filt` restricted to rows after the cursor. Raises ValueError for a bad cursor.
+    after = keyset_filter(sort, decode_cursor(cursor, sort))
+    return {"$and": [filt, after]} if filt else after
+
+
+async def fetch_after(
+    col,
+    filt: Dict[str, Any],
+    sort: List[tuple],
+    cursor: str,
+    limit: int,
+    projection: Optional[Dict[str, Any]] = None,
+) -> List[dict]:
+    # Keyset page: no skip and no count, just an index range scan from the cursor.
+    query = after_query(filt, sort, cursor)
+    with stage("find"):
+        return await col.find(query, projection).sort(sort).limit(limit).to_list(length=limit)
+
+
+def next_cursor(items: List[dict], sort: List[tuple], limit: int) -> Optional[str]:
+    # Only a full page can have rows after it. A projected page must keep the
+    # sort keys for this to work.
+    if len(items) < limit:
+        return None
+    return encode_cursor(items[-1], sort)
@@ -0,0 +1,302 @@
+# services/projections.py
+#
+# Keeps the flat protocol / site / subject collections in step with clientData.
+# Every flat document is the entity itself (without its child array) plus the
+# IDs of its parents and the _id of the clientData document it came from, so
+# search routes can filter, sort and page with plain indexed finds.
+#
+# Freshness: watch_client_data() follows clientData through a change stream
+# and resyncs each changed company, resuming where it left off after errors.
+# Without change streams (standalone mongod) it rebuilds everything every
+# PROJECTION_REBUILD_INTERVAL seconds instead.
+#
+# Full rebuild from the command line:
+#   python -m services.projections
+
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from pymongo import ASCENDING, TEXT, IndexModel, ReplaceOne
+from pymongo.errors import BulkWriteError, OperationFailure
+
+from db.mongo import COL, PROTOCOL_COL, SITE_COL, SUBJECT_COL
+from services.count_cache import COUNTS
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+PROJECTION_REBUILD_INTERVAL = float(os.getenv("PROJECTION_REBUILD_INTERVAL", "300"))
+WATCH_RETRY_SECONDS = 5
+
+# Server error codes the watcher handles specially.
+CHANGE_STREAMS_UNSUPPORTED = 40573  # not a replica set / sharded cluster
+CHANGE_STREAM_HISTORY_LOST = 286    # resume token fell off the oplog
+
+# Indexes for each flat collection. The entity ID and then _id are always the
+# last keys, matching the routes' sort (sort_spec in routes/search.py), so every
+# filtered page can be answered in order straight from the index.
+# Entity IDs are only unique within the clientData document they come from, so
+# uniqueness is enforced on (sourceId, entity ID); that index also serves the
+# per-company lookups of sync_company(), and _id breaks ties between equal IDs.
+# Text indexes and the plain indexes on ID-like fields back `q` search (see
+# services/text_search.py); a collection can have only one text index.
+PROJECTION_INDEXES: Dict[str, List[IndexModel]] = {
+    PROTOCOL_COL.name: [
+        IndexModel([("sourceId", ASCENDING), ("protocolId", ASCENDING)], unique=True),
+        IndexModel([("protocolId", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("companyId", ASCENDING), ("protocolId", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("phase", ASCENDING), ("protocolId", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("protocolId", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("nctId", ASCENDING)]),
+        IndexModel([("protocolName", TEXT)], name="protocol_text"),
+    ],
+    SITE_COL.name: [
+        IndexModel([("sourceId", ASCENDING), ("siteId", ASCENDING)], unique=True),
+        IndexModel([("siteId", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("protocolId", ASCENDING), ("siteId", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("country", ASCENDING), ("city", ASCENDING), ("siteId", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("siteId", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("siteName", TEXT), ("city", TEXT)], name="site_text"),
+    ],
+    SUBJECT_COL.name: [
+        IndexModel([("sourceId", ASCENDING), ("subjectId", ASCENDING)], unique=True),
+        IndexModel([("subjectId", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("siteId", ASCENDING), ("subjectId", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("protocolId", ASCENDING), ("subjectId", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("subjectId", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("medicalRecordNumber", ASCENDING)]),
+        IndexModel([("screeningNumber", ASCENDING)]),
+    ],
+}
+
+# Indexes from earlier versions: the ID-ordered indexes without the trailing
+# _id (the single-ID ones were unique at first) and sourceId_1 (now a prefix
+# of the unique index). ensure_indexes() drops them when they differ from
+# PROJECTION_INDEXES.
+LEGACY_INDEXES: Dict[str, List[str]] = {
+    PROTOCOL_COL.name: [
+        "protocolId_1", "sourceId_1", "companyId_1_protocolId_1",
+        "phase_1_protocolId_1", "status_1_protocolId_1",
+    ],
+    SITE_COL.name: [
+        "siteId_1", "sourceId_1", "protocolId_1_siteId_1",
+        "country_1_city_1_siteId_1", "status_1_siteId_1",
+    ],
+    SUBJECT_COL.name: [
+        "subjectId_1", "sourceId_1", "siteId_1_subjectId_1",
+        "protocolId_1_subjectId_1", "status_1_subjectId_1",
+    ],
+}
+
+FLAT_COLLECTIONS = (PROTOCOL_COL, SITE_COL, SUBJECT_COL)
+# The entity ID field of each flat collection, in FLAT_COLLECTIONS order.
+ID_FIELDS = ("protocolId", "siteId", "subjectId")
+
+
+def flatten_company(company: Dict[str, Any]) -> Tuple[List[dict], List[dict], List[dict]]:
+    # Split one clientData document into flat protocol, site and subject rows.
+    source_id  = company.get("_id")
+    company_id = company.get("companyId")
+    protocols, sites, subjects = [], [], []
+
+    for proto in company.get("protocols", []):
+        protocol_id = proto.get("protocolId")
+        protocols.append({
+            **{k: v for k, v in proto.items() if k != "sites"},
+            "companyId": company_id,
+            "sourceId":  source_id,
+        })
+        for site in proto.get("sites", []):
+            site_id = site.get("siteId")
+            sites.append({
+                **{k: v for k, v in site.items() if k != "subjects"},
+                "protocolId": protocol_id,
+                "companyId":  company_id,
+                "sourceId":   source_id,
+            })
+            for subj in site.get("subjects", []):
+                subjects.append({
+                    **subj,
+                    "siteId":     site_id,
+                    "protocolId": protocol_id,
+                    "companyId":  company_id,
+                    "sourceId":   source_id,
+                })
+
+    return protocols, sites, subjects
+
+
+async def _insert_batched(col, docs: List[dict]) -> int:
+    # Returns the number of rows inserted. An ID repeated inside one clientData
+    # document keeps its first row; any other write error is raised.
+    inserted = 0
+    for start in range(0, len(docs), BATCH_SIZE):
+        batch = docs[start:start + BATCH_SIZE]
+        try:
+            await col.insert_many(batch, ordered=False)
+            inserted += len(batch)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(err.get("code") != 11000 for err in errors):
+                raise
+            logger.warning("Skipped %d duplicate rows in %s", len(errors), col.name)
+            inserted += e.details.get("nInserted", 0)
+    return inserted
+
+
+# One rebuild at a time. While one runs, per-company syncs are collected in
+# _deferred instead of written: the rename at the end would overwrite them.
+# They are replayed on the live collections once the rebuild is done.
+_rebuild_lock = asyncio.Lock()
+_deferred: Optional[Set[Any]] = None
+
+
+async def rebuild_projections() -> Dict[str, int]:
+    # Rebuild every flat collection from scratch.
+    # Rows are written to *_staging collections which are then renamed over the
+    # live ones, so readers never see a half-built collection.
+    global _deferred
+    async with _rebuild_lock:
+        _deferred = set()
+        try:
+            counts = await _build_and_swap()
+        finally:
+            deferred, _deferred = _deferred, None
+            for source_id in deferred:
+                await sync_company(source_id)
+            COUNTS.invalidate()
+
+    logger.info("Rebuilt flat projections: %s (%d changes replayed)", counts, len(deferred))
+    return counts
+
+
+async def _build_and_swap() -> Dict[str, int]:
+    staging = {col.name: col.database[f"{col.name}_staging"] for col in FLAT_COLLECTIONS}
+    for name, col in staging.items():
+        await col.drop()
+        await col.create_indexes(PROJECTION_INDEXES[name])
+
+    counts = {name: 0 for name in staging}
+    buffers: Dict[str, List[dict]] = {name: [] for name in staging}
+
+    async for company in COL.find({}):
+        rows = flatten_company(company)
+        for col, batch in zip(FLAT_COLLECTIONS, rows):
+            buffers[col.name].extend(batch)
+            if len(buffers[col.name]) >= BATCH_SIZE:
+                counts[col.name] += await _insert_batched(staging[col.name], buffers[col.name])
+                buffers[col.name] = []
+
+    for name, docs in buffers.items():
+        if docs:
+            counts[name] += await _insert_batched(staging[name], docs)
+
+    for name, col in staging.items():
+        await col.rename(name, dropTarget=True)
+    return counts
+
+
+async def sync_company(source_id: Any) -> Set[str]:
+    # Re-derive the flat rows for a single clientData document (or remove them
+    # when the document is gone). Rows are replaced in place by (sourceId, ID)
+    # and only rows whose entity disappeared are deleted afterwards, so readers
+    # never see the company without its rows.
+    # Returns the names of the flat collections that actually changed.
+    changed: Set[str] = set()
+    company = await COL.find_one({"_id": source_id})
+    if company is None:
+        for col in FLAT_COLLECTIONS:
+            if (await col.delete_many({"sourceId": source_id})).deleted_count:
+                changed.add(col.name)
+        return changed
+
+    for col, id_field, docs in zip(FLAT_COLLECTIONS, ID_FIELDS, flatten_company(company)):
+        ops = [
+            ReplaceOne({"sourceId": source_id, id_field: doc.get(id_field)}, doc, upsert=True)
+            for doc in docs
+        ]
+        for start in range(0, len(ops), BATCH_SIZE):
+            result = await col.bulk_write(ops[start:start + BATCH_SIZE], ordered=False)
+            if result.modified_count or result.upserted_count:
+                changed.add(col.name)
+        removed = await col.delete_many({
+            "sourceId": source_id,
+            id_field: {"$nin": [doc.get(id_field) for doc in docs]},
+        })
+        if removed.deleted_count:
+            changed.add(col.name)
+    return changed
+
+
+async def apply_change(source_id: Any) -> None:
+    # Resync one changed company, or queue it while a rebuild is running.
+    if _deferred is not None:
+        _deferred.add(source_id)
+        return
+    changed = await sync_company(source_id)
+    # A replace that rewrote a row unchanged does not count as a change, so
+    # e.g. a subject edit keeps the protocol and site totals.
+    COUNTS.invalidate(COL.name, *changed)
+
+
+async def rebuild_periodically() -> None:
+    while True:
+        await asyncio.sleep(PROJECTION_REBUILD_INTERVAL)
+        try:
+            await rebuild_projections()
+        except Exception:
+            logger.exception("Periodic flat projection rebuild failed")
+
+
+async def watch_client_data() -> None:
+    # Follow clientData through a change stream and resync the affected company.
+    # The stream is reopened after any error from the last processed change
+    # (resume_after). A change whose resync fails, an event without a single
+    # document (drop, rename, invalidate) or lost stream history is covered by
+    # a full rebuild. Without change streams, rebuild on a timer instead.
+    resume_token = None
+    while True:
+        try:
+            async with COL.watch(resume_after=resume_token) as stream:
+                async for change in stream:
+                    key = change.get("documentKey")
+                    try:
+                        if key is None:
+                            await rebuild_projections()
+                        else:
+                            await apply_change(key["_id"])
+                    except Exception:
+                        logger.exception("Resync after clientData change failed, rebuilding")
+                        await rebuild_projections()
+                    resume_token = None if change.get("operationType") == "invalidate" else stream.resume_token
+        except asyncio.CancelledError:
+            raise
+        except OperationFailure as e:
+            if e.code == CHANGE_STREAMS_UNSUPPORTED:
+                logger.warning("clientData change stream unavailable, rebuilding flat projections every %ss: %s",
+                               PROJECTION_REBUILD_INTERVAL, e)
+                await rebuild_periodically()
+                return
+            if e.code == CHANGE_STREAM_HISTORY_LOST:
+                logger.warning("clientData change stream history lost, rebuilding flat projections")
+                resume_token = None
+                await _rebuild_logged()
+                continue
+            logger.warning("clientData change stream failed, retrying in %ss: %s", WATCH_RETRY_SECONDS, e)
+        except Exception:
+            logger.exception("clientData change stream failed, retrying in %ss", WATCH_RETRY_SECONDS)
+        await asyncio.sleep(WATCH_RETRY_SECONDS)
+
+
+async def _rebuild_logged() -> None:
+    try:
+        await rebuild_projections()
+    except Exception:
+        logger.exception("Flat projection rebuild failed")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(rebuild_projections())
@@ -0,0 +1,29 @@
+# services/serialization.py
+#
+# Search pages are validated once, in bulk, and written straight to JSON bytes:
+#   - rows go through a cached TypeAdapter(List[Model]), one call into
+#     pydantic-core per page instead of a model instance + model_dump per row;
+#   - the envelope is built with model_construct, since everything in it has
+#     just been validated;
+#   - the envelope is encoded by pydantic-core's JSON serializer, and because a
+#     Response is returned FastAPI does not validate and encode it a second time.
+
+from functools import lru_cache
+from typing import Any, List, Type
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+
+@lru_cache(maxsize=None)
+def rows_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+
+def validate_rows(model: Type[BaseModel], raw_docs: List[dict]) -> List[Any]:
+    return rows_adapter(model).validate_python(raw_docs)
+
+
+def json_response(envelope: BaseModel) -> Response:
+    # Model instances inside `Any` fields are serialized with their own schema.
+    return Response(content=envelope.model_dump_json(), media_type="application/json")
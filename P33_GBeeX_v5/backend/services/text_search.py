@@ -0,0 +1,22 @@
+# services/text_search.py
+#
+# Index-backed building blocks for the `q` search box.
+# An unanchored case-insensitive $regex has to test every document. Instead:
+#   - free text (names, cities, websites) goes through a MongoDB text index;
+#   - ID-like fields (NCT IDs, screening numbers, MRNs) are matched by prefix
+#     with an anchored, case-sensitive regex, which MongoDB turns into a range
+#     scan on the field's ordinary index.
+#
+# The text and prefix indexes themselves are registered in services/indexes.py.
+
+import re
+from typing import Any, Dict
+
+
+def text_filter(q: str) -> Dict[str, Any]:
+    # Matches any of the words in q (stemmed, case-insensitive).
+    return {"$text": {"$search": q}}
+
+
+def prefix_filter(field: str, value: str) -> Dict[str, Any]:
+    return {field: {"$regex": "^" + re.escape(value)}}